@@ -1,7 +1,7 @@
 import eventlet  # type: ignore
 
 # we need to monkey patch the standard library to make it work with eventlet
-# Apscheduler timers break without this
+# node timers break without this
 eventlet.monkey_patch()
 # expose building blocks
 from covfee.shared.dataclass import HIT, CovfeeApp, Journey, Project
@@ -1,11 +1,23 @@
 """Development workflow commands for the split runtime."""
 
+import json
+import logging
 import os
+import resource
+import signal
+import socket
 import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 from shutil import which
+from typing import List, Tuple
 
 import click
+import numpy as np
 from halo.halo import Halo
 
 from covfee.cli.utils import working_directory
@@ -115,3 +127,568 @@ def store(watch: bool):
             ]
         proc = subprocess.run(command, check=False)
         raise SystemExit(proc.returncode)
+
+
+def get_load_targets(project_dir: Path, num_clients: int) -> List[Tuple[str, int]]:
+    """(journey id, task node id) of num_clients journeys of the project database"""
+    from sqlalchemy import func, select
+
+    from covfee.server.db import get_engine_from_config, get_session_local
+    from covfee.server.orm import JourneyNode, TaskInstance
+
+    with working_directory(project_dir):
+        engine = get_engine_from_config(Config("dev"))
+    with get_session_local(engine)() as session:
+        rows = session.execute(
+            select(JourneyNode.journey_id, func.min(JourneyNode.node_id))
+            .join(TaskInstance, TaskInstance.id == JourneyNode.node_id)
+            .group_by(JourneyNode.journey_id)
+            .limit(num_clients)
+        ).all()
+    return [(journey_id.hex(), node_id) for journey_id, node_id in rows]
+
+
+def wait_for_port(port: int, timeout=60):
+    deadline = time.time() + timeout
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            if time.time() > deadline:
+                raise click.ClickException(f"No server listening on port {port}")
+            time.sleep(0.5)
+
+
+def run_load_client(url: str, journey_id: str, node_id: int, deadline: float, latencies: list):
+    """A participant autosaving its state (the "state" event) as fast as the server replies"""
+    import socketio
+
+    client = socketio.Client()
+    client.connect(url, auth={"journeyId": journey_id}, wait_timeout=30)
+    try:
+        while time.time() < deadline:
+            start = time.time()
+            client.call("state", {"nodeId": node_id, "state": {"t": start}}, timeout=60)
+            latencies.append(time.time() - start)
+    finally:
+        client.disconnect()
+
+
+def hold_idle_connection(port: int, journey_id: str, stop: threading.Event, connected: list):
+    """An idle participant, speaking the engine.io long-polling protocol directly:
+    much cheaper to simulate by the thousand than a socketio.Client.
+    """
+    from http.client import HTTPConnection, HTTPException
+
+    path = "/socket.io/?EIO=4&transport=polling"
+
+    def post(body: str):
+        connection = HTTPConnection("127.0.0.1", port, timeout=60)
+        connection.request("POST", path, body=body)
+        connection.getresponse().read()
+        connection.close()
+
+    try:
+        connection = HTTPConnection("127.0.0.1", port, timeout=60)
+        connection.request("GET", path)
+        # open packet: 0{"sid": ...}
+        path += "&sid=" + json.loads(connection.getresponse().read()[1:])["sid"]
+        post("40" + json.dumps({"journeyId": journey_id}))
+        while not stop.is_set():
+            connection.request("GET", path)
+            for packet in connection.getresponse().read().decode().split("\x1e"):
+                if packet == "2":
+                    post("3")
+                elif packet.startswith("40"):
+                    connected.append(journey_id)
+                elif packet.startswith(("1", "44")):
+                    return
+    except (OSError, HTTPException, ValueError):
+        return
+
+
+def get_session_rss(session_id: int) -> int:
+    """Resident memory in KiB of the processes of a session"""
+    out = subprocess.run(
+        ["ps", "-o", "rss=", "--sid", str(session_id)], capture_output=True, text=True
+    ).stdout
+    return sum(int(rss) for rss in out.split())
+
+
+@covfee_dev_cli.command(name="connbench")
+@click.option("--connections", default=2000, help="Idle participants kept connected.")
+@click.option("--duration", default=10.0, help="Seconds of state saves once all are connected.")
+@click.option("--port", default=5100, help="Server port.")
+@click.option("--deploy", is_flag=True, help="Run the server in deployment mode.")
+@click.argument(
+    "project_dir",
+    required=False,
+    default=".",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, path_type=Path),
+)
+def connbench(connections: int, duration: float, port: int, deploy: bool, project_dir: Path):
+    """Measures how a single server process copes with many open sockets.
+
+    Opens --connections idle participant connections to one journey of the project in
+    PROJECT_DIR, then measures the latency of the state saves of one more participant,
+    the memory of the server and the event loop stalls it reports (HUB_STALL_THRESHOLD).
+    """
+    logging.getLogger("urllib3").setLevel(logging.WARNING)
+    # one file descriptor per connection, in the benchmark and in the server
+    _, hard_limit = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard_limit, hard_limit))
+    [(journey_id, node_id)] = get_load_targets(project_dir, 1)
+
+    server_log = tempfile.TemporaryFile()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "covfee.cli.commands.launch", "start"]
+        + ["--port", str(port), "--deploy" if deploy else "--dev", str(project_dir)],
+        stdout=server_log,
+        stderr=subprocess.STDOUT,
+        start_new_session=True,
+    )
+    stop = threading.Event()
+    connected = []
+    latencies = []
+    try:
+        wait_for_port(port)
+        start = time.time()
+        for i in range(connections):
+            threading.Thread(
+                target=hold_idle_connection,
+                args=(port, journey_id, stop, connected),
+                daemon=True,
+            ).start()
+            # ramp up, the listen backlog of the server is short
+            if i % 50 == 49:
+                time.sleep(0.05)
+        while len(connected) < connections and time.time() < start + 120:
+            time.sleep(0.5)
+        connect_time = time.time() - start
+
+        run_load_client(
+            f"http://127.0.0.1:{port}", journey_id, node_id, time.time() + duration, latencies
+        )
+        rss = get_session_rss(server.pid)
+    finally:
+        stop.set()
+        os.killpg(server.pid, signal.SIGINT)
+        server.wait()
+
+    server_log.seek(0)
+    stalls = [line for line in server_log if b"event loop blocked" in line]
+    p50, p95 = np.percentile(latencies, [50, 95]) * 1000 if latencies else (0, 0)
+    print(f"connections: {len(connected)}/{connections} open after {connect_time:.1f}s")
+    print(
+        f"state saves: {len(latencies) / duration:.1f}/s, p50 {p50:.1f}ms, p95 {p95:.1f}ms"
+    )
+    print(f"server memory: {rss / 1024:.0f}MB, event loop stalls: {len(stalls)}")
+
+
+@covfee_dev_cli.command(name="loadtest")
+@click.option("--workers", default="1,2,4", help="Comma-separated numbers of workers to compare.")
+@click.option("--clients", default=32, help="Simulated participants, one per journey.")
+@click.option("--duration", default=10.0, help="Seconds of load for each number of workers.")
+@click.option("--port", default=5100, help="Port of the first worker.")
+@click.option("--deploy", is_flag=True, help="Run the workers in deployment mode.")
+@click.argument(
+    "project_dir",
+    required=False,
+    default=".",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, path_type=Path),
+)
+def loadtest(workers: str, clients: int, duration: float, port: int, deploy: bool, project_dir: Path):
+    """Measures the throughput of `covfee start --workers N` for each N in --workers.
+
+    PROJECT_DIR must hold a project made with `covfee make --no-launch`, with at least
+    --clients journeys. Each client connects to one worker, as with a sticky load balancer,
+    and saves its state in a loop. Run the load generator on another machine for
+    meaningful numbers, and use PostgreSQL: sqlite serializes the writes of all the workers.
+    """
+    logging.getLogger("urllib3").setLevel(logging.WARNING)
+    targets = get_load_targets(project_dir, clients)
+    if len(targets) < clients:
+        raise click.ClickException(f"The project has {len(targets)} journeys, {clients} required.")
+
+    print(f"{'workers':>8}{'saves/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for num_workers in [int(n) for n in workers.split(",")]:
+        server = subprocess.Popen(
+            [sys.executable, "-m", "covfee.cli.commands.launch", "start"]
+            + ["--workers", str(num_workers), "--port", str(port)]
+            + ["--deploy" if deploy else "--dev", str(project_dir)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        try:
+            for worker_port in range(port, port + num_workers):
+                wait_for_port(worker_port)
+
+            latencies = []
+            deadline = time.time() + duration
+            threads = [
+                threading.Thread(
+                    target=run_load_client,
+                    args=(
+                        f"http://127.0.0.1:{port + i % num_workers}",
+                        journey_id,
+                        node_id,
+                        deadline,
+                        latencies,
+                    ),
+                )
+                for i, (journey_id, node_id) in enumerate(targets)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            os.killpg(server.pid, signal.SIGINT)
+            server.wait()
+
+        p50, p95 = np.percentile(latencies, [50, 95]) * 1000 if latencies else (0, 0)
+        print(f"{num_workers:>8}{len(latencies) / duration:>10.1f}{p50:>10.1f}{p95:>10.1f}")
+
+
+class OpenViduStubHandler(BaseHTTPRequestHandler):
+    """The session and connection endpoints of the OpenVidu REST API"""
+
+    protocol_version = "HTTP/1.1"  # keep-alive
+    sessions: set = set()
+    delay = 0.0
+
+    def send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or "{}")
+        time.sleep(self.delay)
+        parts = self.path.strip("/").split("/")
+        if parts == ["openvidu", "api", "sessions"]:
+            session_id = payload.get("customSessionId") or str(len(self.sessions))
+            if session_id in self.sessions:
+                return self.send_json(409, {"message": "session exists"})
+            self.sessions.add(session_id)
+            return self.send_json(200, {"sessionId": session_id})
+        if len(parts) == 5 and parts[:3] == ["openvidu", "api", "sessions"] and parts[4] == "connection":
+            if parts[3] not in self.sessions:
+                return self.send_json(404, {"message": "session not found"})
+            token = f"wss://localhost?sessionId={parts[3]}&token=tok_{time.time_ns()}"
+            return self.send_json(200, {"token": token})
+        self.send_json(404, {"message": "not found"})
+
+    def log_message(self, format, *args):
+        logging.getLogger("openvidu-stub").info(
+            "%s %s", self.client_address[1], format % args
+        )
+
+
+@covfee_dev_cli.command(name="openvidu-stub")
+@click.option("--port", default=4443, help="Server port.")
+@click.option("--delay", default=0.0, help="Seconds to wait before answering each request.")
+def openvidu_stub(port: int, delay: float):
+    """Runs a stand-in for the OpenVidu server, to test videocall tasks without one.
+
+    Point OPENVIDU_URL to http://localhost:PORT/. Sessions are kept in memory, so a restart
+    of the stub behaves like OpenVidu closing all the sessions.
+    """
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    OpenViduStubHandler.delay = delay
+    server = ThreadingHTTPServer(("127.0.0.1", port), OpenViduStubHandler)
+    print(f"OpenVidu stub listening on http://localhost:{port}/")
+    server.serve_forever()
+
+
+@covfee_dev_cli.command(name="aggbench")
+@click.option("--annotators", default=100, help="Synthetic annotators.")
+@click.option("--frames", default=108000, help="Frames per trace (108000 is 30 min at 60 Hz).")
+@click.option("--max-lag", default=60, help="Largest lag searched, in frames.")
+def aggbench(annotators: int, frames: int, max_lag: int):
+    """Times the aggregation of continuous annotations (tasks.aggregation) on synthetic
+    traces: a common signal plus noise, with a random lag and a random length per annotator.
+    """
+    from covfee.server.tasks import aggregation
+
+    rng = np.random.default_rng(0)
+    # white noise smoothed over half a second, reaction times within +-10 frames
+    signal = np.convolve(rng.normal(size=frames + 2 * max_lag), np.hanning(31), "same")
+    signal /= signal.std()
+    true_lags = rng.integers(-10, 11, annotators)
+    traces = []
+    for lag in true_lags:
+        length = rng.integers(frames * 9 // 10, frames + 1)
+        values = signal[max_lag - lag : max_lag - lag + length] + rng.normal(size=length)
+        # 60 Hz timestamps with jitter, as recorded by the browser
+        times = (np.arange(length) + rng.uniform(-0.1, 0.1, length)) / 60
+        traces.append((times, values.astype(np.float32)))
+
+    timings = {}
+
+    def timed(name, fn, *args, **kwargs):
+        start = time.perf_counter()
+        res = fn(*args, **kwargs)
+        timings[name] = time.perf_counter() - start
+        return res
+
+    grid, matrix = timed("align", aggregation.align, traces, 1 / 60)
+    timed("mean", aggregation.mean_trace, matrix)
+    timed("median", aggregation.median_trace, matrix)
+    alpha = timed("alpha", aggregation.krippendorff_alpha, matrix)
+    icc = timed("icc", aggregation.icc, matrix)
+    lags, _ = timed("lag correlation", aggregation.lag_correlation, matrix, max_lag)
+
+    print(f"{annotators} annotators x {matrix.shape[1]} samples")
+    for name, seconds in timings.items():
+        print(f"{name:>16}: {seconds * 1000:8.1f}ms")
+    print(f"{'total':>16}: {sum(timings.values()) * 1000:8.1f}ms")
+    print(f"alpha {alpha:.3f}, ICC(2,1) {icc:.3f}")
+    # the lags are measured against the mean of the others, which carries their mean lag
+    errors = lags - (true_lags - true_lags.mean())
+    print(f"lags recovered within 1 frame: {np.mean(np.abs(errors) <= 1) * 100:.0f}%")
+
+
+@covfee_dev_cli.command(name="sqlitebench")
+@click.option("--commits", default=500, help="State updates per profile.")
+@click.option("--payload", default=2048, help="Size of the state, in bytes.")
+def sqlitebench(commits: int, payload: int):
+    """Times the commits of the state event (on_state) under each SQLITE_PROFILE:
+    one UPDATE of a TaskResponse state and one commit per event, on a file database.
+    """
+    from sqlalchemy import create_engine
+
+    from covfee.server.db import SQLITE_PROFILES, get_session_local, set_sqlite_pragmas
+    from covfee.server.orm.base import Base
+    from covfee.server.orm.response import TaskResponse
+
+    for profile, pragmas in SQLITE_PROFILES.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+            set_sqlite_pragmas(engine, pragmas)
+            Base.metadata.create_all(engine)
+            session = get_session_local(engine)()
+
+            # SQLite does not enforce the foreign key, no node is needed
+            response = TaskResponse()
+            response.node_id = 1
+            session.add(response)
+            session.commit()
+
+            start = time.perf_counter()
+            for i in range(commits):
+                response.state = {"i": i, "data": "x" * payload}
+                session.flush()
+                session.commit()
+            seconds = time.perf_counter() - start
+
+            session.close()
+            engine.dispose()
+        print(f"{profile:>16}: {commits / seconds:8.0f} commits/s")
+
+
+@covfee_dev_cli.command(name="instbench")
+@click.option("--instances", default=200, help="Instances created per HIT and method.")
+def instbench(instances: int):
+    """Times the creation of HIT instances through the ORM, as covfee make does, and
+    through the bulk path (HITSpec.instantiate_bulk), on a SQLite file database.
+    """
+    from sqlalchemy import create_engine
+
+    from covfee import HIT, Project, tasks
+    from covfee.server.db import get_session_local
+    from covfee.server.orm.base import Base
+    from covfee.shared.dataclass import CovfeeApp
+
+    config.load_environment("dev")
+    Base._config = config
+
+    def make_hit(name, num_journeys, num_nodes):
+        hit = HIT(name)
+        for _ in range(num_journeys):
+            hit.add_journey(
+                nodes=[
+                    tasks.InstructionsTaskSpec(
+                        name=f"Task {i}", content={"type": "link", "url": "index.md"}
+                    )
+                    for i in range(num_nodes)
+                ]
+            )
+        return hit
+
+    hits = {"3-node HIT": (1, 3), "4 journeys x 10 nodes": (4, 10)}
+    for name, (num_journeys, num_nodes) in hits.items():
+        rates = {}
+        for method in ["ORM", "bulk"]:
+            with tempfile.TemporaryDirectory() as tmp:
+                engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+                Base.metadata.create_all(engine)
+                with get_session_local(engine)() as session:
+                    app = CovfeeApp(
+                        [Project(name, "admin@example.com", [make_hit(name, num_journeys, num_nodes)])]
+                    )
+                    if method == "ORM":
+                        # the instances are added with their project, as in covfee make
+                        start = time.perf_counter()
+                        session.add_all(app.get_instantiated_projects(num_instances=instances))
+                        session.commit()
+                    else:
+                        [project] = app.get_instantiated_projects(num_instances=0)
+                        session.add(project)
+                        session.commit()
+                        start = time.perf_counter()
+                        project.hitspecs[0].instantiate_bulk(session, instances)
+                        session.commit()
+                    rates[method] = instances / (time.perf_counter() - start)
+                engine.dispose()
+        print(f"{name:>24}: ORM {rates['ORM']:6.0f} inst/s, bulk {rates['bulk']:6.0f} inst/s")
+
+
+@covfee_dev_cli.command(name="timerbench")
+@click.option("--timers", default=50000, help="Timers (and nodes) in the benchmark.")
+@click.option("--single", default=500, help="Timers fired one session per timer, for comparison.")
+def timerbench(timers: int, single: int):
+    """Times the node timers: the operations of the DeadlineScheduler heap in memory,
+    then rebuilding the timers of running nodes from a SQLite file database
+    (reconcile_timers) and firing them through fire_timers, batched and one by one.
+    """
+    from datetime import datetime, timedelta
+
+    from flask import Flask
+    from sqlalchemy import create_engine, func, select, update
+
+    from covfee import HIT, Project, tasks
+    from covfee.server.db import get_session_local
+    from covfee.server.orm.base import Base
+    from covfee.server.orm.node import NodeInstance, NodeInstanceStatus
+    from covfee.server.scheduler import timers as node_timers
+    from covfee.server.scheduler.deadlines import DeadlineScheduler
+    from covfee.server.socketio.socket import socketio
+    from covfee.shared.dataclass import CovfeeApp
+
+    rng = np.random.default_rng(0)
+    now = datetime.now()
+    keys = [(node_id, "finish") for node_id in range(timers)]
+    deadlines = [now + timedelta(seconds=s) for s in rng.uniform(1, 3600, timers)]
+    reschedules = [now + timedelta(seconds=s) for s in rng.uniform(1, 3600, timers)]
+
+    heap = DeadlineScheduler(lambda keys: None)
+    timings = {}
+
+    def timed(name, fn, *args):
+        start = time.perf_counter()
+        res = fn(*args)
+        timings[name] = time.perf_counter() - start
+        return res
+
+    timed("schedule", lambda: [heap.schedule(k, d) for k, d in zip(keys, deadlines)])
+    timed("reschedule", lambda: [heap.schedule(k, d) for k, d in zip(keys, reschedules)])
+    timed("cancel", lambda: [heap.cancel(k) for k in keys])
+    print(f"heap, {timers} timers")
+    for name, seconds in timings.items():
+        print(f"{name:>16}: {timers / seconds:8.0f}/s")
+
+    # half of the timers are due
+    for key, deadline in zip(keys, deadlines):
+        heap.schedule(key, deadline - timedelta(seconds=1800))
+    start = time.perf_counter()
+    num_due = 0
+    while due := heap.pop_due(now):
+        num_due += len(due)
+    print(f"{'pop due':>16}: {num_due} timers in {time.perf_counter() - start:.2f}s")
+
+    config.load_environment("dev")
+    Base._config = config
+    # fire_timers emits the status changes, to no clients here
+    socketio.init_app(Flask(__name__), async_mode="threading")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        session_local = get_session_local(engine)
+        Base.sessionmaker = session_local
+
+        hit = HIT("Timers")
+        hit.add_journey(
+            nodes=[
+                tasks.InstructionsTaskSpec(
+                    name="Task", content={"type": "link", "url": "index.md"}, timer=60
+                )
+            ]
+        )
+        with session_local() as session:
+            [project] = CovfeeApp(
+                [Project("Timers", "admin@example.com", [hit])]
+            ).get_instantiated_projects(num_instances=0)
+            session.add(project)
+            session.commit()
+            project.hitspecs[0].instantiate_bulk(session, timers)
+            # every node started an hour ago, so that all the finish timers are due
+            started = datetime.now() - timedelta(hours=1)
+            session.execute(
+                update(NodeInstance).values(
+                    status=NodeInstanceStatus.RUNNING, dt_start=started, dt_play=started
+                )
+            )
+            session.commit()
+
+            start = time.perf_counter()
+            node_timers.reconcile_timers(session)
+            print(f"{'reconcile':>16}: {time.perf_counter() - start:.2f}s")
+
+        scheduler = node_timers.scheduler
+        max_batch, scheduler.max_batch = scheduler.max_batch, single
+        due = scheduler.pop_due(datetime.now())
+        scheduler.max_batch = max_batch
+        start = time.perf_counter()
+        for key in due:
+            node_timers.fire_timers([key])
+        print(f"{'one per session':>16}: {len(due) / (time.perf_counter() - start):8.0f} timers/s")
+
+        start = time.perf_counter()
+        num_fired = 0
+        while due := scheduler.pop_due(datetime.now()):
+            node_timers.fire_timers(due)
+            num_fired += len(due)
+        print(f"{'batched':>16}: {num_fired / (time.perf_counter() - start):8.0f} timers/s")
+
+        with session_local() as session:
+            num_finished = session.scalar(
+                select(func.count(NodeInstance.id)).where(
+                    NodeInstance.status == NodeInstanceStatus.FINISHED
+                )
+            )
+        print(f"{num_finished} of {timers} nodes finished")
+        engine.dispose()
+
+
+@covfee_dev_cli.command(name="condbench")
+@click.option("--calls", default=1000, help="Evaluations per expression and method.")
+def condbench(calls: int):
+    """Times eval_string on node condition expressions, against parsing the
+    expression on every call as eval_string did before the compiled closures were cached.
+    """
+    from covfee.server.orm import condition_parser
+
+    def parse_and_eval(expression, var_values):
+        parsed = condition_parser.parse_expression(expression)
+        return condition_parser.compile_parsed(parsed)(var_values)
+
+    var_values = {"N": 3, "NJOURNEYS": 2, "NOW": time.time()}
+    expressions = ["N >= 2", "N >= 2 AND NJOURNEYS > 1", "1 < N < 3 OR NOT NJOURNEYS > 1"]
+    methods = {"parse per call": parse_and_eval, "eval_string": condition_parser.eval_string}
+    for expression in expressions:
+        timings = {}
+        for name, fn in methods.items():
+            start = time.perf_counter()
+            for _ in range(calls):
+                fn(expression, var_values)
+            timings[name] = (time.perf_counter() - start) / calls
+        print(expression)
+        for name, seconds in timings.items():
+            print(f"{name:>16}: {seconds * 1e6:8.1f}us")
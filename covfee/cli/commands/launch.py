@@ -1,5 +1,11 @@
 """Launch commands for preparing and running a covfee backend."""
 
+import datetime
+import os
+import signal
+import subprocess
+import sys
+import time
 import traceback
 from pathlib import Path
 
@@ -10,6 +16,7 @@ from colorama import init as colorama_init
 from covfee.cli.utils import working_directory
 from covfee.config import Config
 from covfee.launcher import Launcher, ProjectExistsException
+from covfee.server.socketio.broker import get_broker_url, run_broker
 from covfee.server.tasks.base import BaseCovfeeTask
 from covfee.shared.validator.validation_errors import JavascriptError, ValidationError
 
@@ -113,6 +120,65 @@ def start_backend(
         launcher.launch(host=host, port=port)
 
 
+def start_workers(
+    project_path: Path,
+    mode: str,
+    host: str,
+    port: int,
+    auth_enabled: bool,
+    num_workers: int,
+) -> None:
+    """Start num_workers backend processes on consecutive ports, connected by a message queue.
+    Without SOCKETIO_MESSAGE_QUEUE in the config, a local zmq broker is started as the queue.
+    """
+    project_root = resolve_project_root(project_path)
+    with working_directory(project_root):
+        config = build_config(mode, host, port)
+        # tables added since the database was made (eg. the shared admin feed)
+        Launcher(mode, [], project_root, config=config).create_tables()
+    message_queue = config["SOCKETIO_MESSAGE_QUEUE"]
+
+    command = [sys.executable, "-m", "covfee.cli.commands.launch"]
+    processes = []
+    if not message_queue:
+        message_queue = get_broker_url()
+        processes.append(subprocess.Popen(command + ["broker"]))
+
+    flags = ["--dev" if mode == "dev" else "--deploy"]
+    if auth_enabled and mode == "dev":
+        flags.append("--safe")
+    for index in range(num_workers):
+        env = {**os.environ, "COVFEE_SOCKETIO_MESSAGE_QUEUE": message_queue}
+        processes.append(
+            subprocess.Popen(
+                command
+                + ["start", "--host", host, "--port", str(port + index)]
+                + flags
+                + [str(project_path)],
+                env=env,
+            )
+        )
+
+    print(
+        f"Started {num_workers} workers on ports {port}-{port + num_workers - 1} "
+        f"with message queue {message_queue}.\n"
+        "Serve them behind a load balancer with sticky sessions (eg. nginx ip_hash)."
+    )
+
+    def stop(signum, frame):
+        for process in processes:
+            process.terminate()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    # a worker exiting stops the others
+    while all(process.poll() is None for process in processes):
+        time.sleep(1)
+    stop(None, None)
+    for process in processes:
+        process.wait()
+
+
 @click.group(name="covfee")
 def covfee_cli():
     pass
@@ -175,21 +241,260 @@ def make(force, dev, deploy, safe, host, port, no_launch, project_path):
 @click.option("--dev", is_flag=True, help="Run in development mode.")
 @click.option("--deploy", is_flag=True, help="Run in deployment mode.")
 @click.option("--safe", is_flag=True, help="Enable authentication in development mode.")
+@click.option(
+    "--workers",
+    default=1,
+    help="Number of server processes, listening on consecutive ports from --port.",
+)
 @click.argument(
     "project_path",
     required=False,
     default=".",
     type=click.Path(exists=True, file_okay=True, dir_okay=True, path_type=Path),
 )
-def start(host, port, dev, deploy, safe, project_path):
+def start(host, port, dev, deploy, safe, workers, project_path):
     """Start only the backend service for a project."""
     mode = resolve_mode(dev, deploy)
     auth_enabled = mode == "deploy" or safe
 
     try:
-        start_backend(project_path, mode, host, port, auth_enabled)
+        if workers > 1:
+            start_workers(project_path, mode, host, port, auth_enabled, workers)
+        else:
+            start_backend(project_path, mode, host, port, auth_enabled)
     except Exception as err:
         print(traceback.format_exc())
         if "js_stack_trace" in dir(err):
             print(err.js_stack_trace)
         return
+
+
+@covfee_cli.command()
+@click.option("--host", default="127.0.0.1", help="Interface to listen on.")
+@click.option(
+    "--port",
+    default=5570,
+    help="Port receiving the messages of the workers. They are published on port + 1.",
+)
+def broker(host, port):
+    """Run a zmq message queue for the workers of `covfee start --workers`.
+    Set SOCKETIO_MESSAGE_QUEUE to the printed URL to use it from workers started separately.
+    """
+    print(f"Broker running, message queue URL: {get_broker_url(host, port)}")
+    run_broker(host, port)
+
+
+@covfee_cli.group()
+def instances():
+    """Manage the HIT instances (links) of an existing project database."""
+    pass
+
+
+@instances.command(name="add")
+@click.option("--hit", "hit_ref", required=True, help="ID or name of the HIT.")
+@click.option("--n", "num_instances", default=1, help="Number of instances to add.")
+@click.option("--batch-size", default=200, help="Instances inserted per statement batch.")
+@click.option("--dev", is_flag=True, help="Use the development configuration.")
+@click.option("--deploy", is_flag=True, help="Use the deployment configuration.")
+@click.argument(
+    "project_path",
+    required=False,
+    default=".",
+    type=click.Path(exists=True, file_okay=True, dir_okay=True, path_type=Path),
+)
+def add_instances(hit_ref, num_instances, batch_size, dev, deploy, project_path):
+    """Add instances to a HIT in the project database."""
+    from sqlalchemy import select
+
+    from covfee.server.db import get_engine_from_config, get_session_local
+    from covfee.server.orm import HITSpec
+
+    mode = resolve_mode(dev, deploy)
+    with working_directory(resolve_project_root(project_path)):
+        config = build_config(mode, None, None)
+        session_local = get_session_local(get_engine_from_config(config))
+        with session_local() as session:
+            query = select(HITSpec).where(HITSpec.name == hit_ref)
+            if hit_ref.isdigit():
+                query = select(HITSpec).where(HITSpec.id == int(hit_ref))
+            hit = session.execute(query).scalars().first()
+            if hit is None:
+                raise click.ClickException(f"HIT {hit_ref} not found.")
+
+            hit_name = hit.name
+            start = time.time()
+            instance_ids = hit.instantiate_bulk(session, num_instances, batch_size)
+            session.commit()
+            elapsed = time.time() - start
+
+    print(
+        f'Added {len(instance_ids)} instances to HIT "{hit_name}" in {elapsed:.2f}s '
+        f"({len(instance_ids) / max(elapsed, 1e-6):.0f} instances/s)."
+    )
+
+
+def find_project(session, project_ref: str):
+    """Return the project with the given name or numeric ID."""
+    from sqlalchemy import select
+
+    from covfee.server.orm import Project
+
+    query = select(Project).where(Project.name == project_ref)
+    if project_ref.isdigit():
+        query = select(Project).where(Project.id == int(project_ref))
+    project = session.execute(query).scalars().first()
+    if project is None:
+        raise click.ClickException(f"Project {project_ref} not found.")
+    return project
+
+
+def export_project(
+    session, project, export_format, out_path: Path, batch_size, since=None, config=None
+):
+    """Export the results of a project to a folder (parquet) or zip file (json)."""
+    import zipstream
+
+    from covfee.server.orm.export import ParallelResultsExporter, ParquetExporter
+
+    if export_format == "parquet":
+        try:
+            exporter = ParquetExporter(session, batch_size)
+        except ImportError as ex:
+            raise click.ClickException(str(ex))
+        written = exporter.write_project(str(out_path), project.id, since)
+        for task_type, tables in written.items():
+            for table, num_rows in tables.items():
+                print(f"{os.path.join(task_type, table)}.parquet: {num_rows} rows")
+    else:
+        z = zipstream.ZipFile(mode="w", compression=zipstream.ZIP_DEFLATED)
+        if config is not None and config["EXPORT_WORKERS"] > 0:
+            chunks = ParallelResultsExporter(
+                session, config, config["EXPORT_WORKERS"]
+            ).stream_project(z, "./", project.id, since)
+        else:
+            chunks = project.stream_download(z, "./", since=since)
+        with open(out_path, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+            for chunk in z:
+                f.write(chunk)
+
+
+export_format_option = click.option(
+    "--format",
+    "export_format",
+    type=click.Choice(["parquet", "json"]),
+    default="parquet",
+    help="parquet: one dataset per task type. json: zip with one file per HIT instance.",
+)
+
+
+@covfee_cli.command(name="export")
+@click.option("--project", "project_ref", required=True, help="ID or name of the project.")
+@export_format_option
+@click.option("--out", "out_path", required=True, help="Output folder (parquet) or zip file (json).")
+@click.option(
+    "--since",
+    default=None,
+    help="ISO timestamp. Only export what changed after it (incremental export).",
+)
+@click.option("--batch-size", default=1000, help="Rows read and written per batch (parquet).")
+@click.option("--dev", is_flag=True, help="Use the development configuration.")
+@click.option("--deploy", is_flag=True, help="Use the deployment configuration.")
+@click.argument(
+    "project_path",
+    required=False,
+    default=".",
+    type=click.Path(exists=True, file_okay=True, dir_okay=True, path_type=Path),
+)
+def export(
+    project_ref, export_format, out_path, since, batch_size, dev, deploy, project_path
+):
+    """Export the results of a project from the project database."""
+    from covfee.server.db import get_engine_from_config, get_session_local
+    from covfee.server.orm.export import parse_since
+
+    if since is not None:
+        try:
+            since = parse_since(since)
+        except ValueError:
+            raise click.BadParameter(f"invalid timestamp {since}", param_hint="--since")
+
+    out_path = Path(out_path).resolve()
+    mode = resolve_mode(dev, deploy)
+    with working_directory(resolve_project_root(project_path)):
+        config = build_config(mode, None, None)
+        if since is not None:
+            since -= datetime.timedelta(seconds=config["EXPORT_SINCE_OVERLAP"])
+        session_local = get_session_local(get_engine_from_config(config))
+        with session_local() as session:
+            project = find_project(session, project_ref)
+            start = time.time()
+            watermark = datetime.datetime.now()
+            export_project(
+                session, project, export_format, out_path, batch_size, since, config
+            )
+            elapsed = time.time() - start
+
+    print(f"Exported {out_path} in {elapsed:.2f}s.")
+    print(f"Watermark: {watermark.isoformat()}")
+
+
+@covfee_cli.command(name="sync")
+@click.option("--project", "project_ref", required=True, help="ID or name of the project.")
+@export_format_option
+@click.option(
+    "--out",
+    "out_dir",
+    required=True,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Folder of the synced exports.",
+)
+@click.option("--batch-size", default=1000, help="Rows read and written per batch (parquet).")
+@click.option("--dev", is_flag=True, help="Use the development configuration.")
+@click.option("--deploy", is_flag=True, help="Use the deployment configuration.")
+@click.argument(
+    "project_path",
+    required=False,
+    default=".",
+    type=click.Path(exists=True, file_okay=True, dir_okay=True, path_type=Path),
+)
+def sync(project_ref, export_format, out_dir, batch_size, dev, deploy, project_path):
+    """Export what changed since the previous sync into a new folder (parquet) or zip (json) of OUT.
+    The watermark is kept in OUT/watermark. The first sync exports everything.
+    """
+    from covfee.server.db import get_engine_from_config, get_session_local
+    from covfee.server.orm.export import parse_since
+
+    out_dir = out_dir.resolve()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    watermark_path = out_dir / "watermark"
+    since = None
+    if watermark_path.exists():
+        since = parse_since(watermark_path.read_text().strip())
+
+    mode = resolve_mode(dev, deploy)
+    with working_directory(resolve_project_root(project_path)):
+        config = build_config(mode, None, None)
+        if since is not None:
+            since -= datetime.timedelta(seconds=config["EXPORT_SINCE_OVERLAP"])
+        session_local = get_session_local(get_engine_from_config(config))
+        with session_local() as session:
+            project = find_project(session, project_ref)
+            start = time.time()
+            watermark = datetime.datetime.now()
+            name = watermark.strftime("%Y%m%dT%H%M%S")
+            out_path = out_dir / (name if export_format == "parquet" else name + ".zip")
+            export_project(
+                session, project, export_format, out_path, batch_size, since, config
+            )
+            elapsed = time.time() - start
+
+    # only advanced once the export is complete
+    watermark_path.write_text(watermark.isoformat())
+    print(f"Exported {out_path} in {elapsed:.2f}s.")
+    print(f"Watermark: {watermark.isoformat()}")
+
+
+if __name__ == "__main__":
+    covfee_cli()
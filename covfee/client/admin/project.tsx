@@ -1,11 +1,20 @@
-import { Button, Tooltip } from "antd"
+import { Button, Table, Tooltip } from "antd"
 import * as React from "react"
 
 import Constants from "Constants"
-import { ProjectType } from "types/project"
+import { HitSummaryType, ProjectType } from "types/project"
 import { appContext } from "../app_context"
+import { chatContext } from "../chat_context"
 import { useProject } from "../models/Project"
+import { myerror } from "../utils"
 import { HitBlock } from "./hit_block/hit_block"
+import {
+  JourneyColorStatuses,
+  JourneyStatusToColor,
+  NodeColorStatuses,
+  NodeStatusToColor,
+  StatusIcon,
+} from "./utils"
 
 interface Props {
   project: ProjectType
@@ -13,7 +22,88 @@ interface Props {
 
 export const Project = (props: Props) => {
   const { socket } = React.useContext(appContext)
-  const { project } = useProject(props.project, socket)
+  const { addChatListeners } = React.useContext(chatContext)
+  const {
+    project,
+    summary,
+    refreshSummary,
+    hasMoreHits,
+    loadMoreHits,
+    startFeed,
+  } = useProject(props.project, socket)
+  const [isLoadingHits, setIsLoadingHits] = React.useState<boolean>(false)
+
+  const handleLoadMore = React.useCallback(() => {
+    setIsLoadingHits(true)
+    loadMoreHits()
+      .then((page) => {
+        if (page === null) return
+        addChatListeners(
+          [].concat(
+            ...page.items.map((inst) => inst.journeys.map((j) => j.chat_id))
+          )
+        )
+      })
+      .catch((error) => {
+        myerror("Error loading HIT instances.", error)
+      })
+      .finally(() => setIsLoadingHits(false))
+  }, [loadMoreHits, addChatListeners])
+
+  // load the summary and the first page of hits, updated from the admin feed
+  React.useEffect(() => {
+    refreshSummary().catch((error) => {
+      myerror("Error loading project summary.", error)
+    })
+    startFeed()
+      .catch((error) => {
+        myerror("Error loading the admin feed.", error)
+      })
+      .then(handleLoadMore)
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [])
+
+  const summaryColumns = [
+    { title: "HIT", dataIndex: "name", key: "name" },
+    {
+      title: "Instances (submitted)",
+      key: "instances",
+      render: (hit: HitSummaryType) =>
+        `${hit.num_instances} (${hit.num_submitted_instances})`,
+    },
+    {
+      title: "Journeys online / submitted / total",
+      key: "journeys",
+      render: (hit: HitSummaryType) =>
+        `${hit.journeys.online} / ${hit.journeys.submitted} / ${hit.journeys.total}`,
+    },
+    {
+      title: "Journey status",
+      key: "journey_status",
+      render: (hit: HitSummaryType) =>
+        JourneyColorStatuses.map((status) => (
+          <Tooltip key={status} title={status}>
+            <span style={{ marginRight: "0.5em" }}>
+              <StatusIcon color={JourneyStatusToColor[status]} />
+              {hit.journeys.status[status]}
+            </span>
+          </Tooltip>
+        )),
+    },
+    {
+      title: "Node status",
+      key: "node_status",
+      render: (hit: HitSummaryType) =>
+        NodeColorStatuses.map((status) => (
+          <Tooltip key={status} title={status}>
+            <span style={{ marginRight: "0.5em" }}>
+              <StatusIcon color={NodeStatusToColor[status]} />
+              {hit.nodes.status[status]}
+            </span>
+          </Tooltip>
+        )),
+    },
+  ]
 
   return (
     <>
@@ -37,10 +127,37 @@ export const Project = (props: Props) => {
         </Tooltip>
       </div>
 
+      <div style={{ padding: "0 1em" }}>
+        <Table
+          size="small"
+          pagination={false}
+          loading={summary === null}
+          rowKey="id"
+          columns={summaryColumns}
+          dataSource={summary ? summary.hitSpecs : []}
+        />
+        <Button
+          size="small"
+          style={{ marginTop: "0.5em" }}
+          onClick={() => {
+            refreshSummary().catch((error) => {
+              myerror("Error loading project summary.", error)
+            })
+          }}
+        >
+          Refresh
+        </Button>
+      </div>
+
       <div style={{ padding: "1em" }}>
         {project.hits.map((hit, index) => {
           return <HitBlock hit={hit} key={index}></HitBlock>
         })}
+        {hasMoreHits && (
+          <Button loading={isLoadingHits} onClick={handleLoadMore}>
+            Load more
+          </Button>
+        )}
       </div>
     </>
   )
@@ -26,7 +26,7 @@ const ProjectsPage = (props: Props) => {
   const [project, setProject] = React.useState<ProjectType>(null)
 
   // const [instances, setInstances] = React.useState<HitInstanceType[]>();
-  const { clearChats, addChats, clearChatListeners, addChatListeners } =
+  const { clearChats, addChats, clearChatListeners } =
     React.useContext(chatContext)
 
   const handleChangeProject = React.useCallback(
@@ -39,16 +39,11 @@ const ProjectsPage = (props: Props) => {
         setIsLoadingProject(false)
         setCurrentProjectIndex(projectIndex)
 
-        const chat_ids = [].concat.apply(
-          [],
-          proj.hits.map((inst) => inst.journeys.map((j) => j.chat_id))
-        ) as number[]
+        // the project adds the listeners of its hits as they are loaded
         clearChatListeners()
-
-        addChatListeners(chat_ids)
       })
     },
-    [projects, addChatListeners, clearChatListeners]
+    [projects, clearChatListeners]
   )
 
   React.useEffect(() => {
@@ -135,7 +130,7 @@ const ProjectsPage = (props: Props) => {
         </Select>
       </div>
 
-      {!isLoadingProject && <Project project={project} />}
+      {!isLoadingProject && <Project key={project.id} project={project} />}
     </>
   )
 }
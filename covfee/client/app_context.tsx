@@ -18,7 +18,23 @@ import { UserConfig } from "./user_config"
 type SomeRequired<T, Keys extends keyof T> = Required<Pick<T, Keys>> &
   Partial<Omit<T, Keys>>
 
+// change of a node or journey in the admin feed, with the fields that changed
+export type FeedDelta = {
+  seq: number
+  kind: "node" | "journey"
+  id: number | string
+  hit_id: string
+  [field: string]: any
+}
+
+export type FeedPosition = { epoch: string; seq: number }
+
 export interface ServerToClientEvents {
+  /**
+   * Admin feed: status deltas of nodes and journeys, in order of seq
+   */
+  feed: (arg0: FeedDelta[]) => void
+
   /**
    * Journey events: emited to admin when a client opens/closes a journey page
    */
@@ -43,6 +59,8 @@ export interface ServerToClientEvents {
     error?: string
     load_task?: boolean
     task_data?: any
+    // version of response.state in the server, base for state_patch
+    state_version?: number
   }) => void
 
   // whenever the status of the node changes because:
@@ -67,15 +85,38 @@ export interface ServerToClientEvents {
   // for tasks with shared state
   // emited to node when an action is executed
   action: (arg0: ActionResponse) => void
+  // emited to node with the actions executed within a batching window, in order
+  actions: (arg0: {
+    nodeId: number
+    actionIndex: number
+    actions: ActionResponse[]
+  }) => void
 
   // for tasks with shared state
   // emited when a node
   state: (arg0: StateResponse) => void
 }
 
+export type StateSaveResponse =
+  | { success: true; version: number }
+  | { success: false; resync: true }
+
 export interface ClientToServerEvents {
   action: (arg0: { nodeId: number; action: Action }) => void
-  state: (arg0: { nodeId: number; state: any }) => void
+  state: (
+    arg0: { nodeId: number; state: any },
+    callback?: (res: StateSaveResponse) => void
+  ) => void
+  // incremental autosave on top of the state saved with version
+  state_patch: (
+    arg0: {
+      nodeId: number
+      version: number
+      patch: any
+      format?: "merge" | "json-patch"
+    },
+    callback?: (res: StateSaveResponse) => void
+  ) => void
   join: (arg0: {
     journeyId: string
     nodeId: number
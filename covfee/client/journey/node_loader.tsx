@@ -7,6 +7,7 @@ import { Store, configureStore } from "@reduxjs/toolkit"
 import { Provider as StoreProvider } from "react-redux"
 import { BaseTaskProps } from "tasks/base"
 import { ServerToClientEvents, appContext } from "../app_context"
+import { createMergePatch } from "../merge_patch"
 import { useNode } from "../models/Node"
 import { getTask } from "../task_utils"
 import { NodeType } from "../types/node"
@@ -99,15 +100,39 @@ export const NodeLoader: React.FC<Props> = (props: Props) => {
     })
   }, [args.node.id, journeyId, socket, useSharedState])
 
+  // last state saved in the server and its version, base for state patches
+  const savedState = React.useRef<{ version: number; state: any }>(null)
+
+  const emitFullState = React.useCallback(
+    (state: any) => {
+      socket.emit("state", { nodeId: node.id, state }, (res) => {
+        savedState.current = res.success ? { version: res.version, state } : null
+      })
+      console.log("emit: state", state)
+    },
+    [node.id, socket]
+  )
+
   const emitState = React.useCallback(() => {
     if (reduxStore.current === null) {
       return console.error("emitState called when reduxStore is null")
     }
 
     const state = reduxStore.current.getState()
-    socket.emit("state", { nodeId: node.id, state })
-    console.log("emit: state", state)
-  }, [node.id, socket])
+    const base = savedState.current
+    const patch = base !== null ? createMergePatch(base.state, state) : undefined
+    if (patch === undefined) return emitFullState(state)
+
+    socket.emit(
+      "state_patch",
+      { nodeId: node.id, version: base.version, patch },
+      (res) => {
+        if (res.success) savedState.current = { version: res.version, state }
+        else emitFullState(state) // server asked for a resync
+      }
+    )
+    console.log("emit: state_patch", patch)
+  }, [emitFullState, node.id, socket])
 
   React.useEffect(() => {
     // emit state when the component unmounts
@@ -137,6 +162,10 @@ export const NodeLoader: React.FC<Props> = (props: Props) => {
         })
       }
       setResponse(data.response)
+      savedState.current =
+        data.state_version !== undefined
+          ? { version: data.state_version, state: data.response.state }
+          : null
 
       if (taskSlice !== null) {
         // We create the reduxStore here to ensure that the initial state is accessible to the task on first render
@@ -262,6 +291,12 @@ export const NodeLoader: React.FC<Props> = (props: Props) => {
       else console.warn("action event received when reduxStore = null")
     }
 
+    const handleActions: ServerToClientEvents["actions"] = ({ actions }) => {
+      if (reduxStore.current !== null)
+        actions.forEach((action) => reduxStore.current.dispatch(action))
+      else console.warn("actions event received when reduxStore = null")
+    }
+
     const handleState: ServerToClientEvents["state"] = (state) => {
       if (reduxStore.current !== null) {
         const action = { type: "task/setState", payload: state.state }
@@ -270,11 +305,13 @@ export const NodeLoader: React.FC<Props> = (props: Props) => {
     }
 
     socket.on("action", handleAction)
+    socket.on("actions", handleActions)
 
     socket.on("state", handleState)
 
     return () => {
       socket.off("action", handleAction)
+      socket.off("actions", handleActions)
       socket.off("state", handleState)
     }
   }, [socket])
@@ -0,0 +1,34 @@
+const isPlainObject = (value: any) =>
+  value !== null && typeof value === "object" && !Array.isArray(value)
+
+// whether value is null or holds a null at any depth
+const containsNull = (value: any): boolean =>
+  value === null ||
+  (typeof value === "object" && Object.values(value).some(containsNull))
+
+/**
+ * Computes the JSON merge patch (RFC 7386) that turns source into target.
+ * Merge patches use null to remove keys, so they cannot set a value to null:
+ * returns undefined in that case, and the full target should be sent instead.
+ */
+export function createMergePatch(source: any, target: any): any {
+  if (!isPlainObject(source) || !isPlainObject(target)) {
+    return containsNull(target) ? undefined : target
+  }
+
+  const patch: { [key: string]: any } = {}
+  for (const key of Object.keys(source)) {
+    if (!(key in target)) patch[key] = null
+  }
+  for (const key of Object.keys(target)) {
+    if (JSON.stringify(source[key]) === JSON.stringify(target[key])) continue
+    // new keys are diffed against {}, so that nulls nested in them are caught
+    const value = createMergePatch(
+      key in source ? source[key] : {},
+      target[key]
+    )
+    if (value === undefined) return undefined
+    patch[key] = value
+  }
+  return patch
+}
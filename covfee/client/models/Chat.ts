@@ -328,9 +328,17 @@ export const useChats = ({
 
 export type UseChats = ReturnType<typeof useChats>
 
+// the API returns at most API_MAX_PAGE_SIZE (default 500) chats per request
+const CHATS_PER_REQUEST = 200
+
 export async function getChats(chat_ids: number[]): Promise<ApiChat[]> {
   console.log(`FETCH: chats ${chat_ids}`)
-  const url = Constants.api_url + "/chats/" + chat_ids.join(",")
+  const requests = []
+  for (let i = 0; i < chat_ids.length; i += CHATS_PER_REQUEST) {
+    const ids = chat_ids.slice(i, i + CHATS_PER_REQUEST)
+    const url = Constants.api_url + "/chats/" + ids.join(",")
+    requests.push(fetcher(url).then(throwBadResponse))
+  }
 
-  return await fetcher(url).then(throwBadResponse)
+  return ([] as ApiChat[]).concat(...(await Promise.all(requests)))
 }
@@ -1,124 +1,137 @@
 import Constants from "Constants"
 import React, { useState } from "react"
-import { MainSocket, ServerToClientEvents } from "../app_context"
+import {
+  FeedDelta,
+  FeedPosition,
+  MainSocket,
+  ServerToClientEvents,
+} from "../app_context"
 import { HitInstanceType } from "../types/hit"
-import { NodeType } from "../types/node"
 import { fetcher, throwBadResponse } from "../utils"
-import { JourneyType } from "./Journey"
 
+/**
+ * Applies deltas of the admin feed (AdminFeed in the server) to the hits.
+ * Deltas of hits that are not loaded are ignored.
+ */
+export const applyFeedDeltas = (
+  hits: HitInstanceType[],
+  deltas: FeedDelta[]
+) => {
+  let res = hits
+  for (const { seq, kind, id, hit_id, ...fields } of deltas) {
+    const hitIndex = res.findIndex((hit) => hit.id == hit_id)
+    if (hitIndex == -1) continue
+    const hit = res[hitIndex]
+
+    let newHit: HitInstanceType
+    if (kind == "node") {
+      newHit = {
+        ...hit,
+        nodes: hit.nodes.map((node) =>
+          node.id == id ? { ...node, ...fields } : node
+        ),
+      }
+    } else {
+      let nodes = hit.nodes
+      if ("curr_node_id" in fields) {
+        // the journey is online in its current node
+        nodes = nodes.map((node) => ({
+          ...node,
+          journeys: node.journeys.map((assoc) =>
+            assoc.journey_id == id
+              ? { ...assoc, online: node.id == fields.curr_node_id }
+              : assoc
+          ),
+        }))
+      }
+      newHit = {
+        ...hit,
+        nodes,
+        journeys: hit.journeys.map((journey) =>
+          journey.id == id ? { ...journey, ...fields } : journey
+        ),
+      }
+    }
+    res = Object.assign([], res, { [hitIndex]: newHit })
+  }
+  return res
+}
+
+/**
+ * HIT instances kept up to date with the admin feed
+ * @param onFeedReset called when the feed can no longer be followed (eg. server restart)
+ * and the hits must be reloaded
+ */
 export const useHitInstances = (
   data: HitInstanceType[],
-  socket: MainSocket = null
+  socket: MainSocket = null,
+  onFeedReset: () => void = null
 ) => {
   const [hits, setHits] = useState(data)
-
-  const hitIdToIndex = Object.fromEntries(
-    data.map((hit, index) => [hit.id, index])
-  )
-
-  const journeyIdToIndex = data.map((hit) =>
-    Object.fromEntries(hit.journeys.map((j, i) => [j.id, i]))
-  )
-
-  const nodeIdToIndex = data.map((hit) =>
-    Object.fromEntries(hit.nodes.map((node, i) => [node.id, i]))
-  )
-
-  const setHitData = (
-    hitIndex: number,
-    setter: (arg0: HitInstanceType) => HitInstanceType
-  ) => {
-    setHits((hits) =>
-      Object.assign([], hits, {
-        [hitIndex]: setter(hits[hitIndex]),
-      })
-    )
-  }
-
-  const setNodeData = React.useCallback(
-    (hitIndex: number, nodeIndex: number, data: Partial<NodeType>) => {
-      setHitData(hitIndex, (hit) => ({
-        ...hit,
-        nodes: Object.assign([], hit.nodes, {
-          [nodeIndex]: {
-            ...hit.nodes[nodeIndex],
-            ...data,
-          },
-        }),
-      }))
-    },
-    []
-  )
-
-  const setJourneyData = React.useCallback(
-    (hitIndex: number, journeyIndex: number, data: Partial<JourneyType>) => {
-      // const journeyIds = Object.keys(journeyIdToIndex);
-      // if (!journeyIds.includes(journeyId)) return;
-      // const journeyIndex = journeyIdToIndex[journeyId];
-      setHitData(hitIndex, (hit) => ({
-        ...hit,
-        journeys: Object.assign([], hit.journeys, {
-          [journeyIndex]: {
-            ...hit.journeys[journeyIndex],
-            ...data,
-          },
-        }),
-      }))
-    },
-    []
-  )
+  // position in the feed of the data in hits
+  const feed = React.useRef<FeedPosition>(null)
+  const isCatchingUp = React.useRef<boolean>(false)
+
+  const appendHits = React.useCallback((newHits: HitInstanceType[]) => {
+    setHits((hits) => [...hits, ...newHits])
+  }, [])
+
+  /**
+   * Starts following the feed. Must be called before loading the hits.
+   */
+  const startFeed = React.useCallback(async () => {
+    const { epoch, seq } = await getAdminFeed()
+    feed.current = { epoch, seq }
+  }, [])
+
+  const catchUp = React.useCallback(async () => {
+    if (feed.current === null || isCatchingUp.current) return
+    isCatchingUp.current = true
+    try {
+      const res = await getAdminFeed(feed.current)
+      if (res.reset) {
+        feed.current = { epoch: res.epoch, seq: res.seq }
+        if (onFeedReset) onFeedReset()
+      } else if (res.seq > feed.current.seq) {
+        const deltas = res.deltas.filter((d) => d.seq > feed.current.seq)
+        feed.current = { ...feed.current, seq: res.seq }
+        setHits((hits) => applyFeedDeltas(hits, deltas))
+      }
+    } finally {
+      isCatchingUp.current = false
+    }
+  }, [onFeedReset])
 
   React.useEffect(() => {
-    const statusListener: ServerToClientEvents["status"] = (data) => {
-      console.log("IO: status", data)
-      if (!(data.hit_id in hitIdToIndex)) return
-      const hitIndex = hitIdToIndex[data.hit_id]
-      const nodeIndex = nodeIdToIndex[hitIndex][data.node_id]
-
-      setNodeData(hitIndex, nodeIndex, {
-        status: data.new,
-        manual: data.manual,
-        paused: data.paused,
-        journeys: data.journeys,
-        dt_start: data.dt_start,
-        dt_play: data.dt_play,
-        dt_count: data.dt_count,
-        dt_finish: data.dt_finish,
-        t_elapsed: data.t_elapsed,
-      })
+    const feedListener: ServerToClientEvents["feed"] = (deltas) => {
+      if (feed.current === null || isCatchingUp.current) return
+      const fresh = deltas.filter((d) => d.seq > feed.current.seq)
+      if (fresh.length == 0) return
+      if (fresh[0].seq != feed.current.seq + 1) {
+        // deltas were missed
+        catchUp()
+        return
+      }
+      feed.current = { ...feed.current, seq: fresh[fresh.length - 1].seq }
+      setHits((hits) => applyFeedDeltas(hits, fresh))
     }
 
-    const journeyStatusListener: ServerToClientEvents["journey_status"] = ({
-      hit_id,
-      journey_id,
-      num_connections,
-      status,
-    }) => {
-      console.log("IO: journey_status")
-
-      if (!(hit_id in hitIdToIndex)) return
-      const hitIndex = hitIdToIndex[hit_id]
-      const journeyIndex = journeyIdToIndex[hitIndex][journey_id]
-      setJourneyData(hitIndex, journeyIndex, { num_connections, status })
+    // deltas published while disconnected
+    const connectListener = () => {
+      catchUp()
     }
 
     if (socket) {
-      socket.on("status", statusListener)
-      socket.on("journey_status", journeyStatusListener)
+      socket.on("feed", feedListener)
+      socket.on("connect", connectListener)
     }
     return () => {
-      socket.off("status", statusListener)
-      socket.off("journey_status", journeyStatusListener)
+      if (socket) {
+        socket.off("feed", feedListener)
+        socket.off("connect", connectListener)
+      }
     }
-  }, [
-    socket,
-    hits,
-    hitIdToIndex,
-    nodeIdToIndex,
-    journeyIdToIndex,
-    setNodeData,
-    setJourneyData,
-  ])
+  }, [socket, catchUp])
 
   const setCollapsed = async (value: boolean) => {
     return update({ collapsed: value })
@@ -158,6 +171,8 @@ export const useHitInstances = (
   return {
     hits,
     setHits,
+    appendHits,
+    startFeed,
     update,
     setCollapsed,
     setShowGraph,
@@ -167,15 +182,7 @@ export const useHitInstances = (
 }
 
 export function getHit(id: number) {
-  const url =
-    Constants.api_url +
-    "/hits/" +
-    id +
-    "?" +
-    new URLSearchParams({
-      with_instances: "1",
-      with_instance_nodes: "1",
-    })
+  const url = Constants.api_url + "/hits/" + id
 
   fetcher(url).then(throwBadResponse)
 }
@@ -192,3 +199,23 @@ export function getHitInstance(id: string) {
 
   return fetcher(url).then(throwBadResponse)
 }
+
+/**
+ * Deltas of the admin feed after position
+ * Without position, returns the current position of the feed (and no deltas)
+ * reset is true when the deltas are no longer available, the data must be reloaded
+ */
+export async function getAdminFeed(
+  position: FeedPosition = null
+): Promise<FeedPosition & { deltas: FeedDelta[]; reset?: boolean }> {
+  const params: Record<string, string> = position
+    ? { since: position.seq.toString(), epoch: position.epoch }
+    : {}
+  const url = Constants.api_url + "/admin/feed?" + new URLSearchParams(params)
+
+  const res = await fetcher(url)
+  if (res.status == 410) {
+    return { ...(await res.json()), deltas: [], reset: true }
+  }
+  return throwBadResponse(res)
+}
@@ -2,44 +2,106 @@ import * as React from "react";
 // import React, { useState } from 'react';
 import Constants from "Constants";
 import { fetcher, throwBadResponse } from "../utils";
-import { ProjectType } from "types/project";
+import { PageType, ProjectSummaryType, ProjectType } from "types/project";
+import { HitInstanceType } from "types/hit";
 import { useHitInstances } from "./Hits";
 import { MainSocket } from "../app_context";
 
+/**
+ * Project with its HIT instances loaded page by page
+ * data.hits holds the instances loaded so far (usually none)
+ */
 export function useProject(data: ProjectType, socket: MainSocket = null) {
   const { hits, ...projectWithoutHits } = data;
   const [_project, _setProject] = React.useState(projectWithoutHits);
-  const allHits = useHitInstances(hits, socket);
+  const [summary, setSummary] = React.useState<ProjectSummaryType>(null);
+  const [nextCursor, setNextCursor] = React.useState<string>(undefined);
+  // reloads the first page of hits when the admin feed is reset
+  const reload = React.useRef<() => void>(null);
+  const onFeedReset = React.useCallback(() => reload.current(), []);
+  const allHits = useHitInstances(hits, socket, onFeedReset);
 
-  const { setHits: _setHits } = allHits;
+  const { setHits, appendHits } = allHits;
+
+  const refreshSummary = React.useCallback(() => {
+    return getProjectSummary(data.id).then(setSummary);
+  }, [data.id]);
+
+  reload.current = () => {
+    getProjectInstances(data.id).then((page) => {
+      setHits(page.items);
+      setNextCursor(page.next_cursor);
+    });
+    refreshSummary();
+  };
+
+  // resolves to the loaded page, null if there are no more pages
+  const loadMoreHits = React.useCallback(async () => {
+    if (nextCursor === null) return null;
+    const page = await getProjectInstances(data.id, nextCursor);
+    appendHits(page.items);
+    setNextCursor(page.next_cursor);
+    return page;
+  }, [data.id, nextCursor, appendHits]);
 
   return {
     project: { ..._project, hits: allHits.hits },
+    summary,
+    refreshSummary,
+    hasMoreHits: nextCursor !== null,
+    loadMoreHits,
     ...allHits,
   };
 }
 
 export function getProject(id: number): Promise<ProjectType> {
-  const url =
-    Constants.api_url +
-    "/projects/" +
-    id +
-    "?" +
-    new URLSearchParams({
-      with_hits: "1",
-      with_hit_nodes: "1",
-    });
+  const url = Constants.api_url + "/projects/" + id;
+
+  return fetcher(url)
+    .then(throwBadResponse)
+    .then((project) => ({ ...project, hits: [] }));
+}
+
+export function getProjectSummary(id: number): Promise<ProjectSummaryType> {
+  const url = Constants.api_url + "/projects/" + id + "/summary";
 
   return fetcher(url).then(throwBadResponse);
 }
 
-export function getAllProjects() {
+export function getProjectInstances(
+  id: number,
+  cursor: string = undefined,
+  limit = 50
+): Promise<PageType<HitInstanceType>> {
+  const params: Record<string, string> = {
+    with_nodes: "1",
+    limit: limit.toString(),
+  };
+  if (cursor) params.cursor = cursor;
+
   const url =
     Constants.api_url +
-    "/projects?" +
-    new URLSearchParams({
-      with_hits: "1",
-    });
+    "/projects/" +
+    id +
+    "/instances?" +
+    new URLSearchParams(params);
 
   return fetcher(url).then(throwBadResponse);
 }
+
+export async function getAllProjects(): Promise<ProjectType[]> {
+  const projects: ProjectType[] = [];
+  let cursor: string = null;
+  do {
+    const url =
+      Constants.api_url +
+      "/projects?" +
+      new URLSearchParams(cursor ? { cursor } : {});
+    const page: PageType<ProjectType> = await fetcher(url).then(
+      throwBadResponse
+    );
+    projects.push(...page.items);
+    cursor = page.next_cursor;
+  } while (cursor);
+  return projects;
+}
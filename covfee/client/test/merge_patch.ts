@@ -0,0 +1,65 @@
+import { strict as assert } from "assert"
+import { execFileSync } from "child_process"
+import * as path from "path"
+
+import { createMergePatch } from "../merge_patch"
+
+// applies each [source, patch] pair with the server's apply_merge_patch,
+// using the Python interpreter in $PYTHON (python by default)
+function applyOnServer(pairs: [any, any][]): any[] {
+  const script = [
+    "import json, sys",
+    "from covfee.server.socketio.state_patch import apply_merge_patch",
+    "print(json.dumps([apply_merge_patch(s, p) for s, p in json.load(sys.stdin)]))",
+  ].join("\n")
+  const out = execFileSync(process.env.PYTHON || "python", ["-c", script], {
+    cwd: path.resolve(__dirname, "../../.."),
+    input: JSON.stringify(pairs),
+  })
+  return JSON.parse(out.toString())
+}
+
+describe("createMergePatch", () => {
+  it("round-trips through the server's apply_merge_patch", () => {
+    const cases: [any, any][] = [
+      [{ a: 1 }, { a: 2 }],
+      [{ a: 1, b: 2 }, { a: 1 }],
+      [{ a: { b: 1, c: 2 } }, { a: { b: 1 } }],
+      [{ a: 1 }, { a: 1, b: { c: { d: [1, 2] } } }],
+      [{ a: [1, 2] }, { a: [1] }],
+      [{}, { b: {} }],
+      [{ a: { b: 1 } }, { a: "x" }],
+      [{ a: "x" }, { a: { b: 1 } }],
+      // nested nulls, the client falls back to sending the full state
+      [{ a: 1 }, { a: 1, b: { c: null } }],
+      [{ a: {} }, { a: { c: [null] } }],
+    ]
+    const patches = cases.map(([source, target]) =>
+      createMergePatch(source, target)
+    )
+    const results = applyOnServer(
+      cases.map(([source], i): [any, any] => [source, patches[i] ?? null])
+    )
+    results.forEach((result, i) => {
+      // without a patch, the full state is sent and saved as is
+      const saved = patches[i] === undefined ? cases[i][1] : result
+      assert.deepEqual(saved, cases[i][1])
+    })
+  })
+
+  it("gives up on targets with nulls, which a merge patch would delete", () => {
+    const cases: [any, any][] = [
+      [{ a: 1 }, { a: null }],
+      [{ a: 1 }, { a: 1, b: { c: null } }],
+      [{ a: {} }, { a: { c: null } }],
+      [{ a: 1 }, { b: [1, null] }],
+      [{ a: [1] }, { a: [1, { b: null }] }],
+      [{ a: "null" }, { a: "null", b: { c: [{ d: null }] } }],
+    ]
+    for (const [source, target] of cases) {
+      assert.equal(createMergePatch(source, target), undefined)
+    }
+    // strings that spell null are regular values
+    assert.deepEqual(createMergePatch({ a: 1 }, { a: "null" }), { a: "null" })
+  })
+})
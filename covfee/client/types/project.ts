@@ -5,3 +5,38 @@ export interface ProjectType extends Omit<ProjectSpec, "hits"> {
   hitSpecs: HitType[];
   hits: HitInstanceType[];
 }
+
+export interface StatusCountsType {
+  total: number;
+  status: Record<string, number>;
+}
+
+export interface JourneyCountsType extends StatusCountsType {
+  online: number;
+  submitted: number;
+}
+
+export interface HitSummaryType {
+  id: number;
+  name: string;
+  num_instances: number;
+  num_submitted_instances: number;
+  journeys: JourneyCountsType;
+  nodes: StatusCountsType;
+  nodespecs: (StatusCountsType & { id: number; name: string })[];
+}
+
+export interface ProjectSummaryType {
+  id: number;
+  name: string;
+  num_instances: number;
+  num_submitted_instances: number;
+  journeys: JourneyCountsType;
+  nodes: StatusCountsType;
+  hitSpecs: HitSummaryType[];
+}
+
+export interface PageType<T> {
+  items: T[];
+  next_cursor: string | null;
+}
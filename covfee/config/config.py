@@ -66,7 +66,10 @@ class Config(flask.Config):
             # copy over secret key
             JWT_SECRET_KEY=self["COVFEE_SECRET_KEY"],
             # create sqlalchemy database uri
-            SQLALCHEMY_DATABASE_URI=f'sqlite:///{self["DATABASE_PATH"]}',
+            SQLALCHEMY_DATABASE_URI=(
+                self._get_optional_string("DATABASE_URL")
+                or f'sqlite:///{self["DATABASE_PATH"]}'
+            ),
             # create derived URLs
             BUNDLES_URL=self["BASE_URL"] + "/bundles",
             PROJECT_WWW_URL=self.get("PROJECT_WWW_URL", self["BASE_URL"] + "/www"),
@@ -7,11 +7,12 @@ from typing import List
 from click import Path
 from colorama import Fore
 from halo.halo import Halo
+from sqlalchemy import inspect, literal, text
 
 from covfee.cli.utils import working_directory
 from covfee.config import Config
 from covfee.server.app import create_app_and_socketio
-from covfee.server.db import get_engine, get_session_local
+from covfee.server.db import get_engine_from_config, get_session_local
 
 from .server.orm import Base, Project, User
 
@@ -48,7 +49,7 @@ class Launcher:
         self.folder = folder
         self.auth_enabled = auth_enabled
 
-        self.engine = get_engine(in_memory=False, db_path=self.config["DATABASE_PATH"])
+        self.engine = get_engine_from_config(self.config)
         self.session_local = get_session_local(self.engine)
 
     def make_database(self, force=False, with_spinner=False):
@@ -83,6 +84,41 @@ class Launcher:
         if drop:
             Base.metadata.drop_all(self.engine)
         Base.metadata.create_all(self.engine)
+        # create_all skips existing tables, add the columns and indexes introduced after they were created
+        self.add_missing_columns()
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(self.engine, checkfirst=True)
+
+    def add_missing_columns(self):
+        """Adds the columns of the models that are missing from existing tables.
+        Only columns that are nullable or have a scalar default (eg. Annotation.version) can
+        be added, existing rows get the default.
+        """
+        dialect = self.engine.dialect
+        preparer = dialect.identifier_preparer
+        inspector = inspect(self.engine)
+        with self.engine.begin() as connection:
+            for table in Base.metadata.sorted_tables:
+                existing = {c["name"] for c in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in existing:
+                        continue
+                    ddl = f"{preparer.format_column(column)} {column.type.compile(dialect)}"
+                    if column.default is not None and column.default.is_scalar:
+                        default = literal(column.default.arg, column.type).compile(
+                            dialect=dialect, compile_kwargs={"literal_binds": True}
+                        )
+                        ddl += f" DEFAULT {default}"
+                        if not column.nullable:
+                            ddl += " NOT NULL"
+                    elif not column.nullable:
+                        raise RuntimeError(
+                            f"Column {table.name}.{column.name} is missing from the database and cannot be added"
+                        )
+                    connection.execute(
+                        text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {ddl}")
+                    )
 
     def create_admin(self):
         default_username = self.config["DEFAULT_ADMIN_USERNAME"]
@@ -129,6 +165,8 @@ class Launcher:
             port=port,
             debug=self.environment == "dev",
             use_reloader=self.environment == "dev",
+            # concurrent requests, socket.io long-polling requests included
+            max_size=app.config["SERVER_MAX_CONNECTIONS"],
             **ssl_options,
         )
 
@@ -162,8 +200,9 @@ class Launcher:
             session.commit()
 
     def init_folder(self):
-        database_dir = FilePath(self.config["DATABASE_PATH"]).parent
-        database_dir.mkdir(parents=True, exist_ok=True)
+        if self.engine.dialect.name == "sqlite":
+            database_dir = FilePath(self.config["DATABASE_PATH"]).parent
+            database_dir.mkdir(parents=True, exist_ok=True)
 
         project_root = FilePath(self.folder) if self.folder is not None else FilePath.cwd()
         media_path = project_root / "www" / "media"
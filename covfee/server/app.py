@@ -1,4 +1,3 @@
-import inspect
 import json
 import os
 
@@ -11,11 +10,10 @@ from flask_session import Session
 from sqlalchemy.orm import scoped_session
 
 from covfee.config import Config
-from covfee.server import tasks
 from covfee.server.orm.base import Base
-from covfee.server.tasks.base import BaseCovfeeTask
+from covfee.server.tasks.registry import task_registry
 
-from .scheduler.apscheduler import scheduler
+from .scheduler.timers import reconcile_timers, scheduler
 
 
 def create_app_and_socketio(
@@ -37,11 +35,9 @@ def create_app_and_socketio(
     app.json = CovfeeJSONProvider(app)
 
     if session_local is None:
-        from .db import get_session_local
+        from .db import get_engine_from_config, get_session_local
 
-        session_local = get_session_local(
-            in_memory=False, db_path=config["DATABASE_PATH"]
-        )
+        session_local = get_session_local(get_engine_from_config(config))
 
     app.sessionmaker = session_local
     Base.sessionmaker = session_local
@@ -55,7 +51,11 @@ def create_app_and_socketio(
     from .socketio.socket import socketio
 
     # important: here, set socketio json implementation too
-    socketio.init_app(app, manage_session=True, json=app.json)
+    # with a message queue, events emitted by one worker reach the clients of all the workers
+    message_queue = app.config["SOCKETIO_MESSAGE_QUEUE"]
+    socketio.init_app(
+        app, manage_session=True, json=app.json, message_queue=message_queue
+    )
 
     app.register_blueprint(frontend, url_prefix="/")
     from .rest_api import api, auth
@@ -64,13 +64,11 @@ def create_app_and_socketio(
     app.register_blueprint(auth, url_prefix="/auth")
 
     # register the task blueprints
-    for name in dir(tasks):
-        elem = getattr(tasks, name)
-        if inspect.isclass(elem) and issubclass(elem, BaseCovfeeTask):
-            blueprint = elem.get_blueprint()
-            if blueprint is not None:
-                print(f"Registering blueprint for task {elem.__name__}")
-                app.register_blueprint(blueprint, url_prefix=f"/custom/{elem.__name__}")
+    for task_class in task_registry.classes.values():
+        blueprint = task_class.get_blueprint()
+        if blueprint is not None:
+            print(f"Registering blueprint for task {task_class.__name__}")
+            app.register_blueprint(blueprint, url_prefix=f"/custom/{task_class.__name__}")
 
     CORS(app, resources={r"/*": {"origins": "*"}})
     app.config["SECRET_KEY"] = "Meow Meow"
@@ -86,10 +84,30 @@ def create_app_and_socketio(
     jwt.user_identity_loader(user_identity_lookup)
     jwt.user_lookup_loader(user_loader_callback)
 
-    # APScheduler
-    # app.scheduler = BackgroundScheduler()
+    # node timers, restored from the status of the nodes.
+    # With several workers every one restores them: fire_timers locks the nodes and
+    # re-checks their pending timers, so a timer that fires twice is applied once
+    with session_local() as session:
+        reconcile_timers(session, app.config["SCHEDULER_MISFIRE_GRACE_TIME"])
     scheduler.start()
 
+    from .hub import hub_monitor
+    from .socketio.socket import admin_feed, checkpointer, store
+
+    hub_monitor.start(app.config["HUB_STALL_THRESHOLD"])
+
+    # workers share the admin feed through the database
+    admin_feed.configure(app.config["ADMIN_FEED_SIZE"], shared=bool(message_queue))
+
+    store.configure(app.config["REDUX_STORE_TIMEOUT"])
+
+    # periodic persistence of the shared (redux) state of tasks
+    checkpointer.start(
+        session_local,
+        app.config["REDUX_STORE_CHECKPOINT_INTERVAL"],
+        app.config["REDUX_STORE_CHECKPOINT_MAX_BATCH"],
+    )
+
     @app.teardown_appcontext
     def teardown_appctx(exception):
         app.session.remove()
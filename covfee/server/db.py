@@ -1,9 +1,98 @@
-from sqlalchemy import create_engine
+import sqlite3
+
+from eventlet import tpool
+from sqlalchemy import create_engine, event, make_url
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+# PRAGMA sets applied to every new SQLite connection.
+# "default" leaves SQLite untouched (rollback journal, synchronous=FULL).
+# "production" switches to WAL so that readers do not block the writer,
+# waits on locks instead of failing with "database is locked" and trades
+# a little durability on power loss for much cheaper commits.
+SQLITE_PROFILES = {
+    "default": {},
+    "production": {
+        "journal_mode": "WAL",
+        "busy_timeout": 5000,  # ms
+        "synchronous": "NORMAL",
+        "cache_size": -64000,  # negative means KiB, ie. 64MB
+        "mmap_size": 268435456,  # 256MB
+    },
+}
+
+
+def get_sqlite_pragmas(config):
+    """Returns the PRAGMA dict for the SQLite profile selected in config.
+    Values in config["SQLITE_PRAGMAS"] override those of the profile.
+    """
+    profile = config.get("SQLITE_PROFILE", "default")
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLITE_PROFILE {profile}")
+    return {**SQLITE_PROFILES[profile], **(config.get("SQLITE_PRAGMAS") or {})}
+
+
+def set_sqlite_pragmas(engine, pragmas):
+    """Registers a connect hook that applies the pragmas to every new DBAPI connection"""
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def use_tpool(engine):
+    """Runs every call on the SQLite connections of the engine in eventlet's thread pool.
+    sqlite3 is a C library that eventlet cannot make green: without this, a slow query or the
+    fsync of a commit blocks every green thread of the server.
+    """
 
+    @event.listens_for(engine, "do_connect")
+    def on_do_connect(dialect, connection_record, cargs, cparams):
+        connection = tpool.execute(dialect.loaded_dbapi.connect, *cargs, **cparams)
+        return tpool.Proxy(connection, autowrap=(sqlite3.Cursor,))
 
-def get_engine(in_memory=False, db_path=None, echo=False):
-    if in_memory:
+
+def make_psycopg_green():
+    """Makes psycopg2 wait for the server cooperatively, yielding to other green threads"""
+    try:
+        from eventlet.support import psycopg2_patcher
+    except ImportError:
+        return
+    psycopg2_patcher.make_psycopg_green()
+
+
+def get_pool_options(config):
+    """Returns the connection pool options for server databases (eg. PostgreSQL)"""
+    return {
+        "poolclass": QueuePool,
+        "pool_size": config.get("DATABASE_POOL_SIZE", 20),
+        "max_overflow": config.get("DATABASE_MAX_OVERFLOW", 40),
+        "pool_timeout": config.get("DATABASE_POOL_TIMEOUT", 30),
+        # recycle connections before the server or a proxy drops them
+        "pool_recycle": config.get("DATABASE_POOL_RECYCLE", 1800),
+        # test connections on checkout, so that restarts of the DB are survived
+        "pool_pre_ping": config.get("DATABASE_POOL_PRE_PING", True),
+    }
+
+
+def get_engine(
+    in_memory=False,
+    db_path=None,
+    echo=False,
+    pragmas=None,
+    url=None,
+    pool_options=None,
+    in_tpool=False,
+):
+    if url is not None:
+        print(f"Creating engine at {make_url(url).render_as_string(hide_password=True)}")
+        return create_engine(url, echo=echo, **(pool_options or {}))
+    elif in_memory:
         print(f"Creating in-memory engine")
         # NOTE: In-memory creates a very nasty issue
         # the sessions seem to die when the handler does async stuff
@@ -16,7 +105,31 @@ def get_engine(in_memory=False, db_path=None, echo=False):
     else:
         assert db_path is not None
         print(f"Creating file system engine at {db_path}")
-        return create_engine(f"sqlite:///{db_path}", echo_pool=True)
+        engine = create_engine(f"sqlite:///{db_path}", echo_pool=True)
+        if in_tpool:
+            use_tpool(engine)
+        set_sqlite_pragmas(engine, pragmas)
+        return engine
+
+
+def get_engine_from_config(config, echo=False):
+    """Creates the engine for config["SQLALCHEMY_DATABASE_URI"].
+    SQLite URLs get the pragma profile, other backends get a connection pool.
+    """
+    url = config["SQLALCHEMY_DATABASE_URI"]
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        # takes effect if the pool was not started yet
+        tpool.set_num_threads(config.get("TPOOL_SIZE", 20))
+        return get_engine(
+            db_path=config["DATABASE_PATH"],
+            echo=echo,
+            pragmas=get_sqlite_pragmas(config),
+            in_tpool=config.get("SQLITE_TPOOL", False),
+        )
+    if backend == "postgresql":
+        make_psycopg_green()
+    return get_engine(url=url, echo=echo, pool_options=get_pool_options(config))
 
 
 def get_session_local(engine=None, **kwargs):
@@ -0,0 +1,41 @@
+import time
+
+import eventlet
+
+from covfee.logger import logger
+
+
+class HubMonitor:
+    """Reports stalls of the eventlet hub.
+    All the green threads of a server (socket.io handlers, timers, checkpoints) share one OS thread,
+    so a blocking call delays every connected participant. A green thread that asks to wake up every
+    interval seconds measures how late it is woken up. Delays above threshold are logged as stalls.
+    """
+
+    def __init__(self):
+        self.greenlet = None
+        self.num_stalls = 0
+        self.max_stall = 0.0
+
+    def start(self, threshold: float, interval=0.05):
+        if not threshold or self.greenlet is not None:
+            return
+        self.greenlet = eventlet.spawn(self._run, interval, threshold)
+
+    def stop(self):
+        if self.greenlet is not None:
+            self.greenlet.kill()
+            self.greenlet = None
+
+    def _run(self, interval: float, threshold: float):
+        while True:
+            start = time.monotonic()
+            eventlet.sleep(interval)
+            stall = time.monotonic() - start - interval
+            if stall > threshold:
+                self.num_stalls += 1
+                self.max_stall = max(self.max_stall, stall)
+                logger.warning(f"HubMonitor: event loop blocked for {stall * 1000:.0f}ms")
+
+
+hub_monitor = HubMonitor()
@@ -7,6 +7,8 @@ from .task import *
 from .response import *
 from .user import *
 from .chat import *
+from .feed import *
+from . import loaders
 
 
 def set_sessionmaker(sessionmaker):
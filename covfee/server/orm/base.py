@@ -4,13 +4,15 @@ import secrets
 from typing import Any, Dict
 
 from sqlalchemy import JSON
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase
 
 from . import utils
 
 
 class Base(DeclarativeBase):
-    type_annotation_map = {Dict[str, Any]: JSON}
+    # JSON columns are stored as JSONB in PostgreSQL
+    type_annotation_map = {Dict[str, Any]: JSON().with_variant(JSONB(), "postgresql")}
 
     # random unique ID to use as hash key
     _unique_id: int
@@ -19,7 +21,7 @@ class Base(DeclarativeBase):
     _config: Dict[str, Any]
 
     # keeps a reference to the app's sessionmaker
-    # necessary to create sessions from apscheduler
+    # necessary to create sessions from the timer scheduler
     sessionmaker = None
     
     def init(self):
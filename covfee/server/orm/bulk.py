@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import secrets
+from collections import defaultdict
+from typing import TYPE_CHECKING, Dict, List
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session, joinedload
+
+from ..tasks.base import BaseCovfeeTask
+from ..tasks.registry import task_registry
+from .chat import Chat, ChatJourney
+from .hit import HITInstance
+from .journey import JourneyInstance
+from .node import JourneyNode, NodeInstance
+from .response import TaskResponse
+from .task import TaskInstance, TaskSpec
+
+if TYPE_CHECKING:
+    from .hit import HITSpec
+
+
+class HITInstantiator:
+    """Creates many instances of a (persisted) HITSpec with bulk INSERTs.
+    Equivalent to calling HITSpec.instantiate(n), but instead of building
+    the ORM graph of every instance it:
+    - computes the node graph of the HIT once
+    - emits the rows of each table with one executemany per batch
+    - calls the on_create hooks once per batch and task type (BaseCovfeeTask.on_create_batch)
+    """
+
+    def __init__(self, hitspec: HITSpec):
+        self.hitspec_id = hitspec.id
+
+        # unique nodespecs in order of first appearance, like HITInstance.__init__
+        self.nodespecs = []
+        nodespec_index: Dict[int, int] = {}
+
+        # journeys[i] holds the (nodespec index, player, order) of journey i
+        self.journeys = []
+        for journeyspec in hitspec.journeyspecs:
+            nodes = []
+            for order, assoc in enumerate(journeyspec.nodespec_associations):
+                if assoc.nodespec_id not in nodespec_index:
+                    nodespec_index[assoc.nodespec_id] = len(self.nodespecs)
+                    self.nodespecs.append(assoc.nodespec)
+                nodes.append((nodespec_index[assoc.nodespec_id], assoc.player, order))
+            self.journeys.append((journeyspec.id, nodes))
+
+        # task class of every node, None for non-task nodes
+        self.task_classes = [
+            task_registry.get(nodespec.spec["type"])
+            if isinstance(nodespec, TaskSpec)
+            else None
+            for nodespec in self.nodespecs
+        ]
+
+        # journeys containing each node, used for the node chats
+        self.node_journeys = [[] for _ in self.nodespecs]
+        for j, (_, nodes) in enumerate(self.journeys):
+            for n, _, _ in nodes:
+                if j not in self.node_journeys[n]:
+                    self.node_journeys[n].append(j)
+
+    def _insert_returning_ids(self, session: Session, table, rows):
+        if not rows:
+            return []
+        stmt = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+        return list(session.execute(stmt, rows).scalars())
+
+    def _insert(self, session: Session, table, rows):
+        if rows:
+            session.execute(insert(table), rows)
+
+    def _instantiate_batch(self, session: Session, n: int) -> List[bytes]:
+        hit_ids = [secrets.token_bytes(32) for _ in range(n)]
+        journey_ids = [
+            [secrets.token_bytes(32) for _ in self.journeys] for _ in range(n)
+        ]
+
+        self._insert(
+            session,
+            HITInstance.__table__,
+            [{"id": hit_id, "hitspec_id": self.hitspec_id} for hit_id in hit_ids],
+        )
+        self._insert(
+            session,
+            JourneyInstance.__table__,
+            [
+                {
+                    "id": journey_ids[i][j],
+                    "journeyspec_id": journeyspec_id,
+                    "hit_id": hit_id,
+                    "interface": {},
+                    "aux": {},
+                    "config": {},
+                }
+                for i, hit_id in enumerate(hit_ids)
+                for j, (journeyspec_id, _) in enumerate(self.journeys)
+            ],
+        )
+
+        node_rows = []
+        for hit_id in hit_ids:
+            for nodespec in self.nodespecs:
+                is_task = isinstance(nodespec, TaskSpec)
+                node_rows.append(
+                    {
+                        "type": "TaskInstance" if is_task else "NodeInstance",
+                        "nodespec_id": nodespec.id,
+                        "hit_id": hit_id,
+                        "aux": {} if is_task else None,
+                        "t_elapsed": 0,
+                    }
+                )
+        flat_node_ids = self._insert_returning_ids(
+            session, NodeInstance.__table__, node_rows
+        )
+        num_nodes = len(self.nodespecs)
+        node_ids = [
+            flat_node_ids[i * num_nodes : (i + 1) * num_nodes] for i in range(n)
+        ]
+
+        self._insert(
+            session,
+            JourneyNode.__table__,
+            [
+                {
+                    "journey_id": journey_ids[i][j],
+                    "node_id": node_ids[i][node],
+                    "player": player,
+                    "order": order,
+                }
+                for i in range(n)
+                for j, (_, nodes) in enumerate(self.journeys)
+                for node, player, order in nodes
+            ],
+        )
+
+        # one chat per journey and one per node
+        chat_ids = self._insert_returning_ids(
+            session,
+            Chat.__table__,
+            [
+                {"journey_id": journey_id, "node_id": None}
+                for i in range(n)
+                for journey_id in journey_ids[i]
+            ]
+            + [
+                {"journey_id": None, "node_id": node_id}
+                for i in range(n)
+                for node_id in node_ids[i]
+            ],
+        )
+        journey_chat_ids = chat_ids[: n * len(self.journeys)]
+        node_chat_ids = chat_ids[n * len(self.journeys) :]
+
+        chat_journey_rows = [
+            {"journeyinstance_id": journey_id, "chat_id": chat_id}
+            for journey_id, chat_id in zip(
+                (jid for i in range(n) for jid in journey_ids[i]), journey_chat_ids
+            )
+        ]
+        for i in range(n):
+            for node in range(num_nodes):
+                for j in self.node_journeys[node]:
+                    chat_journey_rows.append(
+                        {
+                            "journeyinstance_id": journey_ids[i][j],
+                            "chat_id": node_chat_ids[i * num_nodes + node],
+                        }
+                    )
+        self._insert(session, ChatJourney.__table__, chat_journey_rows)
+
+        # initial empty response of every task
+        self._insert(
+            session,
+            TaskResponse.__table__,
+            [
+                {"node_id": node_id, "state": None, "submitted": False, "valid": False}
+                for node_id, row in zip(flat_node_ids, node_rows)
+                if row["type"] == "TaskInstance"
+            ],
+        )
+
+        task_ids = defaultdict(list)
+        for i in range(n):
+            for node, task_class in enumerate(self.task_classes):
+                if task_class is not None:
+                    task_ids[task_class].append(node_ids[i][node])
+        self._call_on_create(session, task_ids)
+        return hit_ids
+
+    @staticmethod
+    def _has_create_hooks(task_class):
+        return (
+            task_class.on_create is not BaseCovfeeTask.on_create
+            or task_class.on_create_batch.__func__
+            is not BaseCovfeeTask.on_create_batch.__func__
+        )
+
+    def _call_on_create(self, session: Session, task_ids: Dict[type, List[int]]):
+        connection = session.connection()
+        for task_class, class_task_ids in task_ids.items():
+            # the default hooks do nothing, skip loading the tasks
+            if not self._has_create_hooks(task_class):
+                continue
+
+            class_tasks = (
+                session.execute(
+                    select(TaskInstance)
+                    .where(TaskInstance.id.in_(class_task_ids))
+                    .options(joinedload(TaskInstance.spec))
+                )
+                .scalars()
+                .all()
+            )
+            task_class.on_create_batch(class_tasks, connection)
+
+    def instantiate(self, session: Session, n=1, batch_size=200) -> List[bytes]:
+        """Inserts n instances and returns their ids.
+        Rows are flushed in batches of batch_size instances to bound the
+        size of each statement. The caller is responsible for committing.
+        """
+        hit_ids = []
+        for start in range(0, n, batch_size):
+            hit_ids += self._instantiate_batch(session, min(batch_size, n - start))
+        return hit_ids
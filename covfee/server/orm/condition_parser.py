@@ -1,4 +1,6 @@
-from typing import Dict
+import functools
+import operator
+from typing import Any, Callable, Dict
 from pyparsing import (
     Word,
     alphas,
@@ -36,37 +38,85 @@ expression = infixNotation(
 parse_expression = expression.parseString
 
 
-def eval_expression(parsed, var_values):
+comparison_functions = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def compile_parsed(parsed) -> Callable[[Dict], Any]:
+    """Turns a parse tree into a closure that evaluates it for some var_values.
+    Chains of AND / OR are folded left to right, and chained comparisons
+    (eg. 1 < N < 3) are evaluated pairwise like in Python.
+    """
     if isinstance(parsed, str):
-        if parsed in var_values:
-            return var_values[parsed]
-        else:
-            # Assume it's a literal number
-            return float(parsed)
-    else:
-        if len(parsed) == 1:
-            return eval_expression(parsed[0], var_values)
-        elif len(parsed) == 2:
-            assert parsed[0] == "NOT"
-            return not eval_expression(parsed[1], var_values)
-        elif len(parsed) == 3:
-            op = parsed[1]
-            if op in ["<", "<=", ">", ">="]:
-                # Comparison operators
-                left = eval_expression(parsed[0], var_values)
-                right = eval_expression(parsed[2], var_values)
-                return eval(f"{left} {op} {right}")
-            elif op in ["AND", "OR"]:
-                # Logical operators
-                left = eval_expression(parsed[0], var_values)
-                right = eval_expression(parsed[2], var_values)
-                if op == "AND":
-                    return left and right
-                elif op == "OR":
-                    return left or right
-        else:
-            raise NotImplementedError()
+        try:
+            value = float(parsed)
+            return lambda var_values: value
+        except ValueError:
+            return lambda var_values: var_values[parsed]
+
+    if len(parsed) == 1:
+        return compile_parsed(parsed[0])
+
+    if len(parsed) == 2:
+        assert parsed[0] == "NOT"
+        inner = compile_parsed(parsed[1])
+        return lambda var_values: not inner(var_values)
+
+    if len(parsed) % 2 == 0:
+        raise NotImplementedError()
+
+    operands = [compile_parsed(p) for p in parsed[::2]]
+    operators = list(parsed[1::2])
+
+    if all(op in comparison_functions for op in operators):
+        comparisons = [
+            (comparison_functions[op], left, right)
+            for op, left, right in zip(operators, operands, operands[1:])
+        ]
+        if len(comparisons) == 1:
+            fn, left, right = comparisons[0]
+            return lambda var_values: fn(left(var_values), right(var_values))
+        return lambda var_values: all(
+            fn(left(var_values), right(var_values)) for fn, left, right in comparisons
+        )
+
+    if all(op == "AND" for op in operators):
+
+        def eval_and(var_values):
+            result = True
+            for operand in operands:
+                result = result and operand(var_values)
+                if not result:
+                    return result
+            return result
+
+        return eval_and
+
+    if all(op == "OR" for op in operators):
+
+        def eval_or(var_values):
+            result = False
+            for operand in operands:
+                result = result or operand(var_values)
+                if result:
+                    return result
+            return result
+
+        return eval_or
+
+    raise NotImplementedError()
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_expression(expression: str) -> Callable[[Dict], Any]:
+    """Parses and compiles an expression once. Cached by expression string,
+    so the conditions of all the nodes of a spec share the compiled closure."""
+    return compile_parsed(parse_expression(expression))
 
 
 def eval_string(expression: str, var_values: Dict):
-    return eval_expression(parse_expression(expression), var_values)
+    return compile_expression(expression)(var_values)
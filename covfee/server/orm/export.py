@@ -0,0 +1,583 @@
+from __future__ import annotations
+
+import atexit
+import datetime
+import json
+import multiprocessing
+import os
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import zipstream
+from sqlalchemy import Select, or_, select
+from sqlalchemy.orm import Session
+
+from ..tasks.registry import task_registry
+from .hit import HITInstance, HITSpec
+from .journey import JourneyInstance
+from .node import JourneyNode, NodeInstance
+from .response import TaskResponse
+from .task import TaskSpec
+
+# optional, only needed for the Parquet export (pip install covfee[parquet])
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+def parse_since(value: str) -> datetime.datetime:
+    """Parses the watermark of an incremental export (ISO 8601).
+    Timestamps are stored in server local time, aware datetimes are converted to it.
+    Raises ValueError if the value is not a valid timestamp.
+    """
+    since = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if since.tzinfo is not None:
+        since = since.astimezone().replace(tzinfo=None)
+    return since
+
+
+class _Rows:
+    """Iterator over rows sorted by a key, consumed one key at a time"""
+
+    def __init__(self, rows: Iterable[Any]):
+        self.rows = iter(rows)
+        self.next = next(self.rows, None)
+
+    def take(self, key_fn: Callable[[Any], Any], key: Any) -> Iterator[Any]:
+        while self.next is not None and key_fn(self.next) == key:
+            row = self.next
+            self.next = next(self.rows, None)
+            yield row
+
+
+def _buffered(chunks: Iterable[str], size: int = 65536) -> Iterator[bytes]:
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield "".join(buffer).encode()
+            buffer, length = [], 0
+    if buffer:
+        yield "".join(buffer).encode()
+
+
+class ResultsExporter:
+    """Streams the results of HIT instances into a zipstream.ZipFile, one JSON file per instance.
+    Produces the same JSON as json.dumps(HITInstance.make_results_dict()) but:
+    - instances are read in chunks of chunk_size with one query per table and chunk
+    - responses are read with yield_per (a server-side cursor where supported)
+    - each file is serialized incrementally and fed to the zip file in small buffers
+    so memory stays flat regardless of the number of instances.
+    """
+
+    def __init__(self, session: Session, chunk_size: int = 200, yield_per: int = 50):
+        self.session = session
+        self.chunk_size = chunk_size
+        self.yield_per = yield_per
+
+    def iter_instance_ids(
+        self, project_id: int, since: Optional[datetime.datetime] = None
+    ) -> Iterator[List[bytes]]:
+        """Yields the ids of the instances of the project, in chunks (keyset pagination).
+        If since is given, only the instances with responses or journeys updated after it.
+        """
+        last_id: Optional[bytes] = None
+        while True:
+            stmt = (
+                select(HITInstance.id)
+                .join(HITSpec)
+                .where(HITSpec.project_id == project_id)
+                .order_by(HITInstance.id)
+                .limit(self.chunk_size)
+            )
+            if since is not None:
+                stmt = stmt.where(
+                    or_(
+                        HITInstance.id.in_(
+                            select(NodeInstance.hit_id)
+                            .join(TaskResponse, TaskResponse.node_id == NodeInstance.id)
+                            .where(TaskResponse.updated_at > since)
+                        ),
+                        HITInstance.id.in_(
+                            select(JourneyInstance.hit_id).where(
+                                JourneyInstance.dt_updated > since
+                            )
+                        ),
+                    )
+                )
+            if last_id is not None:
+                stmt = stmt.where(HITInstance.id > last_id)
+            ids = list(self.session.execute(stmt).scalars())
+            if not ids:
+                return
+            yield ids
+            last_id = ids[-1]
+
+    def stream_project(
+        self,
+        z,
+        base_path: str,
+        project_id: int,
+        since: Optional[datetime.datetime] = None,
+    ) -> Iterator[bytes]:
+        """Writes the result files of the instances of the project to z and yields the zip chunks.
+        If since is given, only (the full files of) the instances updated after it.
+        """
+        for ids in self.iter_instance_ids(project_id, since):
+            yield from self.stream_instances(z, base_path, ids)
+
+    def stream_instances(
+        self, z, base_path: str, instance_ids: List[bytes]
+    ) -> Iterator[bytes]:
+        """Writes the result files of the instances to z and yields the zip chunks"""
+        for hit_id, chunks in self.iter_instance_files(instance_ids):
+            z.write_iter(
+                os.path.join(base_path, hit_id.hex() + ".json"), _buffered(chunks)
+            )
+            # the file must be consumed before the responses of the next instance
+            yield from z.flush()
+
+    def iter_instance_files(
+        self, instance_ids: List[bytes]
+    ) -> Iterator[Tuple[bytes, Iterator[str]]]:
+        """Yields (instance id, JSON fragments of its results file) in id order.
+        The fragments of a file must be consumed before moving to the next one.
+        """
+        for start in range(0, len(instance_ids), self.chunk_size):
+            yield from self._iter_chunk_files(
+                sorted(instance_ids[start : start + self.chunk_size])
+            )
+
+    def _iter_chunk_files(
+        self, instance_ids: List[bytes]
+    ) -> Iterator[Tuple[bytes, Iterator[str]]]:
+        nodes = {hit_id: [] for hit_id in instance_ids}
+        for node_id, hit_id, node_type in self.session.execute(
+            select(NodeInstance.id, NodeInstance.hit_id, NodeInstance.type)
+            .where(NodeInstance.hit_id.in_(instance_ids))
+            .order_by(NodeInstance.id)
+        ):
+            nodes[hit_id].append((node_id, node_type == "TaskInstance"))
+
+        # journeys in creation order, like HITInstance.journeys
+        journeys = {hit_id: [] for hit_id in instance_ids}
+        journey_nodes = {}
+        for journey_id, hit_id in self.session.execute(
+            select(JourneyInstance.id, JourneyInstance.hit_id)
+            .where(JourneyInstance.hit_id.in_(instance_ids))
+            .order_by(JourneyInstance.journeyspec_id)
+        ):
+            journeys[hit_id].append(journey_id)
+            journey_nodes[journey_id] = []
+        for journey_id, node_id in self.session.execute(
+            select(JourneyNode.journey_id, JourneyNode.node_id)
+            .where(JourneyNode.journey_id.in_(journey_nodes.keys()))
+            .order_by(JourneyNode.order)
+        ):
+            journey_nodes[journey_id].append(node_id)
+
+        # responses in the same order the files are written: instance, node, response
+        responses = _Rows(
+            self.session.execute(
+                select(
+                    TaskResponse.node_id,
+                    TaskResponse.created_at,
+                    TaskResponse.submitted,
+                    TaskResponse.state,
+                )
+                .join(NodeInstance, TaskResponse.node_id == NodeInstance.id)
+                .where(NodeInstance.hit_id.in_(instance_ids))
+                .order_by(NodeInstance.hit_id, TaskResponse.node_id, TaskResponse.id)
+                .execution_options(yield_per=self.yield_per)
+            )
+        )
+
+        for hit_id in instance_ids:
+            yield hit_id, self._instance_json(
+                hit_id,
+                nodes[hit_id],
+                [journey_nodes[j] for j in journeys[hit_id]],
+                responses,
+            )
+
+    def _instance_json(
+        self,
+        hit_id: bytes,
+        nodes: List[Tuple[int, bool]],
+        journeys: List[List[int]],
+        responses: _Rows,
+    ) -> Iterator[str]:
+        yield '{"hit_id": ' + json.dumps(hit_id.hex()) + ', "nodes": {'
+        for i, (node_id, is_task) in enumerate(nodes):
+            yield (", " if i else "") + json.dumps(str(node_id)) + ": {"
+            if is_task:
+                yield '"responses": ['
+                for j, (_, created_at, submitted, state) in enumerate(
+                    responses.take(lambda row: row[0], node_id)
+                ):
+                    yield (", " if j else "") + json.dumps(
+                        {
+                            "created": str(created_at),
+                            "submitted": str(submitted),
+                            "state": state,
+                        }
+                    )
+                yield "]"
+            yield "}"
+        yield '}, "journeys": '
+        yield json.dumps([{"nodes": node_ids} for node_ids in journeys])
+        yield "}"
+
+
+
+# config keys needed by the export workers to connect to the database
+_DB_CONFIG_KEYS = [
+    "SQLALCHEMY_DATABASE_URI",
+    "DATABASE_PATH",
+    "SQLITE_PROFILE",
+    "SQLITE_PRAGMAS",
+    "DATABASE_POOL_TIMEOUT",
+    "DATABASE_POOL_RECYCLE",
+    "DATABASE_POOL_PRE_PING",
+]
+
+# pool of the parallel exports, started on first use and kept for the next ones
+_export_pool: Optional[ProcessPoolExecutor] = None
+_export_pool_key = None
+
+# session factory of a worker process
+_worker_session_local = None
+
+
+def _init_export_worker(db_config: Dict[str, Any]):
+    global _worker_session_local
+    from ..db import get_engine_from_config, get_session_local
+
+    _worker_session_local = get_session_local(get_engine_from_config(db_config))
+
+
+def _export_members(
+    instance_ids: List[bytes], base_path: str
+) -> List[Tuple[str, bytes]]:
+    """Runs in a worker: returns (arcname, JSON results file) for every instance"""
+    members = []
+    with _worker_session_local() as session:
+        for hit_id, chunks in ResultsExporter(session).iter_instance_files(
+            instance_ids
+        ):
+            members.append(
+                (
+                    os.path.join(base_path, hit_id.hex() + ".json"),
+                    b"".join(_buffered(chunks)),
+                )
+            )
+    return members
+
+
+@atexit.register
+def _shutdown_export_pool():
+    # the pool's own exit hook hangs under eventlet's monkey patching
+    if _export_pool is not None:
+        _export_pool.shutdown()
+
+
+def get_export_pool(workers: int, config: Dict[str, Any]) -> ProcessPoolExecutor:
+    global _export_pool, _export_pool_key
+    db_config = {key: config[key] for key in _DB_CONFIG_KEYS if key in config}
+    # one connection per worker
+    db_config.update({"DATABASE_POOL_SIZE": 1, "DATABASE_MAX_OVERFLOW": 0})
+    key = (workers, json.dumps(db_config, sort_keys=True, default=str))
+    if _export_pool is None or _export_pool_key != key:
+        if _export_pool is not None:
+            _export_pool.shutdown(wait=False)
+        # spawn: forked workers would share the database connections of the server
+        _export_pool = ProcessPoolExecutor(
+            workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_export_worker,
+            initargs=(db_config,),
+        )
+        _export_pool_key = key
+    return _export_pool
+
+
+class ParallelResultsExporter:
+    """Produces the same zip as ResultsExporter.stream_project, using a pool of worker processes.
+    The instance ids are read in the calling process and partitioned in chunks of chunk_size.
+    Every worker reads the results of a chunk with its own session, serializes them, and
+    returns the files, which are added to the zip (and compressed) in order.
+    At most 2 chunks per worker are in flight, which bounds memory.
+    """
+
+    def __init__(
+        self,
+        session: Session,
+        config: Dict[str, Any],
+        workers: int,
+        chunk_size: int = 50,
+    ):
+        self.session = session
+        self.config = config
+        self.workers = workers
+        self.chunk_size = chunk_size
+
+    def stream_project(
+        self,
+        z: zipstream.ZipFile,
+        base_path: str,
+        project_id: int,
+        since: Optional[datetime.datetime] = None,
+    ) -> Iterator[bytes]:
+        pool = get_export_pool(self.workers, self.config)
+        pending = deque()
+        for ids in ResultsExporter(self.session, self.chunk_size).iter_instance_ids(
+            project_id, since
+        ):
+            pending.append(
+                pool.submit(_export_members, ids, base_path)
+            )
+            if len(pending) >= 2 * self.workers:
+                yield from self._write_members(z, pending.popleft().result())
+        while pending:
+            yield from self._write_members(z, pending.popleft().result())
+
+    @staticmethod
+    def _write_members(z: zipstream.ZipFile, members) -> Iterator[bytes]:
+        for arcname, data in members:
+            z.write_iter(arcname, [data])
+            yield from z.flush()
+
+
+class ParquetExporter:
+    """Writes the results of a project as one Parquet dataset (folder) per task type:
+        <out_dir>/<task type>/responses.parquet
+        <out_dir>/<task type>/<table>.parquet  (task specific, see BaseCovfeeTask.export_tables)
+        <out_dir>/journeys.parquet
+    Rows are read in batches of batch_size (keyset pagination) and written as
+    one row group per batch, so time is linear and memory bounded by the batch size.
+    If since is given, only the rows updated after it are written (incremental export).
+
+    responses.parquet has a fixed schema with the state as a JSON string.
+    The schema of task specific tables is inferred from the rows (eg. per-frame
+    arrays become list columns). They are read twice: once to unify the types of all
+    the batches, then to write them.
+    """
+
+    def __init__(self, session: Session, batch_size: int = 1000):
+        if pa is None:
+            raise ImportError(
+                "pyarrow is required for Parquet exports. Install it with: pip install covfee[parquet]"
+            )
+        self.session = session
+        self.batch_size = batch_size
+
+    def task_ids_by_type(self, project_id: int) -> Dict[str, Select]:
+        """Returns a select of the task instance ids of the project, for every task type"""
+        spec_ids = defaultdict(list)
+        for spec_id, spec in self.session.execute(
+            select(TaskSpec.id, TaskSpec.spec)
+            .join(HITSpec, TaskSpec.hitspec_id == HITSpec.id)
+            .where(HITSpec.project_id == project_id)
+        ):
+            spec_ids[spec["type"]].append(spec_id)
+        return {
+            task_type: select(NodeInstance.id).where(NodeInstance.nodespec_id.in_(ids))
+            for task_type, ids in spec_ids.items()
+        }
+
+    def write_project(
+        self,
+        out_dir: str,
+        project_id: int,
+        since: Optional[datetime.datetime] = None,
+    ) -> Dict[str, Dict[str, int]]:
+        """Writes the datasets and returns the number of rows of every table, by task type"""
+        os.makedirs(out_dir, exist_ok=True)
+        written = {
+            "": {
+                "journeys": self._write_table(
+                    os.path.join(out_dir, "journeys.parquet"),
+                    self._journey_batches(project_id, since),
+                    self.journey_schema(),
+                )
+            }
+        }
+        for task_type, task_ids in self.task_ids_by_type(project_id).items():
+            task_dir = os.path.join(out_dir, task_type)
+            os.makedirs(task_dir, exist_ok=True)
+            task_class = task_registry.get_class(task_type)
+
+            written[task_type] = {
+                "responses": self._write_table(
+                    os.path.join(task_dir, "responses.parquet"),
+                    self._response_batches(task_ids, since),
+                    self.response_schema(),
+                )
+            }
+            tables = task_class.export_tables(
+                self.session, task_ids, self.batch_size, since
+            )
+            for name, batches in tables.items():
+                schema = self._infer_schema(batches)
+                if schema is None:
+                    continue
+                # second pass, with fresh iterators
+                batches = task_class.export_tables(
+                    self.session, task_ids, self.batch_size, since
+                )[name]
+                written[task_type][name] = self._write_table(
+                    os.path.join(task_dir, name + ".parquet"), batches, schema
+                )
+        return written
+
+    @staticmethod
+    def response_schema() -> pa.Schema:
+        return pa.schema(
+            [
+                ("hit_id", pa.string()),
+                ("node_id", pa.int64()),
+                ("response_id", pa.int64()),
+                ("created_at", pa.timestamp("us")),
+                ("updated_at", pa.timestamp("us")),
+                ("submitted", pa.bool_()),
+                ("valid", pa.bool_()),
+                ("state", pa.string()),
+            ]
+        )
+
+    @staticmethod
+    def journey_schema() -> pa.Schema:
+        return pa.schema(
+            [
+                ("journey_id", pa.string()),
+                ("hit_id", pa.string()),
+                ("journeyspec_id", pa.int64()),
+                ("status", pa.string()),
+                ("disabled", pa.bool_()),
+                ("max_submitted_node_index", pa.int64()),
+                ("dt_first_join", pa.timestamp("us")),
+                ("dt_submitted", pa.timestamp("us")),
+                ("dt_created", pa.timestamp("us")),
+                ("dt_updated", pa.timestamp("us")),
+            ]
+        )
+
+    def _journey_batches(
+        self, project_id: int, since: Optional[datetime.datetime]
+    ) -> Iterator[List[Dict[str, Any]]]:
+        last_id = b""
+        while True:
+            stmt = (
+                select(
+                    JourneyInstance.id,
+                    JourneyInstance.hit_id,
+                    JourneyInstance.journeyspec_id,
+                    JourneyInstance.status,
+                    JourneyInstance.disabled,
+                    JourneyInstance.max_submitted_node_index,
+                    JourneyInstance.dt_first_join,
+                    JourneyInstance.dt_submitted,
+                    JourneyInstance.dt_created,
+                    JourneyInstance.dt_updated,
+                )
+                .join(HITInstance, JourneyInstance.hit_id == HITInstance.id)
+                .join(HITSpec, HITInstance.hitspec_id == HITSpec.id)
+                .where(HITSpec.project_id == project_id, JourneyInstance.id > last_id)
+                .order_by(JourneyInstance.id)
+                .limit(self.batch_size)
+            )
+            if since is not None:
+                stmt = stmt.where(JourneyInstance.dt_updated > since)
+            rows = self.session.execute(stmt).all()
+            if not rows:
+                return
+            yield [
+                {
+                    "journey_id": row.id.hex(),
+                    "hit_id": row.hit_id.hex(),
+                    "journeyspec_id": row.journeyspec_id,
+                    "status": row.status.name,
+                    "disabled": row.disabled,
+                    "max_submitted_node_index": row.max_submitted_node_index,
+                    "dt_first_join": row.dt_first_join,
+                    "dt_submitted": row.dt_submitted,
+                    "dt_created": row.dt_created,
+                    "dt_updated": row.dt_updated,
+                }
+                for row in rows
+            ]
+            last_id = rows[-1].id
+
+    def _response_batches(
+        self, task_ids: Select, since: Optional[datetime.datetime]
+    ) -> Iterator[List[Dict[str, Any]]]:
+        last_id = 0
+        while True:
+            stmt = (
+                select(
+                    NodeInstance.hit_id,
+                    TaskResponse.node_id,
+                    TaskResponse.id,
+                    TaskResponse.created_at,
+                    TaskResponse.updated_at,
+                    TaskResponse.submitted,
+                    TaskResponse.valid,
+                    TaskResponse.state,
+                )
+                .join(NodeInstance, TaskResponse.node_id == NodeInstance.id)
+                .where(TaskResponse.node_id.in_(task_ids), TaskResponse.id > last_id)
+                .order_by(TaskResponse.id)
+                .limit(self.batch_size)
+            )
+            if since is not None:
+                stmt = stmt.where(TaskResponse.updated_at > since)
+            rows = self.session.execute(stmt).all()
+            if not rows:
+                return
+            yield [
+                {
+                    "hit_id": row.hit_id.hex(),
+                    "node_id": row.node_id,
+                    "response_id": row.id,
+                    "created_at": row.created_at,
+                    "updated_at": row.updated_at,
+                    "submitted": row.submitted,
+                    "valid": row.valid,
+                    "state": json.dumps(row.state),
+                }
+                for row in rows
+            ]
+            last_id = rows[-1].id
+
+    @staticmethod
+    def _infer_schema(batches: Iterable[List[Dict[str, Any]]]) -> Optional[pa.Schema]:
+        schema = None
+        for rows in batches:
+            # from_pylist only looks at the keys of the first row
+            keys = dict.fromkeys(key for row in rows for key in row)
+            batch_schema = pa.Table.from_pydict(
+                {key: [row.get(key) for row in rows] for key in keys}
+            ).schema
+            schema = (
+                batch_schema
+                if schema is None
+                else pa.unify_schemas(
+                    [schema, batch_schema], promote_options="permissive"
+                )
+            )
+        return schema
+
+    @staticmethod
+    def _write_table(
+        path: str, batches: Iterable[List[Dict[str, Any]]], schema: pa.Schema
+    ) -> int:
+        num_rows = 0
+        with pq.ParquetWriter(path, schema) as writer:
+            for rows in batches:
+                writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+                num_rows += len(rows)
+        return num_rows
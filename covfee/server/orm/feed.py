@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+import datetime
+from typing import Any, Dict
+
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class AdminFeedEntry(Base):
+    """A delta of the admin feed, shared by all the server workers (see AdminFeed).
+    The id is the seq of the delta.
+    """
+
+    __tablename__ = "admin_feed"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    delta: Mapped[Dict[str, Any]]
+    created_at: Mapped[datetime.datetime] = mapped_column(default=datetime.datetime.now)
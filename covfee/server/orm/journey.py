@@ -160,8 +160,9 @@ class JourneyInstance(Base):
     dt_first_join: Mapped[datetime.datetime] = mapped_column(nullable=True)
     dt_submitted: Mapped[datetime.datetime] = mapped_column(nullable=True)
     dt_created: Mapped[datetime.datetime] = mapped_column(default=datetime.datetime.now)
+    # indexed for incremental exports (?since=)
     dt_updated: Mapped[datetime.datetime] = mapped_column(
-        default=datetime.datetime.now, onupdate=datetime.datetime.now
+        default=datetime.datetime.now, onupdate=datetime.datetime.now, index=True
     )
 
     
@@ -0,0 +1,73 @@
+"""Named eager-loading strategies.
+Each strategy is a list of loader options covering the relationships walked by
+a to_dict() call, so that the REST endpoints run a fixed number of queries
+instead of one lazy load per relationship and row.
+
+Usage:
+    session.query(HITInstance).options(*hit_instance_with_nodes).get(id)
+"""
+from sqlalchemy.orm import joinedload, selectinload
+
+from .hit import HITInstance, HITSpec
+from .journey import JourneyInstance
+from .node import JourneyNode
+from .project import Project
+from .task import TaskInstance, TaskSpec
+
+# TaskInstance.to_dict(), except for the spec (see _journey_nodes)
+task_instance = [
+    joinedload(TaskInstance.chat),
+    selectinload(TaskInstance.responses),
+    selectinload(TaskInstance.curr_journeys),
+    selectinload(TaskInstance.journey_associations),
+]
+
+
+def _journey_nodes(node_associations):
+    """Extends a loader of JourneyInstance.node_associations with the nodes and their specs.
+    The subclass columns of the single-table hierarchy (TaskInstance.aux, TaskSpec.spec)
+    are only loaded along of_type() paths. SQLAlchemy drops of_type() inside nested
+    options() below the first level, so these paths are chained instead.
+    """
+    nodes = node_associations.selectinload(JourneyNode.node.of_type(TaskInstance))
+    return [
+        nodes.joinedload(TaskInstance.spec.of_type(TaskSpec)),
+        nodes.options(*task_instance),
+    ]
+
+
+# JourneyInstance.to_dict(with_nodes=False)
+journey = [
+    joinedload(JourneyInstance.spec),
+    joinedload(JourneyInstance.chat),
+    selectinload(JourneyInstance.node_associations).joinedload(JourneyNode.node),
+]
+
+# GET /journeys/<jid>, JourneyInstance.to_dict(with_nodes=True)
+journey_with_nodes = [
+    joinedload(JourneyInstance.spec),
+    joinedload(JourneyInstance.chat),
+    *_journey_nodes(selectinload(JourneyInstance.node_associations)),
+]
+
+# HITInstance.to_dict(with_nodes=False)
+hit_instance = [
+    joinedload(HITInstance.spec).joinedload(HITSpec.project),
+]
+
+# GET /instances/<iid>, HITInstance.to_dict(with_nodes=True)
+hit_instance_with_nodes = [
+    *hit_instance,
+    selectinload(HITInstance.journeys).options(
+        joinedload(JourneyInstance.spec),
+        joinedload(JourneyInstance.chat),
+    ),
+    *_journey_nodes(
+        selectinload(HITInstance.journeys).selectinload(
+            JourneyInstance.node_associations
+        )
+    ),
+]
+
+# GET /projects, Project.to_dict(with_hits=False)
+project = selectinload(Project.hitspecs)
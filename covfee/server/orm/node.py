@@ -449,16 +449,23 @@ class NodeInstance(Base):
             journey_assocs.append(row_dict)
         return journey_assocs
 
-    def get_masked_status(self):
-        if self.status != NodeInstanceStatus.FINISHED:
-            if self.manual == NodeInstanceManualStatus.RUNNING:
+    @staticmethod
+    def mask_status(
+        status: NodeInstanceStatus, manual: NodeInstanceManualStatus
+    ) -> NodeInstanceStatus:
+        """Status shown to admins: the manual status overrides the status of unfinished nodes"""
+        if status != NodeInstanceStatus.FINISHED:
+            if manual == NodeInstanceManualStatus.RUNNING:
                 return NodeInstanceStatus.RUNNING
-            elif self.manual == NodeInstanceManualStatus.PAUSED:
+            elif manual == NodeInstanceManualStatus.PAUSED:
                 return NodeInstanceStatus.PAUSED
             else:
-                return self.status
+                return status
         else:
-            return self.status
+            return status
+
+    def get_masked_status(self):
+        return self.mask_status(self.status, self.manual)
 
     def to_dict(self):
         instance_dict = super().to_dict()
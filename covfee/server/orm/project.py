@@ -6,7 +6,7 @@ from typing import TYPE_CHECKING, List
 
 import pandas as pd
 from sqlalchemy import select
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.orm import Mapped, mapped_column, object_session, relationship
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 # from ..db import Base
@@ -80,10 +80,18 @@ class Project(Base):
 
         return Project(**proj_dict)
 
-    def stream_download(self, z, base_path, submitted_only=True):
-        for hit in self.hitspecs:
-            for instance in hit.instances:
-                yield from instance.stream_download(z, base_path)
+    def stream_download(self, z, base_path, submitted_only=True, since=None):
+        from .export import ResultsExporter
+
+        yield from ResultsExporter(object_session(self)).stream_project(
+            z, base_path, self.id, since
+        )
+
+    def make_summary_dict(self):
+        from .summary import ProjectSummary
+
+        summary = ProjectSummary(object_session(self)).make_dict(self.id)
+        return {**summary, "name": self.name}
 
     def to_dict(self, with_hits=True, with_hitspecs=True, with_hit_nodes=False):
         project_dict = super().to_dict()
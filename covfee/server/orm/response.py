@@ -36,8 +36,9 @@ class TaskResponse(Base):
     # data: Mapped[Dict[str, Any]]
 
     created_at: Mapped[datetime.datetime] = mapped_column(default=datetime.datetime.now)
+    # indexed for incremental exports (?since=)
     updated_at: Mapped[datetime.datetime] = mapped_column(
-        default=datetime.datetime.now, onupdate=datetime.datetime.now
+        default=datetime.datetime.now, onupdate=datetime.datetime.now, index=True
     )
     created_at: Mapped[Optional[datetime.datetime]]
 
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from .hit import HITInstance, HITSpec
+from .journey import JourneyInstance, JourneyInstanceStatus
+from .node import NodeInstance, NodeInstanceStatus, NodeSpec
+
+
+def _status_counts(enum) -> Dict[str, int]:
+    return {status.name: 0 for status in enum}
+
+
+class ProjectSummary:
+    """Status counts of a project for the admin dashboard.
+    Replaces Project.to_dict(with_hits=True, with_hit_nodes=True) on the project page:
+    instead of materializing every HIT instance, it runs a fixed number of
+    GROUP BY queries, so the cost does not depend on the number of instances.
+    The details of the instances are loaded page by page (/projects/<pid>/instances).
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def make_dict(self, project_id: int) -> Dict[str, Any]:
+        hitspec_ids = select(HITSpec.id).where(HITSpec.project_id == project_id)
+
+        hitspecs = {
+            id: {
+                "id": id,
+                "name": name,
+                "num_instances": 0,
+                "num_submitted_instances": 0,
+                "journeys": self._journey_counts(),
+                "nodes": self._node_counts(),
+                "nodespecs": [],
+            }
+            for id, name in self.session.execute(
+                select(HITSpec.id, HITSpec.name)
+                .where(HITSpec.project_id == project_id)
+                .order_by(HITSpec.id)
+            )
+        }
+
+        for hitspec_id, count in self.session.execute(
+            select(HITInstance.hitspec_id, func.count())
+            .where(HITInstance.hitspec_id.in_(hitspec_ids))
+            .group_by(HITInstance.hitspec_id)
+        ):
+            hitspecs[hitspec_id]["num_instances"] = count
+
+        # an instance is submitted when all of its journeys are
+        submitted_hits = (
+            select(HITInstance.hitspec_id)
+            .join(JourneyInstance, JourneyInstance.hit_id == HITInstance.id)
+            .where(HITInstance.hitspec_id.in_(hitspec_ids))
+            .group_by(HITInstance.hitspec_id, HITInstance.id)
+            .having(func.count(JourneyInstance.dt_submitted) == func.count())
+            .subquery()
+        )
+        for hitspec_id, count in self.session.execute(
+            select(submitted_hits.c.hitspec_id, func.count()).group_by(
+                submitted_hits.c.hitspec_id
+            )
+        ):
+            hitspecs[hitspec_id]["num_submitted_instances"] = count
+
+        for hitspec_id, status, total, online, submitted in self.session.execute(
+            select(
+                HITInstance.hitspec_id,
+                JourneyInstance.status,
+                func.count(),
+                func.sum(case((JourneyInstance.num_connections > 0, 1), else_=0)),
+                func.count(JourneyInstance.dt_submitted),
+            )
+            .join(HITInstance, JourneyInstance.hit_id == HITInstance.id)
+            .where(HITInstance.hitspec_id.in_(hitspec_ids))
+            .group_by(HITInstance.hitspec_id, JourneyInstance.status)
+        ):
+            journeys = hitspecs[hitspec_id]["journeys"]
+            journeys["total"] += total
+            journeys["online"] += online
+            journeys["submitted"] += submitted
+            journeys["status"][status.name] += total
+
+        nodespecs = {}
+        for nodespec in (
+            self.session.execute(
+                select(NodeSpec)
+                .where(NodeSpec.hitspec_id.in_(hitspec_ids))
+                .order_by(NodeSpec.id)
+            )
+            .scalars()
+            .all()
+        ):
+            nodespec_dict = {
+                "id": nodespec.id,
+                "name": nodespec.to_dict().get("name"),
+                **self._node_counts(),
+            }
+            nodespecs[nodespec.id] = nodespec_dict
+            hitspecs[nodespec.hitspec_id]["nodespecs"].append(nodespec_dict)
+
+        for nodespec_id, status, manual, count in self.session.execute(
+            select(
+                NodeInstance.nodespec_id,
+                NodeInstance.status,
+                NodeInstance.manual,
+                func.count(),
+            )
+            .where(NodeInstance.nodespec_id.in_(nodespecs.keys()))
+            .group_by(
+                NodeInstance.nodespec_id, NodeInstance.status, NodeInstance.manual
+            )
+        ):
+            status = NodeInstance.mask_status(status, manual).name
+            nodespec_dict = nodespecs[nodespec_id]
+            nodespec_dict["total"] += count
+            nodespec_dict["status"][status] += count
+
+        for hitspec in hitspecs.values():
+            nodes = hitspec["nodes"]
+            for nodespec_dict in hitspec["nodespecs"]:
+                nodes["total"] += nodespec_dict["total"]
+                for status, count in nodespec_dict["status"].items():
+                    nodes["status"][status] += count
+
+        hitspecs = list(hitspecs.values())
+        return {
+            "id": project_id,
+            "num_instances": sum(h["num_instances"] for h in hitspecs),
+            "num_submitted_instances": sum(
+                h["num_submitted_instances"] for h in hitspecs
+            ),
+            "journeys": self._sum(
+                self._journey_counts(), [h["journeys"] for h in hitspecs]
+            ),
+            "nodes": self._sum(self._node_counts(), [h["nodes"] for h in hitspecs]),
+            "hitSpecs": hitspecs,
+        }
+
+    @staticmethod
+    def _journey_counts():
+        return {
+            "total": 0,
+            "online": 0,
+            "submitted": 0,
+            "status": _status_counts(JourneyInstanceStatus),
+        }
+
+    @staticmethod
+    def _node_counts():
+        return {"total": 0, "status": _status_counts(NodeInstanceStatus)}
+
+    @staticmethod
+    def _sum(res: Dict[str, Any], counts: List[Dict[str, Any]]):
+        for c in counts:
+            for key, value in c.items():
+                if key == "status":
+                    for status, n in value.items():
+                        res["status"][status] += n
+                else:
+                    res[key] += value
+        return res
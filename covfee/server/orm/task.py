@@ -9,8 +9,8 @@ from sqlalchemy.orm import Mapped, object_session, relationship
 
 from covfee.shared.schemata import schemata
 
-from .. import tasks
 from ..tasks.base import BaseCovfeeTask
+from ..tasks.registry import task_registry
 from . import utils
 from .node import NodeInstance, NodeInstanceStatus, NodeSpec
 from .response import TaskResponse
@@ -108,12 +108,15 @@ class TaskInstance(NodeInstance):
             return NotImplemented
         return hash(self) == hash(other)
 
-    def get_task_object(self):
-        task_class = getattr(tasks, self.spec.spec["type"], BaseCovfeeTask)
-        task_object = task_class(
-            task=self
-            # , config=app.config
-        )
+    def get_task_object(self) -> BaseCovfeeTask:
+        """The task object of the node. It is created once per loaded instance,
+        and again if the task type of the spec changes.
+        """
+        task_class = task_registry.get(self.spec.spec["type"])
+        task_object = getattr(self, "_task_object", None)
+        if type(task_object) is not task_class:
+            task_object = task_class(task=self)
+            self._task_object = task_object
         return task_object
 
     def to_dict(self):
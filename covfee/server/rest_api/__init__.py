@@ -4,5 +4,6 @@ from .hits import *
 from .journeys import *
 from .nodes import *
 from .chat import *
+from .feed import *
 from .auth import *
 from ..scheduler.timers import *
@@ -3,13 +3,60 @@ from flask import (
     jsonify,
 )
 from sqlalchemy import select
+from sqlalchemy.orm import selectinload
 
 from .api import api
-from ..orm import Chat
+from .utils import get_fields, jsonify_page, select_fields
+from ..orm import Chat, ChatMessage
 
 
 @api.route("/chats/<chat_ids>")
 def chat(chat_ids: str):
-    chat_ids = [int(e) for e in chat_ids.split(",")]
-    rows = app.session.execute(select(Chat).where(Chat.id.in_(chat_ids))).all()
-    return jsonify([r[0].to_dict() for r in rows])
+    """Returns the chats with the given ids
+
+    Args:
+        chat_ids (str): comma-separated chat ids, at most API_MAX_PAGE_SIZE
+        fields (str, query): comma-separated keys to return.
+            Leave out "messages" to skip the messages, which can be paged with /chats/<chat_id>/messages
+    """
+    try:
+        chat_ids = [int(e) for e in chat_ids.split(",")]
+    except ValueError:
+        return {"msg": "invalid chat ids"}, 400
+    if len(chat_ids) > app.config["API_MAX_PAGE_SIZE"]:
+        return {"msg": "too many chat ids"}, 400
+
+    fields = get_fields()
+    exclude = [] if fields is None else [k for k in ["messages", "last_read"] if k not in fields]
+    options = [
+        selectinload(rel)
+        for key, rel in [("messages", Chat.messages), ("last_read", Chat.journey_associations)]
+        if key not in exclude
+    ]
+
+    rows = app.session.execute(
+        select(Chat).where(Chat.id.in_(chat_ids)).options(*options)
+    ).scalars()
+    return jsonify([select_fields(c.to_dict(exclude=exclude), fields) for c in rows])
+
+
+@api.route("/chats/<int:chat_id>/messages")
+def chat_messages(chat_id: int):
+    """Lists the messages of a chat, newest first, one page at a time
+
+    Args:
+        chat_id (int): chat ID
+        cursor (str, query): next_cursor of the previous page (older messages)
+        limit (int, query): page size
+
+    Returns:
+        {"items": list of messages, "next_cursor": cursor of the next page or null}
+    """
+    if app.session.get(Chat, chat_id) is None:
+        return jsonify({"msg": "not found"}), 404
+    return jsonify_page(
+        app.session,
+        select(ChatMessage).where(ChatMessage.chat_id == chat_id),
+        ChatMessage.id,
+        descending=True,
+    )
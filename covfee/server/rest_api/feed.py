@@ -0,0 +1,42 @@
+from flask import jsonify, request
+
+from covfee.server.socketio.socket import admin_feed
+
+from .api import api
+from .auth import admin_required
+
+
+@api.route("/admin/feed")
+@admin_required
+def feed():
+    """Status deltas of the admin feed ("feed" socket event on /admin) published after a sequence number.
+    Used by admins to catch up after missing deltas (eg. when reconnecting).
+
+    Args:
+        since (int, query): seq of the last delta received. Without it, only the current seq is returned.
+        epoch (str, query): epoch of the feed the seq belongs to
+
+    Returns:
+        {"epoch": str, "seq": int, "deltas": [...]}
+        410 if the deltas after since are no longer available (or the server restarted):
+        the client must reload and continue from the returned seq.
+    """
+    # read before loading the deltas. New deltas are applied on top, in order
+    epoch, seq = admin_feed.position()
+    if "since" not in request.args:
+        return jsonify({"epoch": epoch, "seq": seq, "deltas": []})
+
+    try:
+        since = int(request.args["since"])
+    except ValueError:
+        return {"msg": "invalid since"}, 400
+
+    deltas = None
+    if request.args.get("epoch", epoch) == epoch:
+        deltas = admin_feed.since(since)
+    if deltas is None:
+        return {"msg": "deltas no longer available, reload", "epoch": epoch, "seq": seq}, 410
+
+    return jsonify(
+        {"epoch": epoch, "seq": deltas[-1]["seq"] if deltas else since, "deltas": deltas}
+    )
@@ -1,27 +1,54 @@
 from flask import request, jsonify, redirect, Response,\
      stream_with_context, current_app as app
 import zipstream
+from sqlalchemy import select
 
 from .api import api
 from .auth import admin_required
-from .utils import jsonify_or_404
-from ..orm import HITSpec, HITInstance, TaskSpec
+from .utils import jsonify_or_404, jsonify_page
+from ..orm import HITSpec, HITInstance, TaskSpec, loaders
 
 # HITS
 # return one hit
 @api.route('/hits/<hid>')
 def hit(hid):
     """Returns a HIT specification.
+    Its instances are listed by /hits/<hid>/instances
 
     Args:
         hid (str): hit ID
+        fields (str, query): comma-separated keys to return
     """
-    with_instances = request.args.get('with_instances', False)
-    with_instance_nodes = request.args.get('with_instance_nodes', False)
-    res = app.session.query(HITSpec).get(int(hid))
-    return jsonify_or_404(res,
-                          with_instances=with_instances,
-                          with_instance_nodes=with_instance_nodes)
+    res = app.session.get(HITSpec, int(hid))
+    return jsonify_or_404(res)
+
+
+def instances_page(stmt):
+    """Responds with one page of the HIT instances selected by stmt (see jsonify_page)"""
+    with_nodes = request.args.get('with_nodes', False)
+    options = loaders.hit_instance_with_nodes if with_nodes else loaders.hit_instance
+    return jsonify_page(app.session, stmt.options(*options), HITInstance.id,
+                        lambda instance: instance.to_dict(with_nodes=with_nodes))
+
+
+@api.route('/hits/<hid>/instances')
+@admin_required
+def hit_instances(hid):
+    """Lists the instances of a HIT, one page at a time
+
+    Args:
+        hid (str): hit ID
+        with_nodes (query): include the nodes and journeys of the instances
+        cursor (str, query): next_cursor of the previous page
+        limit (int, query): page size
+        fields (str, query): comma-separated keys of the instance objects to return
+
+    Returns:
+        {"items": list of instance objects, "next_cursor": cursor of the next page or null}
+    """
+    if app.session.get(HITSpec, int(hid)) is None:
+        return jsonify({'msg': 'not found'}), 404
+    return instances_page(select(HITInstance).where(HITInstance.hitspec_id == int(hid)))
 
 
 
@@ -32,7 +59,8 @@ def hit(hid):
 def instance(iid):
     with_nodes = request.args.get('with_nodes', True)
     with_response_info = request.args.get('with_response_info', True)
-    res = app.session.query(HITInstance).get(bytes.fromhex(iid))
+    options = loaders.hit_instance_with_nodes if with_nodes else loaders.hit_instance
+    res = app.session.query(HITInstance).options(*options).get(bytes.fromhex(iid))
     return jsonify_or_404(res, with_nodes=with_nodes)
 
 
@@ -43,30 +71,25 @@ def instance(iid):
 
 
 @api.route('/hits/<hid>/instances/add')
+@admin_required
 def instance_add(hid):
-    """Adds an instance (link) to the HIT
+    """Adds instances (links) to the HIT
 
     Args:
         hid (str): HIT ID
 
     Returns:
-        json: the added instance object
+        json: the HIT object, with the ids of the added instances in "instances"
     """
-    num_instances = request.args.get('num_instances', 1)
-    hit = app.session.query(HITSpec).get(bytes.fromhex(hid))
+    num_instances = int(request.args.get('num_instances', 1))
+    hit = app.session.query(HITSpec).get(int(hid))
     if hit is None:
         return jsonify({'msg': 'not found'}), 404
 
-    for i in range(0, num_instances):
-        hit.instantiate()
-
+    instance_ids = hit.instantiate_bulk(app.session, num_instances)
     app.session.commit()
-    with_instances = request.args.get('with_instances', True)
-    with_instance_tasks = request.args.get('with_instance_tasks', False)
 
-    return jsonify_or_404(hit,
-                          with_instances=with_instances,
-                          with_instance_tasks=with_instance_tasks)
+    return jsonify({**hit.to_dict(), 'instances': [iid.hex() for iid in instance_ids]})
 
 
 @api.route('/hits/<hid>/instances/add_and_redirect')
@@ -4,9 +4,9 @@ from flask import current_app as app
 from flask import jsonify, redirect, request, stream_with_context
 
 from covfee.server.orm.journey import JourneyInstanceStatus
-from covfee.server.socketio.socket import socketio
+from covfee.server.socketio.socket import admin_feed, socketio
 
-from ..orm import JourneyInstance
+from ..orm import JourneyInstance, loaders
 from .api import api
 from .auth import admin_required
 from .utils import jsonify_or_404
@@ -18,7 +18,8 @@ from .utils import jsonify_or_404
 def journey(jid):
     with_nodes = request.args.get("with_nodes", True)
     with_response_info = request.args.get("with_response_info", True)
-    res = app.session.query(JourneyInstance).get(bytes.fromhex(jid))
+    options = loaders.journey_with_nodes if with_nodes else loaders.journey
+    res = app.session.query(JourneyInstance).options(*options).get(bytes.fromhex(jid))
     return jsonify_or_404(
         res, with_nodes=with_nodes, with_response_info=with_response_info
     )
@@ -31,7 +32,7 @@ def journey_submit(jid):
     app.session.commit()
     payload = journey.make_status_payload()
     socketio.emit("journey_status", payload, to=journey.id.hex())
-    socketio.emit("journey_status", payload, namespace="/admin")
+    admin_feed.publish_entities(journey)
 
     return jsonify_or_404(journey, with_nodes=False, with_response_info=True)
 
@@ -46,7 +47,7 @@ def journey_disable(jid):
 
     payload = journey.make_status_payload()
     socketio.emit("journey_status", payload, to=journey.id.hex())
-    socketio.emit("journey_status", payload, namespace="/admin")
+    admin_feed.publish_entities(journey)
 
     return "", 200
 
@@ -67,6 +68,7 @@ def node_ready(jid, nidx, value):
 
     payload = node.make_status_payload(prev_status)
     socketio.emit("status", payload, to=node.id)
-    socketio.emit("status", payload, namespace="/admin")
+    socketio.emit("status", payload, to=node.id, namespace="/admin")
+    admin_feed.publish_entities(node, with_journeys=True)
 
     return "", 200
@@ -2,12 +2,13 @@ from flask import current_app as app
 from flask import jsonify, request
 
 from covfee.server.orm.node import NodeInstance, NodeInstanceManualStatus
-from covfee.server.socketio.socket import socketio
+from covfee.server.socketio.socket import admin_feed, socketio
 
 from ..orm import NodeInstanceStatus, TaskInstance
+from ..tasks.registry import task_registry
 from .api import api
 from .auth import admin_required
-from .utils import jsonify_or_404
+from .utils import get_fields, jsonify_or_404, select_fields
 
 # TASKS
 
@@ -18,6 +19,45 @@ def nodes(nid):
     return jsonify_or_404(node)
 
 
+@api.route("/nodes/<nid>/aggregates")
+@admin_required
+def node_aggregates(nid):
+    """Aggregates of the responses to the node across all the instances of its spec,
+    ie. all the journeys that go through it (see BaseCovfeeTask.aggregate)
+
+    Args:
+        step (float, query): time between samples of the aggregated traces
+        max_lag (int, query): largest lag between annotators considered, in samples,
+            at most AGGREGATES_MAX_LAG
+        fields (str, query): comma-separated keys of the aggregates to return
+
+    Returns:
+        list of aggregates, empty if the task type does not define any
+    """
+    task = app.session.get(NodeInstance, int(nid))
+    if task is None or not isinstance(task, TaskInstance):
+        return jsonify({"msg": "invalid task"}), 400
+
+    step = request.args.get("step", type=float)
+    max_lag = request.args.get("max_lag", 0, type=int)
+    max_lag_limit = app.config["AGGREGATES_MAX_LAG"]
+    if (step is not None and step <= 0) or not 0 <= max_lag <= max_lag_limit:
+        return jsonify(
+            {"msg": f"step must be positive and max_lag between 0 and {max_lag_limit}"}
+        ), 400
+
+    fields = get_fields()
+    task_class = task_registry.get_class(task.spec.spec["type"])
+    return jsonify(
+        [
+            select_fields(aggregate, fields)
+            for aggregate in task_class.aggregate(
+                app.session, [task.nodespec_id], step=step, max_lag=max_lag
+            )
+        ]
+    )
+
+
 @api.route("/nodes/<nid>/make_response", methods=["POST"])
 def make_response(nid):
     submit = bool(request.args.get("submit", False))
@@ -53,7 +93,8 @@ def response_submit(nid):
 
     payload = task.make_status_payload()
     socketio.emit("status", payload, to=task.id)
-    socketio.emit("status", payload, namespace="/admin")
+    socketio.emit("status", payload, to=task.id, namespace="/admin")
+    admin_feed.publish_entities(task)
 
     return "", 200
 
@@ -70,7 +111,8 @@ def set_manual_status(nid, status):
     # notify users and admins
     payload = node.make_status_payload()
     socketio.emit("status", payload, to=node.id)
-    socketio.emit("status", payload, namespace="/admin")
+    socketio.emit("status", payload, to=node.id, namespace="/admin")
+    admin_feed.publish_entities(node)
     return "", 200
 
 
@@ -85,7 +127,8 @@ def restart_node(nid):
         node.add_response()
         payload = node.make_status_payload()
         socketio.emit("status", payload, to=node.id)
-        socketio.emit("status", payload, namespace="/admin")
+        socketio.emit("status", payload, to=node.id, namespace="/admin")
+        admin_feed.publish_entities(node)
 
     app.session.commit()
     return "", 200
@@ -1,3 +1,8 @@
+import datetime
+import os
+import shutil
+import tempfile
+
 from flask import (
     request,
     jsonify,
@@ -7,46 +12,94 @@ from flask import (
     current_app as app,
 )
 import zipstream
+from sqlalchemy import select
 
 from .api import api
 from .auth import admin_required
-from .utils import jsonify_or_404
-from ..orm import Project
+from .hits import instances_page
+from .utils import jsonify_or_404, jsonify_page
+from ..orm import HITInstance, HITSpec, Project, loaders
+from ..orm.export import ParallelResultsExporter, ParquetExporter, parse_since
 
 
 # return all projects
 @api.route("/projects")
 @admin_required
 def projects():
-    """Lists all the projects currently in covfee
+    """Lists the projects currently in covfee, one page at a time
+
+    Args:
+        cursor (str, query): next_cursor of the previous page
+        limit (int, query): page size
+        fields (str, query): comma-separated keys of the project objects to return
 
     Returns:
-        [type]: list of project objects
+        {"items": list of project objects, "next_cursor": cursor of the next page or null}
+        The HIT instances of a project are listed by /projects/<pid>/instances
     """
-    with_hits = request.args.get("with_hits", False)
-    with_hit_nodes = request.args.get("with_hit_nodes", False)
-    res = app.session.query(Project).all()
-    if res is None:
-        return jsonify([])
-    else:
-        return jsonify(
-            [p.to_dict(with_hits=with_hits, with_hit_nodes=with_hit_nodes) for p in res]
-        )
+    return jsonify_page(
+        app.session,
+        select(Project).options(loaders.project),
+        Project.id,
+        lambda p: p.to_dict(with_hits=False),
+    )
 
 
 # return one project
 @api.route("/projects/<pid>")
 @admin_required
 def project(pid):
-    """Returns a project object
+    """Returns a project object with its HIT specifications.
+    The HIT instances are listed by /projects/<pid>/instances
 
     Args:
         pid (str): project ID
+        fields (str, query): comma-separated keys to return
     """
-    with_hits = request.args.get("with_hits", False)
-    with_hit_nodes = request.args.get("with_hit_nodes", False)
-    res = app.session.query(Project).get(pid)
-    return jsonify_or_404(res, with_hits=with_hits, with_hit_nodes=with_hit_nodes)
+    res = app.session.get(Project, pid, options=[loaders.project])
+    return jsonify_or_404(res, with_hits=False)
+
+
+@api.route("/projects/<pid>/summary")
+@admin_required
+def project_summary(pid):
+    """Status counts of a project for the admin dashboard, computed in the database:
+    number of (submitted) HIT instances, journey status counts, online and submitted journeys
+    and node status counts, per HIT and per node.
+    Its cost does not depend on the number of instances.
+
+    Args:
+        pid (str): project ID
+    """
+    project = app.session.get(Project, pid)
+    if project is None:
+        return {"msg": "not found"}, 404
+    return jsonify(project.make_summary_dict())
+
+
+@api.route("/projects/<pid>/instances")
+@admin_required
+def project_instances(pid):
+    """Lists the HIT instances of a project, one page at a time
+
+    Args:
+        pid (str): project ID
+        hit_id (int, query): only list the instances of this HIT
+        with_nodes (query): include the nodes and journeys of the instances
+        cursor (str, query): next_cursor of the previous page
+        limit (int, query): page size
+        fields (str, query): comma-separated keys of the instance objects to return
+
+    Returns:
+        {"items": list of instance objects, "next_cursor": cursor of the next page or null}
+    """
+    if app.session.get(Project, pid) is None:
+        return {"msg": "not found"}, 404
+
+    stmt = select(HITInstance).join(HITSpec).where(HITSpec.project_id == pid)
+    if "hit_id" in request.args:
+        stmt = stmt.where(HITInstance.hitspec_id == request.args["hit_id"])
+    return instances_page(stmt)
 
 
 @api.route("/projects/<pid>/csv")
@@ -82,22 +135,87 @@ def project_download(pid):
 
     Args:
         pid (str): project ID
+        format (str, query): "json" (default) for one JSON file per HIT instance,
+            "parquet" for one Parquet dataset per task type (requires pyarrow)
+        since (str, query): ISO timestamp (watermark). Only export what changed after it:
+            the files of the updated HIT instances (json) or the updated rows (parquet)
 
     Returns:
         [type]: stream response with a compressed archive. 204 if the project has no responses
+        The X-Covfee-Watermark header holds the since value for the next incremental export.
     """
     project = app.session.query(Project).get(pid)
     if project is None:
         return {"msg": "not found"}, 404
 
-    def generator():
-        z = zipstream.ZipFile(mode="w", compression=zipstream.ZIP_DEFLATED)
-        for chunk in project.stream_download(z, "./"):
-            yield chunk
-        yield from z
+    since = None
+    if "since" in request.args:
+        try:
+            since = parse_since(request.args["since"])
+        except ValueError:
+            return {"msg": "invalid since timestamp"}, 400
+        since -= datetime.timedelta(seconds=app.config["EXPORT_SINCE_OVERLAP"])
+    # taken before reading, rows updated during the export are included in the next one
+    watermark = datetime.datetime.now().isoformat()
+
+    if request.args.get("format", "json") == "parquet":
+        response = project_download_parquet(project, since)
+    else:
 
-    response = Response(stream_with_context(generator()), mimetype="application/zip")
+        workers = app.config["EXPORT_WORKERS"]
+
+        def generator():
+            z = zipstream.ZipFile(mode="w", compression=zipstream.ZIP_DEFLATED)
+            if workers > 0:
+                chunks = ParallelResultsExporter(
+                    app.session, app.config, workers
+                ).stream_project(z, "./", project.id, since)
+            else:
+                chunks = project.stream_download(z, "./", since=since)
+            for chunk in chunks:
+                yield chunk
+            yield from z
+
+        response = Response(
+            stream_with_context(generator()), mimetype="application/zip"
+        )
+        response.headers["Content-Disposition"] = "attachment; filename={}".format(
+            "results.zip"
+        )
+
+    if isinstance(response, Response):
+        response.headers["X-Covfee-Watermark"] = watermark
+    return response
+
+
+def project_download_parquet(project: Project, since: datetime.datetime = None):
+    try:
+        exporter = ParquetExporter(app.session)
+    except ImportError as ex:
+        return {"msg": str(ex)}, 501
+
+    # Parquet files are written in full (the footer comes last), then zipped
+    out_dir = tempfile.mkdtemp(prefix="covfee-export-")
+    try:
+        exporter.write_project(out_dir, project.id, since)
+    except Exception:
+        shutil.rmtree(out_dir, ignore_errors=True)
+        raise
+
+    def generator():
+        try:
+            # parquet files are already compressed
+            z = zipstream.ZipFile(mode="w", compression=zipstream.ZIP_STORED)
+            for root, _, files in os.walk(out_dir):
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    z.write(path, os.path.relpath(path, out_dir))
+            yield from z
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+    response = Response(generator(), mimetype="application/zip")
     response.headers["Content-Disposition"] = "attachment; filename={}".format(
-        "results.zip"
+        "results_parquet.zip"
     )
     return response
@@ -2,15 +2,108 @@ import json
 from enum import Enum
 from typing import Union
 
-from flask import jsonify
+from flask import current_app as app, jsonify, request
+from sqlalchemy import Select
 from flask.json.provider import JSONProvider
 
 
+def get_fields():
+    """Sparse fieldset of the current request (?fields=id,name).
+
+    Returns:
+        set | None: the requested keys, None if all keys are requested
+    """
+    fields = request.args.get("fields")
+    if not fields:
+        return None
+    return {"id", *(f.strip() for f in fields.split(",") if f.strip())}
+
+
+def select_fields(obj_dict: dict, fields=None):
+    """Only keeps the keys of obj_dict in fields (see get_fields)"""
+    if fields is None:
+        return obj_dict
+    return {k: v for k, v in obj_dict.items() if k in fields}
+
+
 def jsonify_or_404(res, **kwargs):
     if res is None:
         return {"msg": "not found"}, 404
     else:
-        return jsonify(res.to_dict(**kwargs))
+        return jsonify(select_fields(res.to_dict(**kwargs), get_fields()))
+
+
+def get_limit(default_limit=None, max_limit=None):
+    """Page size of the current request (?limit=), capped at API_MAX_PAGE_SIZE
+
+    Raises:
+        ValueError: if the limit is not a positive integer
+    """
+    if default_limit is None:
+        default_limit = app.config["API_PAGE_SIZE"]
+    if max_limit is None:
+        max_limit = app.config["API_MAX_PAGE_SIZE"]
+    limit = int(request.args.get("limit", default_limit))
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return min(limit, max_limit)
+
+
+def paginate(session, stmt: Select, key, descending=False, **limit_args):
+    """Keyset pagination of the rows of stmt by the (unique) key column.
+    Reads the cursor and limit query arguments of the current request.
+    The cursor is the key of the last row of the previous page,
+    so every page costs the same regardless of its position.
+
+    Returns:
+        (list, str | None): the rows of the page and the cursor of the next page (None in the last page)
+
+    Raises:
+        ValueError: if the cursor or limit arguments are invalid
+    """
+    limit = get_limit(**limit_args)
+
+    cursor = request.args.get("cursor")
+    if cursor is not None:
+        if key.type.python_type is bytes:
+            cursor = bytes.fromhex(cursor)
+        else:
+            cursor = key.type.python_type(cursor)
+        stmt = stmt.where(key < cursor if descending else key > cursor)
+
+    order = key.desc() if descending else key
+    rows = session.execute(stmt.order_by(order).limit(limit + 1)).scalars().all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = getattr(rows[-1], key.key)
+    return rows, last.hex() if isinstance(last, bytes) else str(last)
+
+
+def jsonify_page(session, stmt: Select, key, to_dict=None, descending=False):
+    """Paginated listing endpoint: responds with one page of the rows of stmt
+
+    Args:
+        to_dict: row -> dict, defaults to row.to_dict()
+
+    Returns:
+        {"items": [...], "next_cursor": str | null}. 400 if the cursor or limit are invalid.
+    """
+    try:
+        rows, next_cursor = paginate(session, stmt, key, descending)
+    except ValueError:
+        return {"msg": "invalid cursor or limit"}, 400
+
+    if to_dict is None:
+        to_dict = lambda row: row.to_dict()
+    fields = get_fields()
+    return jsonify(
+        {
+            "items": [select_fields(to_dict(row), fields) for row in rows],
+            "next_cursor": next_cursor,
+        }
+    )
 
 
 class CovfeeJSONEncoder(json.JSONEncoder):
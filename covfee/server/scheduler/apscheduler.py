@@ -1,3 +0,0 @@
-from apscheduler.schedulers.background import BackgroundScheduler
-
-scheduler = BackgroundScheduler()
@@ -0,0 +1,122 @@
+import heapq
+import itertools
+import threading
+import traceback
+from datetime import datetime
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class DeadlineScheduler:
+    """Runs callbacks for keyed deadlines from a single loop.
+    Deadlines are kept in a heap. Rescheduling a key pushes a new entry and cancelling it
+    only forgets the key: stale heap entries are skipped when they reach the top,
+    and the heap is rebuilt when they outnumber the live ones.
+    Both operations are O(log n).
+
+    The loop sleeps until the earliest deadline and calls fire() once with all the
+    keys that are due (up to max_batch), in deadline order.
+    """
+
+    def __init__(self, fire: Callable[[List[Hashable]], None], max_batch=500):
+        self.fire = fire
+        self.max_batch = max_batch
+
+        self.heap: List[Tuple[datetime, int, Hashable]] = []
+        # key -> sequence number of its live heap entry
+        self.entries: Dict[Hashable, Tuple[datetime, int]] = {}
+        self.counter = itertools.count()
+
+        self.condition = threading.Condition()
+        self.thread: Optional[threading.Thread] = None
+        self.running = False
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key: Hashable):
+        return key in self.entries
+
+    def get(self, key: Hashable) -> Optional[datetime]:
+        entry = self.entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def schedule(self, key: Hashable, deadline: datetime):
+        """Schedules key at deadline, replacing its previous deadline if any"""
+        with self.condition:
+            seq = next(self.counter)
+            self.entries[key] = (deadline, seq)
+            heapq.heappush(self.heap, (deadline, seq, key))
+            # wake up the loop if this is the new earliest deadline
+            if self.heap[0][1] == seq:
+                self.condition.notify()
+
+    def cancel(self, key: Hashable) -> bool:
+        with self.condition:
+            if self.entries.pop(key, None) is None:
+                return False
+            if len(self.heap) > 2 * len(self.entries) + 64:
+                self._compact()
+            return True
+
+    def _compact(self):
+        self.heap = [
+            (deadline, seq, key) for key, (deadline, seq) in self.entries.items()
+        ]
+        heapq.heapify(self.heap)
+
+    def _is_live(self, seq, key):
+        entry = self.entries.get(key)
+        return entry is not None and entry[1] == seq
+
+    def pop_due(self, now: datetime) -> List[Hashable]:
+        """Removes and returns the keys due at now, up to max_batch"""
+        due = []
+        with self.condition:
+            while self.heap and len(due) < self.max_batch:
+                deadline, seq, key = self.heap[0]
+                if not self._is_live(seq, key):
+                    heapq.heappop(self.heap)
+                elif deadline <= now:
+                    heapq.heappop(self.heap)
+                    del self.entries[key]
+                    due.append(key)
+                else:
+                    break
+        return due
+
+    def _next_deadline(self) -> Optional[datetime]:
+        while self.heap and not self._is_live(self.heap[0][1], self.heap[0][2]):
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def _run(self):
+        while self.running:
+            due = self.pop_due(datetime.now())
+            if due:
+                try:
+                    self.fire(due)
+                except Exception:
+                    print(traceback.format_exc())
+                continue
+
+            with self.condition:
+                deadline = self._next_deadline()
+                timeout = (
+                    None
+                    if deadline is None
+                    else max(0, (deadline - datetime.now()).total_seconds())
+                )
+                if self.running and timeout != 0:
+                    self.condition.wait(timeout)
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+import traceback
 from datetime import datetime, timedelta
-from typing import TYPE_CHECKING, Literal
+from typing import TYPE_CHECKING, Dict, List, Literal, Optional, Tuple
 
-from covfee.server.socketio.socket import socketio
+from sqlalchemy import event
+from sqlalchemy.orm import Session, joinedload, object_session, selectinload
 
-from .apscheduler import scheduler
+from covfee.server.socketio.socket import admin_feed, socketio
+
+from .deadlines import DeadlineScheduler
 
 if TYPE_CHECKING:
     from covfee.server.orm.node import NodeInstance
@@ -13,26 +17,101 @@ if TYPE_CHECKING:
 TimerName = Literal["pause", "finish", "empty", "count"]
 
 
-def update_status_job(timer: TimerName, node_id):
-    from covfee.server.orm.node import NodeInstance
+def fire_timers(timers: List[Tuple[int, TimerName]]):
+    """Applies the status transitions of a batch of due timers.
+    All the timers in the batch share a session and a single commit.
+    """
+    from covfee.server.orm.node import (JourneyNode, NodeInstance,
+                                        NodeInstanceStatus)
+    from covfee.server.orm.task import TaskInstance
 
     with NodeInstance.sessionmaker() as session:
-        node: NodeInstance = session.query(NodeInstance).get(node_id)
-        if node is None:
-            return print(f"update_status_job could not find node with id {node_id}")
+        # load everything used by check_timer and the status payloads
+        nodes = {
+            node.id: node
+            for node in session.query(NodeInstance)
+            .options(
+                joinedload(NodeInstance.spec),
+                selectinload(NodeInstance.curr_journeys),
+                selectinload(NodeInstance.journey_associations).joinedload(
+                    JourneyNode.journey
+                ),
+                selectinload(TaskInstance.responses),
+            )
+            .filter(NodeInstance.id.in_({node_id for node_id, _ in timers}))
+            # other workers may be changing the status of the same nodes
+            .with_for_update(of=NodeInstance)
+        }
 
-        node.check_timer(timer)
-        session.commit()
-        payload = node.make_status_payload()
+        updated_nodes = {}
+        for node_id, timer in timers:
+            node = nodes.get(node_id)
+            if node is None:
+                print(f"fire_timers could not find node with id {node_id}")
+                continue
+            if node.status == NodeInstanceStatus.FINISHED:
+                print(f"Timer {node_id}_{timer} fired after node finished")
+                continue
+            if timer not in get_pending_timers(node):
+                # the status changed without cancelling it, eg. in another worker
+                print(f"Timer {node_id}_{timer} fired but is no longer pending")
+                continue
+            try:
+                node.check_timer(timer)
+                updated_nodes[node_id] = node
+            except Exception:
+                print(traceback.format_exc())
 
         # notify the node's journeys in case the journey status has changed.
         # it can change when the node is paused or finished
-        for journey in node.journeys:
-            socketio.emit("journey_status", journey.make_status_payload(), to=journey.id.hex())
-            socketio.emit("journey_status", journey.make_status_payload(), namespace="/admin")
+        # payloads are built before the commit expires the loaded objects
+        journey_payloads = {
+            journey.id: journey.make_status_payload()
+            for node in updated_nodes.values()
+            for journey in node.journeys
+        }
+        node_payloads = [node.make_status_payload() for node in updated_nodes.values()]
+        feed_records = [
+            admin_feed.record(journey)
+            for node in updated_nodes.values()
+            for journey in node.journeys
+        ] + [admin_feed.record(node) for node in updated_nodes.values()]
+        session.commit()
+
+    for journey_id, payload in journey_payloads.items():
+        socketio.emit("journey_status", payload, to=journey_id.hex())
+
+    for payload in node_payloads:
+        socketio.emit("status", payload, to=payload["node_id"])
+        socketio.emit("status", payload, to=payload["node_id"], namespace="/admin")
+
+    # a single feed event for the whole batch
+    admin_feed.publish(feed_records)
+
 
-        socketio.emit("status", payload, to=node.id)
-        socketio.emit("status", payload, namespace="/admin")
+# pending timers, keyed by (node_id, timer)
+scheduler = DeadlineScheduler(fire_timers)
+
+
+def _after_commit(node: NodeInstance, fn, *args):
+    """Runs a scheduler operation for the node once its session commits,
+    so that timers of status changes that are rolled back are not (un)scheduled.
+    """
+    session = object_session(node)
+    if session is None:
+        return fn(*args)
+    session.info.setdefault("timer_operations", []).append((fn, args))
+
+
+@event.listens_for(Session, "after_commit")
+def _run_timer_operations(session):
+    for fn, args in session.info.pop("timer_operations", []):
+        fn(*args)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_timer_operations(session):
+    session.info.pop("timer_operations", None)
 
 
 def schedule_timer(node: NodeInstance, timer: TimerName):
@@ -50,16 +129,11 @@ def schedule_timer(node: NodeInstance, timer: TimerName):
         if timer_time is None:
             return
 
-        scheduler.add_job(
-            update_status_job,
-            "date",
-            run_date=datetime.now() + timedelta(seconds=timer_time),
-            kwargs={
-                "timer": timer,
-                # "sessionmaker": app.sessionmaker,
-                "node_id": node.id,
-            },
-            id=f"{node.id}_pause",
+        _after_commit(
+            node,
+            scheduler.schedule,
+            (node.id, timer),
+            datetime.now() + timedelta(seconds=timer_time),
         )
 
     elif timer == "finish":
@@ -68,16 +142,11 @@ def schedule_timer(node: NodeInstance, timer: TimerName):
         if timer_time is None:
             return
 
-        scheduler.add_job(
-            update_status_job,
-            "date",
-            run_date=datetime.now() + timedelta(seconds=timer_time - node.t_elapsed),
-            kwargs={
-                "timer": timer,
-                # "sessionmaker": app.sessionmaker,
-                "node_id": node.id,
-            },
-            id=f"{node.id}_finish",
+        _after_commit(
+            node,
+            scheduler.schedule,
+            (node.id, timer),
+            datetime.now() + timedelta(seconds=timer_time - node.t_elapsed),
         )
         # app.logger.info(f"Scheduled job finish: node={node.id}, ")
 
@@ -87,16 +156,11 @@ def schedule_timer(node: NodeInstance, timer: TimerName):
         if timer_time == 0:
             raise ValueError("schedule_timer called for countdown but coundown is zero")
 
-        scheduler.add_job(
-            update_status_job,
-            "date",
-            run_date=datetime.now() + timedelta(seconds=timer_time),
-            kwargs={
-                "timer": timer,
-                # "sessionmaker": app.sessionmaker,
-                "node_id": node.id,
-            },
-            id=f"{node.id}_count",
+        _after_commit(
+            node,
+            scheduler.schedule,
+            (node.id, timer),
+            datetime.now() + timedelta(seconds=timer_time),
         )
         print(f"Scheduled job finish: node={node.id}, ")
 
@@ -104,10 +168,94 @@ def schedule_timer(node: NodeInstance, timer: TimerName):
         raise NotImplementedError()
 
 
+def _cancel_timer(node_id: int, timer: TimerName):
+    if scheduler.cancel((node_id, timer)):
+        print(f"Timer {node_id}_{timer} cancelled")
+
+
 def stop_timer(node: NodeInstance, timer=TimerName):
-    job_id = f"{node.id}_{timer}"
-    job = scheduler.get_job(job_id)
+    _after_commit(node, _cancel_timer, node.id, timer)
+
+
+def get_pending_timers(node: NodeInstance) -> Dict[TimerName, datetime]:
+    """Returns the timers that must be pending for the node, with their run dates.
+    Derived from the node status, dt_* and t_elapsed following the same rules
+    as NodeInstance.set_status
+    """
+    from covfee.server.orm.node import (NodeInstanceManualStatus,
+                                        NodeInstanceStatus)
+
+    # timers are stopped while the node is finished or under manual control
+    if (
+        node.status in [NodeInstanceStatus.INIT, NodeInstanceStatus.FINISHED]
+        or node.manual != NodeInstanceManualStatus.DISABLED
+    ):
+        return {}
+
+    settings = node.spec.settings
+    timers = {}
+
+    timer_countdown = settings.get("countdown", 0)
+    if node.status == NodeInstanceStatus.COUNTDOWN and timer_countdown and node.dt_count:
+        timers["count"] = node.dt_count + timedelta(seconds=timer_countdown)
+
+    timer_finish = settings.get("timer", None)
+    if timer_finish is not None and node.dt_start is not None:
+        if not node.timer_pausable:
+            timers["finish"] = node.dt_start + timedelta(seconds=timer_finish)
+        elif node.status == NodeInstanceStatus.RUNNING and node.dt_play is not None:
+            timers["finish"] = node.dt_play + timedelta(
+                seconds=timer_finish - node.t_elapsed
+            )
+
+    timer_pause = settings.get("timer_pause", None)
+    if node.status == NodeInstanceStatus.PAUSED and timer_pause is not None and node.dt_pause:
+        timers["pause"] = node.dt_pause + timedelta(seconds=timer_pause)
+
+    return timers
+
+
+def reconcile_timers(session, misfire_grace_time: Optional[float] = None):
+    """Makes the scheduled timers match the state of the nodes in the database.
+    Timers live in memory: on startup this restores them from the nodes. Timers that
+    came due while the server was down fire immediately, unless they are late by
+    more than misfire_grace_time seconds.
+    """
+    from covfee.server.orm.node import NodeInstance, NodeInstanceStatus
+
+    nodes = (
+        session.query(NodeInstance)
+        .options(joinedload(NodeInstance.spec))
+        .filter(
+            NodeInstance.status.in_(
+                [
+                    NodeInstanceStatus.COUNTDOWN,
+                    NodeInstanceStatus.RUNNING,
+                    NodeInstanceStatus.PAUSED,
+                ]
+            )
+        )
+    )
+    expected = {}
+    for node in nodes:
+        for timer, deadline in get_pending_timers(node).items():
+            expected[(node.id, timer)] = deadline
+
+    now = datetime.now()
+    num_missed = 0
+    for key in list(scheduler.entries):
+        if key not in expected:
+            scheduler.cancel(key)
+    for key, deadline in expected.items():
+        if (
+            misfire_grace_time is not None
+            and deadline < now - timedelta(seconds=misfire_grace_time)
+        ):
+            num_missed += 1
+            scheduler.cancel(key)
+        else:
+            scheduler.schedule(key, deadline)
 
-    if job is not None:
-        scheduler.remove_job(job_id)
-        print(f"Job {job_id} cancelled")
+    print(f"Timers reconciled: {len(expected) - num_missed} pending")
+    if num_missed:
+        print(f"{num_missed} timers skipped, late by more than {misfire_grace_time}s")
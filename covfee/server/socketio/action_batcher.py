@@ -0,0 +1,64 @@
+from typing import Any, Dict, List
+
+import eventlet
+
+from covfee.logger import logger
+
+from .checkpointer import StateCheckpointer
+from .redux_store import ReduxStoreClient
+
+
+class ActionBatcher:
+    """Coalesces the Redux actions sent to a node over a short window.
+    The first action received for a node starts the window. When it closes, all the
+    actions queued for the node are dispatched to the store with a single `actions`
+    request and broadcast with a single `actions` event:
+        {"nodeId": ..., "actionIndex": <index of the first action>, "actions": [...]}
+    so that clients can apply them in order.
+    """
+
+    def __init__(
+        self, socketio, store: ReduxStoreClient, checkpointer: StateCheckpointer
+    ):
+        self.socketio = socketio
+        self.store = store
+        self.checkpointer = checkpointer
+        self.queues: Dict[int, List[Any]] = {}
+        # pending flush of each queue, cancelled when the queue is flushed early
+        self.timers: Dict[int, Any] = {}
+
+    def add(self, node_id: int, action, window: float):
+        node_id = int(node_id)
+        if node_id not in self.queues:
+            self.queues[node_id] = []
+            self.timers[node_id] = eventlet.spawn_after(
+                window, self._flush_in_background, node_id
+            )
+        self.queues[node_id].append(action)
+
+    def _flush_in_background(self, node_id: int):
+        try:
+            self.flush(node_id)
+        except Exception:
+            logger.exception(f"ActionBatcher: could not flush actions of node {node_id}")
+
+    def flush(self, node_id: int):
+        """Sends the actions queued for the node to the store and broadcasts them.
+        Called when the window closes, and before reading the state of the store (eg. on leave)
+        """
+        node_id = int(node_id)
+        timer = self.timers.pop(node_id, None)
+        if timer is not None:
+            timer.cancel()
+        actions = self.queues.pop(node_id, None)
+        if not actions:
+            return
+
+        res = self.store.actions(node_id, actions)
+        if not res["success"]:
+            return logger.error(f"ActionBatcher: store rejected actions for node {node_id}")
+        self.checkpointer.mark(node_id, res["actionIndex"] + len(actions) - 1)
+
+        payload = {"nodeId": node_id, "actionIndex": res["actionIndex"], "actions": actions}
+        self.socketio.emit("actions", payload, to=node_id)
+        self.socketio.emit("actions", payload, to=node_id, namespace="/admin")
@@ -0,0 +1,236 @@
+import secrets
+import threading
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, text
+
+# (kind, id, hit_id, fields) of an entity, see AdminFeed.record
+Record = Tuple[str, Any, str, Dict[str, Any]]
+
+
+class MemoryFeedLog:
+    """The last `size` deltas of the feed, kept in memory by a single server process.
+    Sequence numbers restart with the server, epoch tells clients when that happened.
+    """
+
+    shared = False
+
+    def __init__(self, size=10000):
+        self.lock = threading.Lock()
+        self.epoch = secrets.token_hex(4)
+        self.seq = 0
+        self.deltas = deque(maxlen=size)
+
+    def position(self) -> Tuple[str, int]:
+        return self.epoch, self.seq
+
+    def append(self, deltas: List[dict]) -> List[dict]:
+        """Assigns the next sequence numbers to the deltas and stores them"""
+        with self.lock:
+            for delta in deltas:
+                self.seq += 1
+                delta["seq"] = self.seq
+                self.deltas.append(delta)
+        return deltas
+
+    def since(self, seq: int) -> Optional[List[dict]]:
+        with self.lock:
+            if seq > self.seq:
+                return None
+            if seq == self.seq:
+                return []
+            if not self.deltas or self.deltas[0]["seq"] > seq + 1:
+                return None
+            return list(islice(self.deltas, seq + 1 - self.deltas[0]["seq"], None))
+
+
+class DatabaseFeedLog:
+    """The last `size` deltas of the feed, stored in the admin_feed table.
+    Used when several server workers publish to the same feed: the ids of the rows
+    are the sequence numbers, which then survive restarts (epoch is constant).
+    """
+
+    shared = True
+    epoch = "db"
+
+    # deltas older than the last `size` are deleted every `prune_every` publications
+    prune_every = 100
+
+    def __init__(self, size=10000):
+        self.size = size
+        self.num_appends = 0
+
+    def position(self) -> Tuple[str, int]:
+        from covfee.server.orm.base import Base
+        from covfee.server.orm.feed import AdminFeedEntry
+
+        with Base.sessionmaker() as session:
+            seq = session.execute(select(func.max(AdminFeedEntry.id))).scalar()
+        return self.epoch, seq or 0
+
+    def append(self, deltas: List[dict]) -> List[dict]:
+        from covfee.server.orm.base import Base
+        from covfee.server.orm.feed import AdminFeedEntry
+
+        with Base.sessionmaker() as session:
+            if session.get_bind().dialect.name == "postgresql":
+                # sequence numbers must become visible in order, or a client catching
+                # up could skip one committed after a later one
+                session.execute(
+                    text("LOCK TABLE admin_feed IN SHARE ROW EXCLUSIVE MODE")
+                )
+            entries = [AdminFeedEntry(delta=delta) for delta in deltas]
+            session.add_all(entries)
+            session.flush()
+            for entry, delta in zip(entries, deltas):
+                delta["seq"] = entry.id
+
+            self.num_appends += 1
+            if self.num_appends % self.prune_every == 0:
+                session.execute(
+                    delete(AdminFeedEntry).where(
+                        AdminFeedEntry.id <= deltas[-1]["seq"] - self.size
+                    )
+                )
+            session.commit()
+        return deltas
+
+    def since(self, seq: int) -> Optional[List[dict]]:
+        from covfee.server.orm.base import Base
+        from covfee.server.orm.feed import AdminFeedEntry
+
+        with Base.sessionmaker() as session:
+            rows = session.execute(
+                select(AdminFeedEntry.id, AdminFeedEntry.delta)
+                .where(AdminFeedEntry.id >= seq)
+                .order_by(AdminFeedEntry.id)
+            ).all()
+        # the delta with seq itself must still be there, unless nothing was published yet
+        if seq > 0 and (not rows or rows[0].id != seq):
+            return None
+        return [{**delta, "seq": id} for id, delta in rows if id > seq]
+
+
+class AdminFeed:
+    """Sequenced stream of status deltas for the admin dashboard.
+
+    Status changes of nodes and journeys are published as "feed" events on the /admin
+    namespace, instead of broadcasting the full status payloads. Each event is a list of deltas:
+
+        {"seq": 12, "kind": "node", "id": 5, "hit_id": "ab01...", "status": "RUNNING"}
+
+    A delta holds only the fields that changed since the previous delta of the same entity
+    (all of them the first time). seq increases by one with every delta, so that clients can
+    detect missed deltas and catch up with since(seq), from the last `size` deltas kept in the log.
+
+    A single server keeps the log in memory (MemoryFeedLog). With several workers
+    (configure(shared=True)) the log is the admin_feed table, and deltas hold all the fields:
+    a worker cannot know what the others published.
+    """
+
+    def __init__(self, socketio, size=10000, max_snapshots=100000):
+        self.socketio = socketio
+        self.lock = threading.Lock()
+        self.log = MemoryFeedLog(size)
+        # (kind, id) -> last published fields, least recently published first
+        self.snapshots: OrderedDict = OrderedDict()
+        self.max_snapshots = max_snapshots
+
+    def configure(self, size: int, shared=False):
+        with self.lock:
+            if shared:
+                self.log = DatabaseFeedLog(size)
+            else:
+                self.log = MemoryFeedLog(size)
+            self.snapshots.clear()
+
+    def position(self) -> Tuple[str, int]:
+        """(epoch, seq) of the last published delta"""
+        return self.log.position()
+
+    @staticmethod
+    def record(entity, with_journeys=False) -> Record:
+        """Fields of a node or journey, as shown in the admin dashboard.
+        Must be called while the entity is loaded (eg. before the session commits).
+
+        Args:
+            with_journeys (bool): for nodes, include the (ready, online) status of their journeys.
+                Clients otherwise derive online from the curr_node_id of the journeys.
+        """
+        # the orm imports the socketio objects
+        from covfee.server.orm import utils
+        from covfee.server.orm.journey import JourneyInstance, JourneyInstanceStatus
+        from covfee.server.orm.node import NodeInstance
+        from covfee.server.orm.task import TaskInstance
+
+        if isinstance(entity, NodeInstance):
+            fields = {
+                "status": entity.get_masked_status().name,
+                "manual": entity.manual.name,
+                "dt_start": utils.datetime_to_str(entity.dt_start),
+                "dt_play": utils.datetime_to_str(entity.dt_play),
+                "dt_count": utils.datetime_to_str(entity.dt_count),
+                "dt_pause": utils.datetime_to_str(entity.dt_pause),
+                "dt_finish": utils.datetime_to_str(entity.dt_finish),
+                "t_elapsed": entity.t_elapsed,
+            }
+            if isinstance(entity, TaskInstance):
+                fields["response_id"] = entity.responses[-1].id
+            if with_journeys:
+                fields["journeys"] = entity.make_journey_status_dict()
+            return ("node", entity.id, entity.hit_id.hex(), fields)
+
+        if isinstance(entity, JourneyInstance):
+            fields = {
+                "status": entity.status.name,
+                "num_connections": entity.num_connections,
+                "curr_node_id": entity.curr_node_id,
+                "dt_submitted": utils.datetime_to_str(entity.dt_submitted),
+                "max_submitted_node_index": entity.max_submitted_node_index,
+            }
+            if entity.status == JourneyInstanceStatus.FINISHED:
+                fields["completion_info"] = entity.get_completion_info()
+            return ("journey", entity.id.hex(), entity.hit_id.hex(), fields)
+
+        raise TypeError(f"unsupported entity {entity}")
+
+    def publish(self, records: List[Record]) -> List[dict]:
+        """Emits the deltas of the records to the admins. Records without changes are skipped.
+
+        Returns:
+            list: the published deltas
+        """
+        deltas = []
+        with self.lock:
+            for kind, id, hit_id, fields in records:
+                if self.log.shared:
+                    changed = fields
+                else:
+                    key = (kind, id)
+                    prev = self.snapshots.pop(key, {})
+                    changed = {k: v for k, v in fields.items() if prev.get(k, self) != v}
+                    self.snapshots[key] = {**prev, **fields}
+                if changed:
+                    deltas.append({"kind": kind, "id": id, "hit_id": hit_id, **changed})
+
+            while len(self.snapshots) > self.max_snapshots:
+                self.snapshots.popitem(last=False)
+
+            published = self.log.append(deltas) if deltas else []
+
+        if published:
+            self.socketio.emit("feed", published, namespace="/admin")
+        return published
+
+    def publish_entities(self, *entities, with_journeys=False) -> List[dict]:
+        return self.publish([self.record(e, with_journeys) for e in entities])
+
+    def since(self, seq: int) -> Optional[List[dict]]:
+        """Deltas published after seq, in order.
+
+        Returns:
+            list | None: None if some of them are no longer kept. The client must then reload.
+        """
+        return self.log.since(seq)
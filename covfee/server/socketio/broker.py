@@ -0,0 +1,19 @@
+import zmq
+
+
+def get_broker_url(host="127.0.0.1", port=5570) -> str:
+    """SOCKETIO_MESSAGE_QUEUE of the workers connecting to run_broker(host, port)"""
+    return f"zmq+tcp://{host}:{port}+{port + 1}"
+
+
+def run_broker(host="127.0.0.1", port=5570):
+    """zmq message queue of the socket.io workers, a local stand-in for redis.
+    Workers push their messages to port, the broker publishes them to all the workers on port + 1.
+    Blocks forever.
+    """
+    context = zmq.Context()
+    receiver = context.socket(zmq.PULL)
+    receiver.bind(f"tcp://{host}:{port}")
+    publisher = context.socket(zmq.PUB)
+    publisher.bind(f"tcp://{host}:{port + 1}")
+    zmq.proxy(receiver, publisher)
@@ -0,0 +1,120 @@
+from typing import Dict
+
+from sqlalchemy import func, select, update
+
+from covfee.logger import logger
+
+from .redux_store import ReduxStoreClient, StoreUnavailableError
+
+
+class StateCheckpointer:
+    """Periodically writes the shared (Redux) state of active nodes to the database.
+    Without it the state is only persisted when a client leaves the node, so a server crash
+    loses every action since the last leave.
+
+    Nodes are marked dirty with the actionIndex reported by the store after executing an action.
+    Every interval seconds, the state of (at most max_batch) dirty nodes is pulled from the store
+    and written to their latest TaskResponse in a single transaction. Nodes whose written state
+    already includes their last action are skipped.
+    """
+
+    def __init__(self, socketio, store: ReduxStoreClient):
+        self.socketio = socketio
+        self.store = store
+        # node id -> last actionIndex reported by the store
+        self.dirty: Dict[int, int] = {}
+        # node id -> actionIndex of the last action included in the state written to the database
+        self.persisted: Dict[int, int] = {}
+
+    def mark(self, node_id: int, action_index: int):
+        if action_index <= self.persisted.get(node_id, -1):
+            # the room of the node was closed and opened again, restarting its actionIndex.
+            # (or the action was reported after a checkpoint that included it, written twice)
+            del self.persisted[node_id]
+        self.dirty[node_id] = max(action_index, self.dirty.get(node_id, -1))
+
+    def start(self, sessionmaker, interval: float, max_batch: int):
+        if not interval:
+            return
+        self.socketio.start_background_task(
+            self._run, sessionmaker, interval, max_batch
+        )
+
+    def _run(self, sessionmaker, interval: float, max_batch: int):
+        while True:
+            self.socketio.sleep(interval)
+            try:
+                self.checkpoint(sessionmaker, max_batch)
+            except Exception:
+                logger.exception("StateCheckpointer: checkpoint failed")
+
+    def checkpoint(self, sessionmaker, max_batch: int) -> int:
+        """Persists the state of up to max_batch dirty nodes. Returns the number of nodes written.
+        Nodes stay dirty until their state is committed, so that nodes whose state could not
+        be read or written are retried by the next checkpoint.
+        """
+        node_ids = [
+            node_id
+            for node_id, action_index in self.dirty.items()
+            if action_index > self.persisted.get(node_id, -1)
+        ][:max_batch]
+        if not node_ids:
+            return 0
+
+        # pipeline the state requests
+        futures = [
+            self.store.send({"command": "state", "responseId": node_id})
+            for node_id in node_ids
+        ]
+        states = {}
+        # node id -> actionIndex of the last action included in its state
+        state_indices = {}
+        for node_id, future in zip(node_ids, futures):
+            try:
+                res = future.result()
+            except StoreUnavailableError:
+                logger.error(f"StateCheckpointer: could not read the state of node {node_id}")
+                continue
+            if res["success"]:
+                states[node_id] = res["state"]
+                state_indices[node_id] = res["actionIndex"] - 1
+            else:
+                # the room was closed and its state saved on leave
+                self._clear(node_id, self.dirty.get(node_id, -1))
+                self.persisted.pop(node_id, None)
+
+        written = 0
+        if states:
+            from covfee.server.orm.response import TaskResponse
+
+            with sessionmaker() as session:
+                latest_responses = session.execute(
+                    select(TaskResponse.node_id, func.max(TaskResponse.id))
+                    .where(TaskResponse.node_id.in_(states.keys()))
+                    .group_by(TaskResponse.node_id)
+                ).all()
+                session.execute(
+                    update(TaskResponse),
+                    [
+                        {"id": response_id, "state": states[node_id]}
+                        for node_id, response_id in latest_responses
+                    ],
+                )
+                session.commit()
+            written = len(latest_responses)
+
+            for node_id, action_index in state_indices.items():
+                self.persisted[node_id] = action_index
+                self._clear(node_id, action_index)
+
+        # nodes that could not be read go after the other dirty nodes, so that they
+        # do not hold back the rest when there are more than max_batch
+        for node_id in node_ids:
+            if node_id in self.dirty and node_id not in states:
+                self.dirty[node_id] = self.dirty.pop(node_id)
+        return written
+
+    def _clear(self, node_id: int, action_index: int):
+        """Unmarks the node unless it received actions after action_index"""
+        if self.dirty.get(node_id, -1) <= action_index:
+            self.dirty.pop(node_id, None)
@@ -6,12 +6,17 @@ from typing import Union
 from flask import current_app as app
 from flask import session
 from flask_socketio import emit, join_room, leave_room, send
+from sqlalchemy import case, select, update
 
 from covfee.server.orm import JourneyInstance, NodeInstance
 from covfee.server.orm.chat import Chat
 from covfee.server.orm.journey import JourneyInstanceStatus
+from covfee.server.orm.response import TaskResponse
 from covfee.server.orm.task import TaskInstance
-from covfee.server.socketio.socket import socketio, store
+from covfee.server.socketio.socket import (admin_feed, batcher, checkpointer,
+                                          socketio, store)
+from covfee.server.socketio.state_patch import (CachedState, PatchError,
+                                                StateCache, apply_patch)
 
 from ..tasks.base import CriticalError
 
@@ -28,6 +33,43 @@ def get_chat(chatId: int) -> Chat:
     return app.session.query(Chat).get(chatId)
 
 
+def lock_node(node: NodeInstance):
+    """Reloads the node and locks its row until the session commits (SELECT ... FOR UPDATE),
+    so that status changes of the same node by other workers do not interleave.
+    The journeys in the node (curr_journeys) are reloaded on access.
+    """
+    app.session.refresh(node, with_for_update=True)
+
+
+def add_connections(journey: JourneyInstance, n: int):
+    """Adds n to the connections of the journey in a single UPDATE,
+    as its connections may be handled by different workers.
+    """
+    num_connections = JourneyInstance.num_connections + n
+    app.session.execute(
+        update(JourneyInstance)
+        .where(JourneyInstance.id == journey.id)
+        .values(num_connections=case((num_connections > 0, num_connections), else_=0))
+        .execution_options(synchronize_session=False)
+    )
+    app.session.expire(journey, ["num_connections"])
+
+
+# autosaved state of recently saved nodes, base of the state_patch event
+state_cache = StateCache()
+
+
+def cache_saved_state(nodeId: int, response: TaskResponse) -> int:
+    """Caches the state of the response as saved in the database. Returns its version"""
+    prev = state_cache.get(nodeId)
+    version = prev.version + 1 if prev is not None else 0
+    state_cache.put(
+        nodeId,
+        CachedState(response.id, response.updated_at, version, response.state),
+    )
+    return version
+
+
 def get_on_join_payload(node: TaskInstance, journey: JourneyInstance):
     response = node.responses[-1].to_dict()
     task_object = node.get_task_object()
@@ -64,14 +106,14 @@ def on_connect(data):
     journey = get_journey(data["journeyId"])
     if journey is None:
         return False
-    journey.num_connections += 1
+    add_connections(journey, 1)
     if journey.dt_first_join is None:
         journey.set_status(JourneyInstanceStatus.RUNNING)
         journey.dt_first_join = datetime.datetime.now()
     app.session.commit()
 
     session["journeyId"] = data["journeyId"]
-    emit("journey_status", journey.make_status_payload(), namespace="/admin", broadcast=True)
+    admin_feed.publish_entities(journey)
     join_room(journey.id.hex())
 
 
@@ -111,14 +153,20 @@ def on_join(data):
         payload = prev_node.make_status_payload(prev_node_prev_status)
         app.logger.info(f"emit: status {str(payload)}")
         emit("status", payload, to=prev_node_id)
-        emit("status", payload, namespace="/admin", broadcast=True)
+        emit("status", payload, to=prev_node.id, namespace="/admin")
+        admin_feed.publish_entities(prev_node)
 
     join_room(curr_node_id)
+    lock_node(curr_node)
     curr_node_prev_status = curr_node.status
 
     # update the journey and node status
     curr_journey.set_curr_node(curr_node)
     join_payload = get_on_join_payload(curr_node, curr_journey)
+    if isinstance(curr_node, TaskInstance) and not use_shared_state:
+        join_payload["state_version"] = cache_saved_state(
+            curr_node_id, curr_node.responses[-1]
+        )
     curr_node.check_n()
     
     emit("join", join_payload)
@@ -129,7 +177,8 @@ def on_join(data):
     # update current node status
     payload = curr_node.make_status_payload(curr_node_prev_status)
     emit("status", payload, to=curr_node_id)
-    emit("status", payload, namespace="/admin", broadcast=True)
+    emit("status", payload, to=curr_node_id, namespace="/admin")
+    admin_feed.publish_entities(curr_node, curr_journey)
     app.logger.info(f"emit: status {str(payload)}")
 
     session["journeyId"] = curr_journey_id
@@ -191,7 +240,58 @@ def on_state(data):
 
     response = get_node(nodeId).responses[-1]
     response.state = state
+    app.session.flush()
+
+    # the saved state becomes the base for state_patch
+    version = cache_saved_state(nodeId, response)
     app.session.commit()
+    return {"success": True, "version": version}
+
+
+@socketio.on("state_patch")
+def on_state_patch(data):
+    """incremental version of the state event
+    data["patch"] is a delta on the state with version data["version"], either a
+    JSON merge patch (data["format"] == "merge", the default) or a JSON patch ("json-patch").
+    When the server does not hold that version, it replies with resync=True
+    and the client must send the full state event instead.
+    """
+    nodeId = int(data["nodeId"])
+    resync = {"success": False, "resync": True}
+
+    entry = state_cache.get(nodeId)
+    if entry is None or entry.version != data["version"]:
+        return resync
+
+    # the cached copy is only valid while the response was not written elsewhere
+    latest = app.session.execute(
+        select(TaskResponse.id, TaskResponse.updated_at)
+        .where(TaskResponse.node_id == nodeId)
+        .order_by(TaskResponse.id.desc())
+        .limit(1)
+    ).first()
+    if latest is None or tuple(latest) != (entry.response_id, entry.updated_at):
+        return resync
+
+    try:
+        state = apply_patch(entry.state, data["patch"], data.get("format", "merge"))
+    except PatchError as ex:
+        app.logger.warning(f"socketio: state_patch rejected: {ex}")
+        return resync
+
+    updated_at = datetime.datetime.now()
+    app.session.execute(
+        update(TaskResponse)
+        .where(TaskResponse.id == entry.response_id)
+        .values(state=state, updated_at=updated_at)
+    )
+    app.session.commit()
+
+    version = entry.version + 1
+    state_cache.put(
+        nodeId, CachedState(entry.response_id, updated_at, version, state)
+    )
+    return {"success": True, "version": version}
 
 
 @socketio.on("action")
@@ -199,14 +299,23 @@ def on_action(data):
     action = data["action"]
     nodeId = int(data["nodeId"])
 
+    # batch actions arriving within the window into a single store request and "actions" event
+    window = app.config.get("REDUX_STORE_BATCH_WINDOW", 0)
+    if window > 0:
+        return batcher.add(nodeId, action, window)
+
     res = store.action(nodeId, action)
     if res["success"]:
+        checkpointer.mark(nodeId, res["actionIndex"])
         emit("action", action, to=nodeId)
         emit("action", action, to=nodeId, namespace="/admin")
 
 
 def leave_store(nodeId):
+    nodeId = int(nodeId)
     app.logger.info(f"Leaving node {nodeId}")
+    # the state returned by the store must include queued actions
+    batcher.flush(nodeId)
     res = store.leave(nodeId)
     if res["success"]:
         # save state to database
@@ -223,32 +332,29 @@ def disconnect():
     # important: same journey can have multiple connections (tabs)
     journey_id = session["journeyId"]
     journey = get_journey(journey_id)
-    journey.num_connections = max(0, journey.num_connections - 1)
+    add_connections(journey, -1)
     node = journey.curr_node
 
     if node is not None:
+        lock_node(node)
         prev_status = node.status if node else None
         node.check_n()
     journey.set_curr_node(None)
     app.session.commit()
 
-    # broadcast to admins
-    payload = {
-        "hit_id": journey.hit_id.hex(),
-        "journey_id": journey_id,
-        "num_connections": journey.num_connections,
-    }
-    emit("journey_status", payload, namespace="/admin", broadcast=True)
+    # notify admins
+    admin_feed.publish_entities(journey)
 
     # now update node
     if not isinstance(node, TaskInstance):
         return
 
     if "useSharedState" in session and session["useSharedState"]:
-        leave_store(node.responses[-1].id)
+        leave_store(node.id)
 
     if node:
         payload = node.make_status_payload(prev_status)
         emit("status", payload, to=node.id)
-        emit("status", payload, namespace="/admin", broadcast=True)
+        emit("status", payload, to=node.id, namespace="/admin")
+        admin_feed.publish_entities(node)
         app.logger.info(f"emit: status {str(payload)}")
@@ -1,11 +1,48 @@
+import itertools
 import json
 import os
+from typing import Dict
 
-import zmq
+import eventlet
+from eventlet.event import Event
+from eventlet.green import zmq
 
 context = zmq.Context()
 
 
+class StoreUnavailableError(RuntimeError):
+    def __init__(self):
+        super().__init__(
+            "The Redux store service may not be running or the store service host/port may be incorrect"
+        )
+
+
+class StoreFuture:
+    """Pending reply to a request sent to the store"""
+
+    def __init__(self, client: "ReduxStoreClient", request_id: int):
+        self.client = client
+        self.request_id = request_id
+        self.event = Event()
+
+    def done(self):
+        return self.event.ready()
+
+    def result(self, timeout: float = None):
+        """Waits (cooperatively) for the reply of the store and returns it.
+
+        Raises:
+            StoreUnavailableError: if no reply arrives within timeout seconds.
+        """
+        timeout = self.client.timeout if timeout is None else timeout
+        try:
+            with eventlet.Timeout(timeout):
+                return self.event.wait()
+        except eventlet.Timeout as ex:
+            self.client.on_timeout(self)
+            raise StoreUnavailableError() from ex
+
+
 class ReduxStoreClient:
     """This class takes care of replicating the shared state in multi-party tasks server-side for
     persistence and synchronization.
@@ -14,25 +51,76 @@ class ReduxStoreClient:
     to all clients to update their state to match the server's true state.
     The true state is stored in the database for persistence.
     The server's state is kept in a nodejs service that this class communicates with via zmq.
+
+    Requests go through a single DEALER socket and are tagged with a requestId
+    that the store echoes back, so any number of green threads can have requests in
+    flight at the same time. A receiver green thread resolves the matching StoreFuture.
     """
 
-    def __init__(self):
-        #  Socket to talk to server
-        self.socket = context.socket(zmq.REQ)
-        self.socket.setsockopt(zmq.RCVTIMEO, 500)
-        host = os.environ.get("COVFEE_REDUX_STORE_HOST", "127.0.0.1")
-        port = os.environ.get("COVFEE_REDUX_STORE_PORT", "5555")
-        self.socket.connect(f"tcp://{host}:{port}")
+    def __init__(self, host=None, port=None, timeout=0.5):
+        host = host or os.environ.get("COVFEE_REDUX_STORE_HOST", "127.0.0.1")
+        port = port or os.environ.get("COVFEE_REDUX_STORE_PORT", "5555")
+        self.address = f"tcp://{host}:{port}"
+        # seconds to wait for a reply, see configure()
+        self.timeout = timeout
+
+        self.socket = None
+        self.receiver = None
+        self.request_ids = itertools.count()
+        self.pending: Dict[int, StoreFuture] = {}
+
+    def configure(self, timeout: float):
+        """Applies the app config (REDUX_STORE_TIMEOUT)"""
+        self.timeout = timeout
+
+    def connect(self):
+        self.socket = context.socket(zmq.DEALER)
+        # drop unsent requests on close instead of replaying them on a new connection
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.connect(self.address)
+        self.receiver = eventlet.spawn(self._receive_loop, self.socket)
+
+    def close(self):
+        if self.socket is None:
+            return
+        self.receiver.kill()
+        self.socket.close()
+        self.socket = None
+
+        # requests sent through the closed socket will never get a reply
+        pending, self.pending = self.pending, {}
+        for future in pending.values():
+            future.event.send_exception(StoreUnavailableError())
+
+    def _receive_loop(self, socket):
+        while True:
+            message = socket.recv()
+            res = json.loads(message.decode("utf-8"))
+            future = self.pending.pop(res.pop("requestId", None), None)
+            if future is not None:
+                future.event.send(res)
+            # else the request timed out already
+
+    def on_timeout(self, future: StoreFuture):
+        """Called when a request times out.
+        The store is unresponsive or gone, so we reconnect with a fresh socket
+        """
+        self.pending.pop(future.request_id, None)
+        self.close()
+
+    def send(self, payload) -> StoreFuture:
+        """Sends a request to the store without waiting for the reply.
+        Several requests can be sent before collecting their results (pipelining).
+        """
+        if self.socket is None:
+            self.connect()
+        future = StoreFuture(self, next(self.request_ids))
+        self.pending[future.request_id] = future
+        self.socket.send_json({**payload, "requestId": future.request_id})
+        return future
 
     def socket_request(self, payload):
-        self.socket.send_json(payload)
-        try:
-            message = self.socket.recv()
-        except zmq.error.Again as e:
-            raise RuntimeError(
-                "The Redux store service may not be running or the store service host/port may be incorrect"
-            ) from e
-        return json.loads(message.decode("utf-8"))
+        return self.send(payload).result()
 
     def join(self, nodeId, taskName, currState):
         return self.socket_request(
@@ -52,6 +140,14 @@ class ReduxStoreClient:
             {"command": "action", "responseId": nodeId, "action": action}
         )
 
+    def actions(self, nodeId, actions):
+        """Dispatches several actions in order with a single request.
+        The reply holds the actionIndex of the first action.
+        """
+        return self.socket_request(
+            {"command": "actions", "responseId": nodeId, "actions": actions}
+        )
+
     def state(self, nodeId):
         return self.socket_request({"command": "state", "responseId": nodeId})
 
@@ -1,6 +1,12 @@
 from flask_socketio import SocketIO
 
+from covfee.server.socketio.action_batcher import ActionBatcher
+from covfee.server.socketio.admin_feed import AdminFeed
+from covfee.server.socketio.checkpointer import StateCheckpointer
 from covfee.server.socketio.redux_store import ReduxStoreClient
 
 socketio = SocketIO()
 store = ReduxStoreClient()
+checkpointer = StateCheckpointer(socketio, store)
+batcher = ActionBatcher(socketio, store, checkpointer)
+admin_feed = AdminFeed(socketio)
@@ -0,0 +1,148 @@
+import copy
+import datetime
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+
+
+class PatchError(ValueError):
+    pass
+
+
+def apply_merge_patch(target, patch):
+    """Applies a JSON merge patch (RFC 7386). null values remove keys."""
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = apply_merge_patch(result.get(key), value)
+    return result
+
+
+def _parse_pointer(pointer: str):
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise PatchError(f"invalid JSON pointer {pointer}")
+    return [p.replace("~1", "/").replace("~0", "~") for p in pointer[1:].split("/")]
+
+
+def _list_index(container: list, key: str, allow_end=False):
+    if key == "-" and allow_end:
+        return len(container)
+    if not key.isdigit():
+        raise PatchError(f"invalid array index {key}")
+    index = int(key)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise PatchError(f"array index {key} out of range")
+    return index
+
+
+def _resolve(doc, path):
+    for key in path:
+        if isinstance(doc, list):
+            doc = doc[_list_index(doc, key)]
+        elif isinstance(doc, dict) and key in doc:
+            doc = doc[key]
+        else:
+            raise PatchError(f"path /{'/'.join(path)} not found")
+    return doc
+
+
+def _add(doc, path, value):
+    if not path:
+        return value
+    parent = _resolve(doc, path[:-1])
+    if isinstance(parent, list):
+        parent.insert(_list_index(parent, path[-1], allow_end=True), value)
+    elif isinstance(parent, dict):
+        parent[path[-1]] = value
+    else:
+        raise PatchError(f"cannot add to /{'/'.join(path)}")
+    return doc
+
+
+def _remove(doc, path):
+    if not path:
+        raise PatchError("cannot remove the root")
+    parent = _resolve(doc, path[:-1])
+    value = _resolve(parent, path[-1:])
+    if isinstance(parent, list):
+        del parent[int(path[-1])]
+    else:
+        del parent[path[-1]]
+    return value
+
+
+def apply_json_patch(doc, operations):
+    """Applies a JSON patch (RFC 6902) and returns the patched copy of doc"""
+    doc = copy.deepcopy(doc)
+    for op in operations:
+        try:
+            name = op["op"]
+            path = _parse_pointer(op["path"])
+            if name == "add":
+                doc = _add(doc, path, copy.deepcopy(op["value"]))
+            elif name == "remove":
+                _remove(doc, path)
+            elif name == "replace":
+                _resolve(doc, path)
+                if path:
+                    _remove(doc, path)
+                doc = _add(doc, path, copy.deepcopy(op["value"]))
+            elif name in ("move", "copy"):
+                from_path = _parse_pointer(op["from"])
+                if name == "move":
+                    value = _remove(doc, from_path)
+                else:
+                    value = copy.deepcopy(_resolve(doc, from_path))
+                doc = _add(doc, path, value)
+            elif name == "test":
+                if _resolve(doc, path) != op["value"]:
+                    raise PatchError(f"test failed at {op['path']}")
+            else:
+                raise PatchError(f"unknown operation {name}")
+        except (KeyError, TypeError) as ex:
+            raise PatchError(f"invalid operation {op}") from ex
+    return doc
+
+
+def apply_patch(state, patch, format="merge"):
+    if format == "merge":
+        return apply_merge_patch(state, patch)
+    if format == "json-patch":
+        return apply_json_patch(state, patch)
+    raise PatchError(f"unknown patch format {format}")
+
+
+@dataclass
+class CachedState:
+    response_id: int
+    # updated_at of the response when cached. A different value means
+    # the response was written elsewhere (eg. on submit) and the copy is stale
+    updated_at: datetime.datetime
+    version: int
+    state: Any
+
+
+class StateCache:
+    """LRU cache of the autosaved state of the latest response of each node"""
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self.entries: "OrderedDict[int, CachedState]" = OrderedDict()
+
+    def get(self, node_id: int) -> Optional[CachedState]:
+        entry = self.entries.get(node_id)
+        if entry is not None:
+            self.entries.move_to_end(node_id)
+        return entry
+
+    def put(self, node_id: int, entry: CachedState):
+        self.entries[node_id] = entry
+        self.entries.move_to_end(node_id)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
@@ -0,0 +1,211 @@
+"""Aggregation and inter-annotator agreement of continuous annotations.
+
+The traces of several annotators are aligned as a matrix of annotators x samples on a
+common time base, with NaN where an annotator has no value. All the statistics take
+that matrix and are vectorized over annotators and samples.
+"""
+
+from __future__ import annotations
+
+import warnings
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def resample(times: np.ndarray, values: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    """Linear interpolation of a trace at the times of grid, NaN outside of the trace"""
+    times = np.asarray(times, dtype=float)
+    values = np.asarray(values, dtype=float)
+    valid = ~(np.isnan(times) | np.isnan(values))
+    times, values = times[valid], values[valid]
+    out = np.full(len(grid), np.nan)
+    if len(times) == 0:
+        return out
+    if np.any(np.diff(times) < 0):
+        order = np.argsort(times, kind="stable")
+        times, values = times[order], values[order]
+    inside = (grid >= times[0]) & (grid <= times[-1])
+    out[inside] = np.interp(grid[inside], times, values)
+    return out
+
+
+def align(
+    traces: Sequence[Tuple[np.ndarray, np.ndarray]], step: Optional[float] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Resamples (times, values) traces on a common time base.
+
+    The base goes from the earliest to the latest time of the traces in increments of step,
+    by default the median sampling interval of the traces.
+
+    Returns:
+        (times of the samples, annotators x samples matrix)
+    """
+    times = [np.asarray(t, dtype=float) for t, _ in traces]
+    nonempty = [t for t in times if np.any(~np.isnan(t))]
+    if not nonempty:
+        return np.empty(0), np.empty((len(traces), 0))
+    start = min(np.nanmin(t) for t in nonempty)
+    end = max(np.nanmax(t) for t in nonempty)
+    if step is None:
+        intervals = [np.nanmedian(np.diff(t)) for t in nonempty if len(t) > 1]
+        step = float(np.median(intervals)) if intervals else 1.0
+    if not step > 0:
+        raise ValueError("step must be positive")
+
+    grid = start + step * np.arange(int(np.floor((end - start) / step + 1e-9)) + 1)
+    matrix = np.vstack([resample(t, v, grid) for t, v in traces])
+    return grid, matrix
+
+
+def mean_trace(matrix: np.ndarray) -> np.ndarray:
+    """Mean of the annotators at every sample, NaN where nobody annotated"""
+    valid = ~np.isnan(matrix)
+    counts = valid.sum(axis=0)
+    sums = np.where(valid, matrix, 0).sum(axis=0)
+    return np.divide(sums, counts, out=np.full(matrix.shape[1], np.nan), where=counts > 0)
+
+
+def median_trace(matrix: np.ndarray) -> np.ndarray:
+    """Median of the annotators at every sample, NaN where nobody annotated"""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN samples
+        return np.nanmedian(matrix, axis=0)
+
+
+def krippendorff_alpha(matrix: np.ndarray) -> float:
+    """Krippendorff's alpha with the interval metric. Samples are the units, missing
+    values are allowed. Only samples with two or more values are pairable.
+    """
+    valid = ~np.isnan(matrix)
+    counts = valid.sum(axis=0)
+    pairable = counts >= 2
+    x = np.where(valid[:, pairable], matrix[:, pairable], 0).astype(np.float64)
+    m = counts[pairable]
+    n = m.sum()
+    if n < 2:
+        return np.nan
+
+    s1 = x.sum(axis=0)
+    s2 = (x * x).sum(axis=0)
+    # sum over ordered pairs of values of (v - v')^2 is 2 (m sum(v^2) - sum(v)^2)
+    observed = (2 * (m * s2 - s1**2) / (m - 1)).sum() / n
+    expected = 2 * (n * s2.sum() - s1.sum() ** 2) / (n * (n - 1))
+    if expected <= 0:
+        return np.nan
+    return float(1 - observed / expected)
+
+
+def icc(matrix: np.ndarray, consistency=False) -> float:
+    """Intraclass correlation of single annotators, from a two-way ANOVA of the samples
+    where all the annotators have a value: ICC(2,1) (absolute agreement) by default,
+    ICC(3,1) with consistency=True.
+    """
+    x = matrix[:, ~np.isnan(matrix).any(axis=0)].T.astype(np.float64)
+    n, k = x.shape
+    if n < 2 or k < 2:
+        return np.nan
+
+    grand = x.mean()
+    ss_samples = k * ((x.mean(axis=1) - grand) ** 2).sum()
+    ss_annotators = n * ((x.mean(axis=0) - grand) ** 2).sum()
+    ss_error = ((x - grand) ** 2).sum() - ss_samples - ss_annotators
+    ms_samples = ss_samples / (n - 1)
+    ms_annotators = ss_annotators / (k - 1)
+    ms_error = ss_error / ((n - 1) * (k - 1))
+
+    denominator = ms_samples + (k - 1) * ms_error
+    if not consistency:
+        denominator += k * (ms_annotators - ms_error) / n
+    if denominator == 0:
+        return np.nan
+    return float((ms_samples - ms_error) / denominator)
+
+
+def lag_correlation(
+    matrix: np.ndarray, max_lag: int, block_size=16
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Lag of every annotator with respect to the mean of the others: the lag in
+    [-max_lag, max_lag] samples with the highest correlation, and that correlation.
+    A positive lag means the annotator is late. Cross-correlations are computed with FFTs,
+    block_size annotators at a time. max_lag is clamped to the number of samples - 1.
+
+    Returns:
+        (lags, correlations), one per annotator
+    """
+    k, num_samples = matrix.shape
+    # larger lags have no overlap, and wrap around in the FFT
+    max_lag = max(min(max_lag, num_samples - 1), 0)
+    lags = np.arange(-max_lag, max_lag + 1)
+    best_lags = np.zeros(k, dtype=int)
+    best_corrs = np.full(k, np.nan)
+    if k < 2 or num_samples < 2:
+        return best_lags, best_corrs
+
+    valid = ~np.isnan(matrix)
+    x = np.where(valid, matrix, 0).astype(np.float64)
+    counts = valid.sum(axis=0)
+    sums = x.sum(axis=0)
+    nfft = 1 << int(np.ceil(np.log2(2 * num_samples)))
+
+    for lo in range(0, k, block_size):
+        hi = min(lo + block_size, k)
+        own = x[lo:hi]
+        num_others = counts - valid[lo:hi]
+        others = np.divide(
+            sums - own, num_others, out=np.zeros_like(own), where=num_others > 0
+        )
+        both = valid[lo:hi] & (num_others > 0)
+        a = np.where(both, own, 0)
+        b = np.where(both, others, 0)
+        num_both = np.maximum(both.sum(axis=1, keepdims=True), 1)
+        a = np.where(both, a - a.sum(axis=1, keepdims=True) / num_both, 0)
+        b = np.where(both, b - b.sum(axis=1, keepdims=True) / num_both, 0)
+
+        # cc[:, l] = sum_t a[t + l] b[t]
+        cc = np.fft.irfft(
+            np.fft.rfft(a, nfft) * np.conj(np.fft.rfft(b, nfft)), nfft
+        )[:, lags % nfft]
+        norm = np.sqrt((a * a).sum(axis=1) * (b * b).sum(axis=1))[:, None]
+        corr = np.divide(cc, norm, out=np.full_like(cc, np.nan), where=norm > 0)
+        has_corr = ~np.isnan(corr).all(axis=1)
+        best = np.argmax(np.where(np.isnan(corr), -np.inf, corr), axis=1)
+        best_lags[lo:hi] = np.where(has_corr, lags[best], 0)
+        best_corrs[lo:hi] = np.where(has_corr, corr[np.arange(hi - lo), best], np.nan)
+    return best_lags, best_corrs
+
+
+def summarize(
+    traces: Sequence[Tuple[np.ndarray, np.ndarray]],
+    step: Optional[float] = None,
+    max_lag: int = 0,
+) -> Dict[str, Any]:
+    """Aligns the (times, values) traces of several annotators and computes the aggregate
+    traces and the agreement statistics. max_lag is in samples of the common time base.
+    """
+    times, matrix = align(traces, step)
+    res: Dict[str, Any] = {
+        "num_annotators": len(traces),
+        "time": times,
+        "mean": mean_trace(matrix),
+        "median": median_trace(matrix),
+        "alpha": krippendorff_alpha(matrix),
+        "icc": icc(matrix),
+        "icc_consistency": icc(matrix, consistency=True),
+    }
+    res["lags"], res["lag_correlations"] = lag_correlation(matrix, max_lag)
+    return res
+
+
+def to_json(summary: Dict[str, Any]) -> Dict[str, Any]:
+    """The summary with lists instead of arrays and None instead of NaN"""
+    res: Dict[str, Any] = {}
+    for key, value in summary.items():
+        if isinstance(value, np.ndarray) and value.dtype.kind == "f":
+            value = np.where(np.isnan(value), None, value.astype(object)).tolist()
+        elif isinstance(value, np.ndarray):
+            value = value.tolist()
+        elif isinstance(value, float) and np.isnan(value):
+            value = None
+        res[key] = value
+    return res
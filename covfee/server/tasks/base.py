@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional
 
 from flask import Blueprint
 
@@ -8,7 +8,11 @@ from ...logger import logger
 from ..orm.journey import JourneyInstance
 
 if TYPE_CHECKING:
+    import datetime
+
+    from sqlalchemy import Select
     from sqlalchemy.engine import Connection
+    from sqlalchemy.orm import Session
 
     from covfee.server.orm.response import TaskResponse
     from covfee.server.orm.task import TaskInstance
@@ -37,6 +41,14 @@ class BaseCovfeeTask:
     def get_blueprint(cls) -> Blueprint | None:
         return None
 
+    @classmethod
+    def on_register(cls):
+        """Called once per process, before the first task object of this type is created.
+        Override for expensive setup shared by all the tasks of the type (reading config, creating clients)
+        instead of doing it in __init__, which runs for every task object.
+        """
+        pass
+
     def get_task_specific_props(self) -> dict:
         """Used to extend the dict that is send to the browser as props for the task element.
 
@@ -85,6 +97,48 @@ class BaseCovfeeTask:
         """
         logger.info("BaseCovfeeTask: on_create")
 
+    @classmethod
+    def on_create_batch(
+        cls, tasks: List[TaskInstance], connection: Connection | None = None
+    ):
+        """Called once per task type when tasks are created in bulk (HITSpec.instantiate_bulk)
+        instead of on_create for every task.
+        By default it calls on_create for each task. Override to do the work of many tasks at once.
+        """
+        for task in tasks:
+            cls(task=task).on_create(connection)
+
+    @classmethod
+    def export_tables(
+        cls,
+        session: Session,
+        task_ids: Select,
+        batch_size: int = 1000,
+        since: Optional[datetime.datetime] = None,
+    ) -> Dict[str, Iterator[List[Dict[str, Any]]]]:
+        """Task specific tables of the columnar export (ParquetExporter),
+        written next to the responses table in the dataset of the task type.
+        task_ids is a select of the ids of the tasks being exported.
+        If since is given, only rows updated after it should be exported (incremental export).
+
+        Returns:
+            dict: table name -> iterator over batches of rows (dicts with the same keys)
+        """
+        return {}
+
+    @classmethod
+    def aggregate(
+        cls, session: Session, nodespec_ids: Select | List[int], **kwargs
+    ) -> Iterator[Dict[str, Any]]:
+        """Aggregates of the responses to each node (spec) across all its instances,
+        eg. agreement statistics. kwargs are task specific options.
+        Served by /api/nodes/<nid>/aggregates.
+
+        Yields:
+            JSON-serializable dicts
+        """
+        return iter(())
+
     def on_join(self, journey: JourneyInstance = None):
         """Called when any visitor joins the task.
         May be called multiple times per journey.
@@ -1,3 +1,5 @@
+import itertools
+
 import pandas as pd
 from .base import BaseCovfeeTask
 
@@ -8,5 +10,5 @@ class ContinuousKeypointTask(BaseCovfeeTask):
         return {
             'hit_name': hitinstance.hit.name,
             'task_name': task.spec.name,
-            'data': [x for y in chunks for x in y]
+            'data': list(itertools.chain.from_iterable(chunks))
         }
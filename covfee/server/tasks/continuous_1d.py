@@ -1,3 +1,5 @@
+import itertools
+
 from .base import BaseCovfeeTask
 
 
@@ -5,4 +7,4 @@ class Continuous1DTask(BaseCovfeeTask):
 
     def aggregate_chunks(self, chunks):
         # concatenate all chunks together
-        return [x for y in chunks for x in y]
+        return list(itertools.chain.from_iterable(chunks))
@@ -1,18 +1,24 @@
 from __future__ import annotations
 
 import datetime
-from typing import TYPE_CHECKING, Any, Dict, Optional
+import json
+from collections import defaultdict
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
 
-from flask import Blueprint, jsonify, request
+import numpy as np
+from flask import Blueprint, Response, jsonify, request
 from flask import current_app as app
-from sqlalchemy import ForeignKey, insert, select
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import ForeignKey, delete, func, insert, select
+from sqlalchemy.orm import Mapped, mapped_column, object_session, relationship
 
-from covfee.server.orm import Base
+from covfee.server.orm import Base, NodeInstance
+from covfee.server.tasks.aggregation import summarize, to_json
 from covfee.server.tasks.base import BaseCovfeeTask
 
 if TYPE_CHECKING:
+    from sqlalchemy import Select
     from sqlalchemy.engine import Connection
+    from sqlalchemy.orm import Session
 
     from covfee.server.orm.task import TaskInstance
 
@@ -24,6 +30,37 @@ def jsonify_or_404(res, **kwargs):
         return jsonify(res.to_dict(**kwargs))
 
 
+def series_to_list(values: np.ndarray) -> List[Any]:
+    """JSON-friendly list of a series, with None for the frames that were never written"""
+    if values.dtype.kind == "f":
+        return np.where(np.isnan(values), None, values.astype(object)).tolist()
+    return values.tolist()
+
+
+def series_dtype(value: Any, dtype: Optional[str] = None) -> Optional[str]:
+    """The dtype to store a value of data_json as a series, or None to keep it in data_json.
+    Without dtype, only lists that read back unchanged are stored as series: lists of ints
+    that fit in int32, and lists of floats (or None) that are exact in float32.
+    With dtype, the dtype of an existing series, whether the value can be written to it:
+    float32 series take any numbers, int32 series only ints that fit.
+    """
+    if not isinstance(value, list) or len(value) == 0:
+        return None
+    if dtype in (None, "int32") and all(
+        type(v) is int and -(2**31) <= v < 2**31 for v in value
+    ):
+        return "int32"
+    if dtype == "float32" and all(
+        v is None or (isinstance(v, (int, float)) and not isinstance(v, bool)) for v in value
+    ):
+        return dtype
+    if dtype is None and all(
+        v is None or (type(v) is float and float(np.float32(v)) == v) for v in value
+    ):
+        return "float32"
+    return None
+
+
 class ContinuousAnnotationTask(BaseCovfeeTask):
     @classmethod
     def get_blueprint(cls):
@@ -31,21 +68,156 @@ class ContinuousAnnotationTask(BaseCovfeeTask):
 
     def on_create(self, connection: Connection) -> None:
         """Create annotation rows declared in the task spec."""
-        annotations = self.task.spec.spec.get("annotations", [])
-        if not annotations:
+        self.on_create_batch([self.task], connection)
+
+    @classmethod
+    def on_create_batch(cls, tasks: List[TaskInstance], connection: Connection) -> None:
+        """Create the annotation rows of all the tasks in a single insert."""
+        rows = [
+            {
+                "task_id": task.id,
+                "name": annot["name"],
+                "interface": annot["interface"],
+            }
+            for task in tasks
+            for annot in task.spec.spec.get("annotations", [])
+        ]
+        if not rows:
             return
 
-        connection.execute(
-            insert(Annotation),
-            [
-                {
-                    "task_id": self.task.id,
-                    "name": annot["name"],
-                    "interface": annot["interface"],
+        connection.execute(insert(Annotation), rows)
+
+    @classmethod
+    def export_tables(
+        cls,
+        session: Session,
+        task_ids: Select,
+        batch_size: int = 1000,
+        since: Optional[datetime.datetime] = None,
+    ) -> Dict[str, Iterator[List[Dict[str, Any]]]]:
+        """Exports the annotations with one column per key of data_json,
+        so that per-frame arrays become list columns, and their aggregates
+        (see aggregate) with one row per node, annotation name and series."""
+        return {
+            "annotations": cls._annotation_batches(session, task_ids, batch_size, since),
+            "aggregates": cls._aggregate_batches(session, task_ids, since),
+        }
+
+    @classmethod
+    def aggregate(
+        cls,
+        session: Session,
+        nodespec_ids: Select | List[int],
+        step: Optional[float] = None,
+        max_lag: int = 0,
+        time_series: str = "media_time",
+    ) -> Iterator[Dict[str, Any]]:
+        """Aggregates the annotations of each node (spec) across all its instances, ie. all
+        the journeys. The annotations of a node with the same name are the traces of different
+        annotators, and each of their series is aggregated separately (see aggregation.summarize).
+        The time_series series, if present, gives the times of the frames. Otherwise the frame
+        index is the time.
+
+        Yields:
+            the summary of every node, annotation name and series, as JSON
+        """
+        for nodespec_id in session.scalars(
+            select(NodeInstance.nodespec_id)
+            .where(NodeInstance.nodespec_id.in_(nodespec_ids))
+            .distinct()
+            .order_by(NodeInstance.nodespec_id)
+        ):
+            annotations = session.execute(
+                select(Annotation.id, Annotation.name)
+                .join(NodeInstance, Annotation.task_id == NodeInstance.id)
+                .where(NodeInstance.nodespec_id == nodespec_id)
+                .order_by(Annotation.id)
+            ).all()
+            arrays = Annotation.read_all_arrays(session, [annot.id for annot in annotations])
+
+            traces: Dict[Tuple[str, str], List[Tuple[np.ndarray, np.ndarray]]] = defaultdict(list)
+            for annot in annotations:
+                series = arrays.get(annot.id, {})
+                times = series.get(time_series)
+                for name, values in series.items():
+                    if name == time_series:
+                        continue
+                    if times is None:
+                        traces[annot.name, name].append((np.arange(len(values)), values))
+                    else:
+                        n = min(len(times), len(values))
+                        traces[annot.name, name].append((times[:n], values[:n]))
+
+            for (annot_name, series_name), series_traces in traces.items():
+                yield {
+                    "nodespec_id": nodespec_id,
+                    "name": annot_name,
+                    "series": series_name,
+                    **to_json(summarize(series_traces, step, max_lag)),
                 }
-                for annot in annotations
-            ],
-        )
+
+    @classmethod
+    def _aggregate_batches(
+        cls, session: Session, task_ids: Select, since: Optional[datetime.datetime]
+    ) -> Iterator[List[Dict[str, Any]]]:
+        nodespec_ids = select(NodeInstance.nodespec_id).where(NodeInstance.id.in_(task_ids))
+        if since is not None:
+            # nodes with annotations updated since, the aggregates of the others did not change
+            nodespec_ids = nodespec_ids.join(
+                Annotation, Annotation.task_id == NodeInstance.id
+            ).where(Annotation.updated_at > since)
+        for summary in cls.aggregate(session, nodespec_ids):
+            yield [summary]
+
+    @staticmethod
+    def _annotation_batches(
+        session: Session,
+        task_ids: Select,
+        batch_size: int,
+        since: Optional[datetime.datetime],
+    ) -> Iterator[List[Dict[str, Any]]]:
+        last_id = 0
+        while True:
+            # plain rows instead of entities, so that annotations do not pile up in the session
+            stmt = (
+                select(
+                    Annotation.id,
+                    Annotation.task_id,
+                    Annotation.name,
+                    Annotation.interface,
+                    Annotation.data_json,
+                    Annotation.created_at,
+                    Annotation.updated_at,
+                )
+                .where(Annotation.task_id.in_(task_ids), Annotation.id > last_id)
+                .order_by(Annotation.id)
+                .limit(batch_size)
+            )
+            if since is not None:
+                stmt = stmt.where(Annotation.updated_at > since)
+            annotations = session.execute(stmt).all()
+            if not annotations:
+                return
+            series = Annotation.read_all_series(session, [annot.id for annot in annotations])
+            rows = []
+            for annot in annotations:
+                data = annot.data_json
+                if not isinstance(data, dict):
+                    data = {} if data is None else {"": data}
+                data = {**data, **series.get(annot.id, {})}
+                rows.append(
+                    {
+                        "annotation_id": annot.id,
+                        "task_id": annot.task_id,
+                        "name": annot.name,
+                        "interface": json.dumps(annot.interface),
+                        "created_at": annot.created_at,
+                        "updated_at": annot.updated_at,
+                        **{f"data.{k}" if k else "data": v for k, v in data.items()},
+                    }
+                )
+            yield rows
+            last_id = annotations[-1].id
 
 
 bp = Blueprint("ContinuousAnnotationTask", __name__)
@@ -72,8 +244,16 @@ def fetch_one(annotid):
 @bp.route("/annotations", methods=["POST"])
 def submit_annotation():
     props = request.json
+    data = props.pop("data_json", None)
+    series = props.pop("series", None)
     annot = Annotation(**props)
     app.session.add(annot)
+    app.session.flush()
+    try:
+        annot.set_data(data, series)
+    except (ValueError, TypeError) as ex:
+        app.session.rollback()
+        return jsonify({"msg": f"invalid series: {ex}"}), 400
     app.session.commit()
     return jsonify_or_404(annot)
 
@@ -86,6 +266,13 @@ def update_annotation(annotid):
         return jsonify({"msg": "not found"}), 404
 
     updates = request.json
+    series = updates.pop("series", None)
+    if "data_json" in updates:
+        try:
+            annot.set_data(updates.pop("data_json"), series)
+        except (ValueError, TypeError) as ex:
+            app.session.rollback()
+            return jsonify({"msg": f"invalid series: {ex}"}), 400
     for key, value in updates.items():
         if hasattr(annot, key):
             setattr(annot, key, value)
@@ -94,19 +281,149 @@ def update_annotation(annotid):
     return jsonify_or_404(annot)
 
 
+# lengths and dtypes of the series of an annotation
+@bp.route("/annotations/<annotid>/series")
+def fetch_series_info(annotid):
+    annot = app.session.get(Annotation, int(annotid))
+    if annot is None:
+        return jsonify({"msg": "not found"}), 404
+    return jsonify(annot.series_info())
+
+
+# read frames [start, end) of a series
+@bp.route("/annotations/<annotid>/series/<name>")
+def fetch_series_range(annotid, name):
+    annot = app.session.get(Annotation, int(annotid))
+    if annot is None:
+        return jsonify({"msg": "not found"}), 404
+    info = annot.series_info().get(name)
+    if info is None:
+        return jsonify({"msg": "series not found"}), 404
+
+    start = max(request.args.get("start", 0, type=int), 0)
+    end = request.args.get("end", info["length"], type=int)
+    values = annot.read_series(name, start, end)
+    return jsonify(
+        {
+            "start": start,
+            "end": start + len(values),
+            "length": info["length"],
+            "dtype": info["dtype"],
+            "values": series_to_list(values),
+        }
+    )
+
+
+# write frames [start, start + len(values)) of a series, or append them if start is missing
+@bp.route("/annotations/<annotid>/series/<name>", methods=["PUT"])
+def update_series_range(annotid, name):
+    annot = app.session.get(Annotation, int(annotid))
+    if annot is None:
+        return jsonify({"msg": "not found"}), 404
+
+    body = request.json
+    try:
+        info = annot.write_series(
+            name, body["values"], start=body.get("start"), dtype=body.get("dtype")
+        )
+    except (KeyError, TypeError, ValueError) as ex:
+        app.session.rollback()
+        return jsonify({"msg": f"invalid series update: {ex}"}), 400
+    app.session.commit()
+    return jsonify(info)
+
+
+# write frames [offset, offset + length) of a series from binary data: the body holds the values
+# packed little-endian (eg. the buffer of a Float32Array). Writes are idempotent, so an upload
+# can be retried until acknowledged with the version of the annotation.
+@bp.route("/annotations/<annotid>/series/<name>/frames", methods=["PUT"])
+def upload_series_frames(annotid, name):
+    annot = app.session.get(Annotation, int(annotid))
+    if annot is None:
+        return jsonify({"msg": "not found"}), 404
+
+    offset = request.args.get("offset", type=int)
+    length = request.args.get("length", type=int)
+    dtype = request.args.get("dtype", "float32")
+    if offset is None or dtype not in SERIES_DTYPES:
+        return jsonify({"msg": "offset and a dtype in " + ", ".join(SERIES_DTYPES) + " required"}), 400
+    body = request.get_data(cache=False)
+    itemsize = np.dtype(SERIES_DTYPES[dtype]).itemsize
+    if len(body) % itemsize or (length is not None and length * itemsize != len(body)):
+        return jsonify({"msg": f"body of {len(body)} bytes does not hold {length} {dtype} values"}), 400
+
+    values = np.frombuffer(body, SERIES_DTYPES[dtype])
+    try:
+        info = annot.write_series(name, values, start=offset, dtype=dtype)
+    except ValueError as ex:
+        app.session.rollback()
+        return jsonify({"msg": f"invalid series update: {ex}"}), 400
+    app.session.commit()
+    return jsonify({**info, "offset": offset, "count": len(values)})
+
+
+# read frames [start, end) of a series as binary data, packed little-endian
+@bp.route("/annotations/<annotid>/series/<name>/frames")
+def fetch_series_frames(annotid, name):
+    annot = app.session.get(Annotation, int(annotid))
+    if annot is None:
+        return jsonify({"msg": "not found"}), 404
+    info = annot.series_info().get(name)
+    if info is None:
+        return jsonify({"msg": "series not found"}), 404
+
+    start = max(request.args.get("start", 0, type=int), 0)
+    values = annot.read_series(name, start, request.args.get("end", type=int))
+    return Response(
+        values.tobytes(),
+        mimetype="application/octet-stream",
+        headers={
+            "X-Series-Offset": str(start),
+            "X-Series-Length": str(info["length"]),
+            "X-Series-Dtype": info["dtype"],
+            "X-Annotation-Version": str(annot.version),
+        },
+    )
+
+
+# delete a series
+@bp.route("/annotations/<annotid>/series/<name>", methods=["DELETE"])
+def delete_series(annotid, name):
+    annot = app.session.get(Annotation, int(annotid))
+    if annot is None:
+        return jsonify({"msg": "not found"}), 404
+    annot.delete_series(name)
+    app.session.commit()
+    return "", 200
+
+
 # delete an annotation
 @bp.route("/annotations/<annotid>", methods=["DELETE"])
 def delete_annotation(annotid):
     annot = app.session.query(Annotation).get(int(annotid))
     if annot is None:
         return jsonify({"msg": "not found"}), 404
+    app.session.execute(delete(AnnotationChunk).where(AnnotationChunk.annotation_id == annot.id))
     app.session.delete(annot)
     app.session.commit()
     return "", 200
 
 
+# frames per chunk of an annotation series
+CHUNK_SIZE = 1024
+
+# dtypes of the series, stored little-endian. Frames that were never written read as the fill value.
+SERIES_DTYPES = {"float32": "<f4", "int32": "<i4"}
+SERIES_FILL = {"float32": np.nan, "int32": 0}
+
+
 class Annotation(Base):
-    """Stores annotations for covfee tasks"""
+    """Stores annotations for covfee tasks.
+
+    Per-frame traces are stored as named series of AnnotationChunk rows, so that saving or
+    loading a range of frames only touches the chunks of that range. data_json keeps the
+    rest of the annotation data.
+    """
 
     __tablename__ = "ContinuousAnnotationTask.annotations"
 
@@ -119,8 +436,280 @@ class Annotation(Base):
     name: Mapped[str]
     interface: Mapped[Dict[str, Any]]  # json column
     data_json: Mapped[Optional[Dict[str, Any]]]
+    # incremented by every change to the series
+    version: Mapped[int] = mapped_column(default=0)
 
     created_at: Mapped[datetime.datetime] = mapped_column(default=datetime.datetime.now)
+    # indexed for incremental exports (?since=)
+    updated_at: Mapped[datetime.datetime] = mapped_column(
+        default=datetime.datetime.now, onupdate=datetime.datetime.now, index=True
+    )
+
+    def to_dict(self, with_series=True):
+        instance_dict = super().to_dict()
+        if with_series and object_session(self) is not None:
+            series = Annotation.read_all_series(object_session(self), [self.id])
+            data = instance_dict["data_json"]
+            # data that is not a dict (see set_data) has no keys to merge the series into
+            if data is None or isinstance(data, dict):
+                instance_dict["data_json"] = {**(data or {}), **series.get(self.id, {})}
+        return instance_dict
+
+    def set_data(self, data: Any, series: Optional[Dict[str, str]] = None):
+        """Sets data_json, storing the per-frame traces in it as series.
+        series maps keys of data to the dtype to store them with, even if they do not
+        read back unchanged (eg. float traces in float32). Other keys are written to the
+        existing series of the same name, or stored as new series only if they read back
+        unchanged (see series_dtype).
+
+        Raises:
+            ValueError: if a key in series is not a list of numbers that fit its dtype,
+                or the dtype is unsupported.
+        """
+        if not isinstance(data, dict):
+            self.data_json = data
+            return
+        series = series or {}
+        info = self.series_info()
+        dtypes = {}
+        for name, value in data.items():
+            if name in series:
+                if not isinstance(value, list):
+                    raise ValueError(f"{name} is not a list")
+                if series[name] not in SERIES_DTYPES:
+                    raise ValueError(f"unsupported dtype {series[name]}")
+                dtypes[name] = series[name]
+            else:
+                dtypes[name] = series_dtype(value, info.get(name, {}).get("dtype")) or series_dtype(value)
+
+        for name in info:
+            if dtypes.get(name) != info[name]["dtype"]:
+                self.delete_series(name)
+        for name, dtype in dtypes.items():
+            if dtype is not None:
+                self.replace_series(name, data[name], dtype=dtype)
+        self.data_json = {k: v for k, v in data.items() if dtypes[k] is None}
+
+    def _lock(self):
+        """Reloads the annotation and locks its row until the session commits, so that
+        concurrent writes to its series (eg. from different workers) are serialized.
+        """
+        session = object_session(self)
+        session.flush()
+        session.refresh(self, with_for_update=True)
+
+    def _chunks(self, name: str, first: int, last: int) -> Select:
+        return select(AnnotationChunk).where(
+            AnnotationChunk.annotation_id == self.id,
+            AnnotationChunk.series == name,
+            AnnotationChunk.chunk_index.between(first, last),
+        )
+
+    def series_info(self) -> Dict[str, Dict[str, Any]]:
+        """Length (number of frames) and dtype of each series of the annotation"""
+        rows = object_session(self).execute(
+            select(
+                AnnotationChunk.series,
+                AnnotationChunk.dtype,
+                func.max(AnnotationChunk.chunk_index * CHUNK_SIZE + AnnotationChunk.length),
+            )
+            .where(AnnotationChunk.annotation_id == self.id)
+            .group_by(AnnotationChunk.series, AnnotationChunk.dtype)
+        )
+        return {name: {"length": length, "dtype": dtype} for name, dtype, length in rows}
+
+    def read_series(self, name: str, start: int = 0, end: Optional[int] = None) -> np.ndarray:
+        """Frames [start, end) of a series, clipped to its length"""
+        info = self.series_info().get(name, {"length": 0, "dtype": "float32"})
+        end = info["length"] if end is None else min(end, info["length"])
+        start = max(start, 0)
+        out = np.full(max(end - start, 0), SERIES_FILL[info["dtype"]], SERIES_DTYPES[info["dtype"]])
+        if len(out) == 0:
+            return out
+
+        for chunk in object_session(self).scalars(
+            self._chunks(name, start // CHUNK_SIZE, (end - 1) // CHUNK_SIZE)
+        ):
+            offset = chunk.chunk_index * CHUNK_SIZE
+            lo, hi = max(start, offset), min(end, offset + chunk.length)
+            out[lo - start : hi - start] = chunk.values()[lo - offset : hi - offset]
+        return out
+
+    def write_series(
+        self, name: str, values, start: Optional[int] = None, dtype: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Writes values to frames [start, start + len(values)) of a series, creating it if needed.
+        With start=None, the values are appended. Frames skipped over read as the fill value.
+        The dtype of a new series is dtype (default float32), later writes are stored with it.
+
+        Writing the same values again changes nothing, so a retried write does not
+        increment the version.
+
+        Returns the info of the series after the write (see series_info) and the version
+
+        Raises:
+            ValueError: if the values do not fit in the dtype of the series.
+        """
+        session = object_session(self)
+        self._lock()
+        info = self.series_info().get(name)
+        if info is not None:
+            dtype = info["dtype"]
+        elif dtype is None:
+            dtype = "float32"
+        if dtype not in SERIES_DTYPES:
+            raise ValueError(f"unsupported dtype {dtype}")
+        length = 0 if info is None else info["length"]
+        start = length if start is None else start
+        if start < 0:
+            raise ValueError("start must be positive")
+        if not isinstance(values, np.ndarray):
+            # casting would truncate floats to ints and fail on ints out of range
+            if not isinstance(values, list):
+                raise ValueError("values must be a list")
+            if values and series_dtype(values, dtype) != dtype:
+                raise ValueError(f"values do not fit in {dtype}")
+        values = np.asarray(values, dtype=SERIES_DTYPES[dtype])
+        if values.ndim != 1:
+            raise ValueError("values must be one-dimensional")
+        end = start + len(values)
+        if len(values) == 0:
+            return {"length": length, "dtype": dtype, "version": self.version}
+
+        chunks = {
+            chunk.chunk_index: chunk
+            for chunk in session.scalars(
+                self._chunks(name, start // CHUNK_SIZE, (end - 1) // CHUNK_SIZE)
+            )
+        }
+        changed = False
+        for index in range(start // CHUNK_SIZE, (end - 1) // CHUNK_SIZE + 1):
+            offset = index * CHUNK_SIZE
+            lo, hi = max(start, offset), min(end, offset + CHUNK_SIZE)
+            chunk = chunks.get(index)
+            if chunk is None:
+                chunk = AnnotationChunk(
+                    annotation_id=self.id, series=name, chunk_index=index, dtype=dtype, length=0
+                )
+                session.add(chunk)
+
+            if lo == offset and hi - offset >= chunk.length:
+                data = values[lo - start : hi - start]
+            else:
+                data = chunk.values()
+                if len(data) < hi - offset:
+                    data = np.concatenate(
+                        [data, np.full(hi - offset - len(data), SERIES_FILL[dtype], data.dtype)]
+                    )
+                data[lo - offset : hi - offset] = values[lo - start : hi - start]
+            if chunk.data != data.tobytes():
+                chunk.data = data.tobytes()
+                chunk.length = len(data)
+                changed = True
+        if changed:
+            self.version += 1
+        # the session does not autoflush, and the series queries must see the write
+        session.flush()
+
+        return {"length": max(length, end), "dtype": dtype, "version": self.version}
+
+    def truncate_series(self, name: str, length: int):
+        """Drops the frames of a series from length on"""
+        session = object_session(self)
+        self._lock()
+        self.version += 1
+        session.execute(
+            delete(AnnotationChunk).where(
+                AnnotationChunk.annotation_id == self.id,
+                AnnotationChunk.series == name,
+                AnnotationChunk.chunk_index * CHUNK_SIZE >= length,
+            )
+        )
+        index = length // CHUNK_SIZE
+        for chunk in session.scalars(self._chunks(name, index, index)):
+            if chunk.length > length - chunk.chunk_index * CHUNK_SIZE:
+                chunk.length = length - chunk.chunk_index * CHUNK_SIZE
+                chunk.data = chunk.values()[: chunk.length].tobytes()
+        session.flush()
+
+    def replace_series(self, name: str, values, dtype: Optional[str] = None):
+        """Sets the whole series to values"""
+        self.delete_series(name)
+        if len(values):
+            self.write_series(name, values, start=0, dtype=dtype)
+
+    def delete_series(self, name: str):
+        self._lock()
+        self.version += 1
+        object_session(self).execute(
+            delete(AnnotationChunk).where(
+                AnnotationChunk.annotation_id == self.id, AnnotationChunk.series == name
+            )
+        )
+
+    @staticmethod
+    def read_all_arrays(
+        session: Session, annotation_ids: List[int]
+    ) -> Dict[int, Dict[str, np.ndarray]]:
+        """Whole series of several annotations, by series name by annotation id"""
+        pieces: Dict[int, Dict[str, Dict[int, np.ndarray]]] = {}
+        dtypes: Dict[Tuple[int, str], str] = {}
+        for chunk in session.scalars(
+            select(AnnotationChunk).where(AnnotationChunk.annotation_id.in_(annotation_ids))
+        ):
+            pieces.setdefault(chunk.annotation_id, {}).setdefault(chunk.series, {})[
+                chunk.chunk_index
+            ] = chunk.values()
+            dtypes[chunk.annotation_id, chunk.series] = chunk.dtype
+
+        res: Dict[int, Dict[str, np.ndarray]] = {}
+        for annotation_id, series in pieces.items():
+            res[annotation_id] = {}
+            for name, chunks in series.items():
+                last = max(chunks)
+                out = np.full(
+                    last * CHUNK_SIZE + len(chunks[last]),
+                    SERIES_FILL[dtypes[annotation_id, name]],
+                    chunks[last].dtype,
+                )
+                for index, data in chunks.items():
+                    out[index * CHUNK_SIZE : index * CHUNK_SIZE + len(data)] = data
+                res[annotation_id][name] = out
+        return res
+
+    @staticmethod
+    def read_all_series(
+        session: Session, annotation_ids: List[int]
+    ) -> Dict[int, Dict[str, List[Any]]]:
+        """Whole series of several annotations, as lists by series name by annotation id"""
+        return {
+            annotation_id: {name: series_to_list(values) for name, values in series.items()}
+            for annotation_id, series in Annotation.read_all_arrays(session, annotation_ids).items()
+        }
+
+
+class AnnotationChunk(Base):
+    """CHUNK_SIZE frames of a series of an annotation, as a packed little-endian array.
+    The last chunk of a series, and chunks followed by unwritten frames, may be shorter.
+    """
+
+    __tablename__ = "ContinuousAnnotationTask.chunks"
+
+    annotation_id: Mapped[int] = mapped_column(
+        ForeignKey("ContinuousAnnotationTask.annotations.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    series: Mapped[str] = mapped_column(primary_key=True)
+    chunk_index: Mapped[int] = mapped_column(primary_key=True)
+    dtype: Mapped[str]
+    # number of frames in data
+    length: Mapped[int]
+    data: Mapped[bytes]
+
     updated_at: Mapped[datetime.datetime] = mapped_column(
         default=datetime.datetime.now, onupdate=datetime.datetime.now
     )
+
+    def values(self) -> np.ndarray:
+        """Writable copy of the frames of the chunk"""
+        return np.frombuffer(self.data or b"", SERIES_DTYPES[self.dtype]).copy()
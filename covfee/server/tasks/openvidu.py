@@ -0,0 +1,89 @@
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from covfee.logger import logger
+
+
+class OpenViduClient:
+    """Client of the OpenVidu REST API, shared by the videocall tasks of a server process.
+
+    Requests go through one requests.Session, so connections (and their TLS handshakes)
+    are kept alive and reused by up to pool_size concurrent requests. Under eventlet the
+    sockets are green: a green thread waiting for OpenVidu lets the others run.
+
+    The OpenVidu session of each node is created once. Its id is remembered, so that later
+    joins only request a connection token. If OpenVidu closed the session in the meantime
+    (404 on the token request), it is created again.
+    """
+
+    def __init__(self, url: str, secret: str, verify=False, timeout=2, pool_size=10):
+        self.url = url if url.endswith("/") else url + "/"
+        self.timeout = timeout
+        self.http = requests.Session()
+        self.http.auth = ("OPENVIDUAPP", secret)
+        self.http.verify = verify
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
+
+        # node id -> OpenVidu session id
+        self.session_ids: Dict[int, str] = {}
+        # concurrent joins to a new node wait for one session creation
+        self.session_locks: Dict[int, threading.Lock] = defaultdict(threading.Lock)
+
+    def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        response = self.http.post(self.url + path, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def _create_session(self, node_id: int, recording_options: Dict[str, Any]) -> str:
+        # https://openvidu.discourse.group/t/session-lifecycle/103/2
+        try:
+            return self._post(
+                "openvidu/api/sessions",
+                {
+                    "mediaMode": "ROUTED",
+                    "recordingMode": "ALWAYS",
+                    "defaultRecordingProperties": recording_options,
+                    "customSessionId": str(node_id),
+                },
+            )["sessionId"]
+        except requests.exceptions.HTTPError as err:
+            if err.response.status_code != 409:
+                raise
+            # Session already exists in OpenVidu (eg. created before a restart)
+            logger.info(f"OpenViduClient: session {node_id} already exists")
+            return str(node_id)
+
+    def get_session_id(self, node_id: int, recording_options: Dict[str, Any]) -> str:
+        with self.session_locks[node_id]:
+            session_id = self.session_ids.get(node_id)
+            if session_id is None:
+                session_id = self._create_session(node_id, recording_options)
+                self.session_ids[node_id] = session_id
+            return session_id
+
+    def get_connection_token(
+        self, node_id: int, recording_options: Dict[str, Any], data: str | None
+    ) -> Tuple[str, str]:
+        """Requests a token to join the call of the node, creating its session if needed.
+
+        Returns:
+            (session id, connection token)
+        """
+        session_id = self.get_session_id(node_id, recording_options)
+        path = f"openvidu/api/sessions/{session_id}/connection"
+        try:
+            return session_id, self._post(path, {"data": data})["token"]
+        except requests.exceptions.HTTPError as err:
+            if err.response.status_code != 404:
+                raise
+        # the session was closed in OpenVidu (eg. everybody left), create it again
+        self.session_ids.pop(node_id, None)
+        session_id = self.get_session_id(node_id, recording_options)
+        path = f"openvidu/api/sessions/{session_id}/connection"
+        return session_id, self._post(path, {"data": data})["token"]
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import inspect
+from typing import Dict, Set, Type
+
+from .base import BaseCovfeeTask
+
+
+class TaskRegistry:
+    """Task classes by task type (the "type" of the task specs).
+
+    The classes are collected once from covfee.server.tasks. Before the first task object of
+    a type is created, the registry calls its on_register hook, once per process.
+    Unknown types resolve to BaseCovfeeTask.
+    """
+
+    def __init__(self):
+        self._classes: Dict[str, Type[BaseCovfeeTask]] | None = None
+        self._registered: Set[Type[BaseCovfeeTask]] = set()
+
+    @property
+    def classes(self) -> Dict[str, Type[BaseCovfeeTask]]:
+        if self._classes is None:
+            from covfee.server import tasks
+
+            self._classes = {
+                name: elem
+                for name, elem in vars(tasks).items()
+                if inspect.isclass(elem) and issubclass(elem, BaseCovfeeTask)
+            }
+        return self._classes
+
+    def add(self, task_class: Type[BaseCovfeeTask], task_type: str | None = None):
+        """Adds a task class that is not part of covfee.server.tasks (eg. from a plugin)"""
+        self.classes[task_type or task_class.__name__] = task_class
+
+    def get_class(self, task_type: str) -> Type[BaseCovfeeTask]:
+        """The task class of the type, without registering it"""
+        return self.classes.get(task_type, BaseCovfeeTask)
+
+    def get(self, task_type: str) -> Type[BaseCovfeeTask]:
+        """The task class of the type, ready to create task objects"""
+        task_class = self.get_class(task_type)
+        if task_class not in self._registered:
+            task_class.on_register()
+            self._registered.add(task_class)
+        return task_class
+
+
+task_registry = TaskRegistry()
@@ -1,66 +1,24 @@
-import requests
-from flask import current_app as app
-
 from covfee.logger import logger
 
 from .base import BaseCovfeeTask, CriticalError
+from .openvidu import OpenViduClient
 
 # OPENVIDU_URL = "http://192.168.0.22:4443/"
 # OPENVIDU_SECRET = "MY_SECRET"
 
 
 class VideocallTask(BaseCovfeeTask):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        assert "OPENVIDU_URL" in self.config, "OPENVIDU_URL not found in config"
-        assert "OPENVIDU_SECRET" in self.config, "OPENVIDU_SECRET not found in config"
-        self.openvidu_url = self.config["OPENVIDU_URL"]
-        self.openvidu_secret = self.config["OPENVIDU_SECRET"]
-
-    def _request_session_id(self):
-        # https://openvidu.discourse.group/t/session-lifecycle/103/2
-
-        recordingOptions = self.task.spec.spec["serverRecording"]
-        if recordingOptions is None:
-            recordingOptions = {}
-
-        try:
-            response = requests.post(
-                self.openvidu_url + "openvidu/api/sessions",
-                verify=False,
-                auth=("OPENVIDUAPP", self.openvidu_secret),
-                headers={"Content-type": "application/json"},
-                json={
-                    "mediaMode": "ROUTED",
-                    "recordingMode": "ALWAYS",
-                    "defaultRecordingProperties": {**recordingOptions},
-                    "customSessionId": str(self.task.id),
-                },
-                timeout=2,
-            )
-            response.raise_for_status()
-            return response.json()["sessionId"]
-        except requests.exceptions.HTTPError as err:
-            if err.response.status_code == 409:
-                # Session already exists in OpenVidu
-                app.logger.warn(
-                    f"_request_session_id called but session already exists for session_id {str(self.task.id)}"
-                )
-                return str(self.task.id)
-            else:
-                raise err
-
-    def _request_connection_token(self, session_id, journey_id):
-        response = requests.post(
-            self.openvidu_url + "openvidu/api/sessions/" + session_id + "/connection",
-            verify=False,
-            auth=("OPENVIDUAPP", self.openvidu_secret),
-            headers={"Content-type": "application/json"},
-            json={"data": journey_id},
-            timeout=2,
+    openvidu: OpenViduClient
+
+    @classmethod
+    def on_register(cls):
+        assert "OPENVIDU_URL" in cls.config, "OPENVIDU_URL not found in config"
+        assert "OPENVIDU_SECRET" in cls.config, "OPENVIDU_SECRET not found in config"
+        cls.openvidu = OpenViduClient(
+            cls.config["OPENVIDU_URL"],
+            cls.config["OPENVIDU_SECRET"],
+            verify=cls.config.get("OPENVIDU_VERIFY_SSL", False),
         )
-        response.raise_for_status()
-        return response.json()["token"]
 
     def on_start(self):
         logger.info("VideocallTask:on_start")
@@ -80,10 +38,12 @@ class VideocallTask(BaseCovfeeTask):
         logger.info("VideocallTask:on_join")
         # retrieve or request a session ID for the call / room
 
+        recording_options = self.task.spec.spec["serverRecording"] or {}
         try:
-            session_id = self._request_session_id()
-            connection_token = self._request_connection_token(
-                session_id, journey.id.hex() if journey is not None else None
+            session_id, connection_token = self.openvidu.get_connection_token(
+                self.task.id,
+                recording_options,
+                journey.id.hex() if journey is not None else None,
             )
         except Exception as ex:
             raise CriticalError(load_task=True) from ex
@@ -5,7 +5,7 @@ import subprocess
 
 from flask import current_app as app
 from .validation_errors import JavascriptError, ValidationError
-import zmq
+from eventlet.green import zmq
 context = zmq.Context()
 
 class AjvValidator:
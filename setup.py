@@ -38,7 +38,6 @@ setup(
         "flask-socketio == 5.3.6",
         "flask-jwt-extended == 4.4.4",
         "pyzmq == 27.1.0",
-        "APScheduler == 3.10.4",
         # common utils (fixed major versions)
         "click ==  8.*",
         "numpy == 2.*",
@@ -53,5 +52,13 @@ setup(
         "pyparsing == 3.1.1",
         "json-ref-dict == 0.7.2",
     ],
+    extras_require={
+        # server database backend (DATABASE_URL=postgresql+psycopg2://...)
+        "postgres": ["psycopg2-binary == 2.9.*"],
+        # columnar export (covfee export --format parquet)
+        "parquet": ["pyarrow >= 14"],
+        # message queue of the server workers (SOCKETIO_MESSAGE_QUEUE=redis://...)
+        "redis": ["redis >= 4"],
+    },
     python_requires=">=3.6",
 )
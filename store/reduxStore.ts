@@ -118,6 +118,25 @@ class StoreService {
     }
   }
 
+  /**
+   * Dispatches a batch of actions in order
+   * @returns the actionIndex of the first action in the batch
+   */
+  async actions(
+    responseId: number,
+    actions: Action[]
+  ): Promise<ActionResponse> {
+    if (!(responseId in this.rooms)) return { err: "Task store not found." }
+
+    const room = this.rooms[responseId]
+    const actionIndex = room.actionIndex
+    for (const action of actions) {
+      room.store.dispatch(action)
+    }
+    room.actionIndex += actions.length
+    return { actionIndex }
+  }
+
   state(responseId: number): StateResponse {
     if (!(responseId in this.rooms)) return { err: "Task store not found." }
 
@@ -129,10 +148,13 @@ class StoreService {
   }
 
   async run(port: number) {
-    const sock = new zmq.Reply()
+    // ROUTER socket: clients (DEALER) may have many requests in flight.
+    // Replies are routed back with the client identity and carry the requestId
+    // of the request so that the client can match them.
+    const sock = new zmq.Router()
     await sock.bind(`tcp://*:${port}`)
     logger.info(`Running at tcp://localhost:${port}`)
-    for await (const [buffer] of sock) {
+    for await (const [identity, buffer] of sock) {
       const req = JSON.parse(buffer.toString("utf-8")) as Request
       let res
 
@@ -148,6 +170,9 @@ class StoreService {
       case "action":
         res = await this.action(req["responseId"], req["action"])
         break
+      case "actions":
+        res = await this.actions(req["responseId"], req["actions"])
+        break
       case "state":
         res = await this.state(req["responseId"])
         break
@@ -156,8 +181,9 @@ class StoreService {
       }
 
       res["success"] = !("err" in res)
+      res["requestId"] = req["requestId"]
       logger.info(res)
-      await sock.send(JSON.stringify(res))
+      await sock.send([identity, JSON.stringify(res)])
     }
   }
 }
@@ -33,6 +33,12 @@ export type ActionRequest = ActionRequestPayload & {
 }
 export type ActionResponse = Error | { actionIndex: number }
 
+export type ActionsRequest = {
+  command: "actions"
+  responseId: number
+  actions: Action[]
+}
+
 export type StateRequestPayload = {
   responseId: number
 }
@@ -41,7 +47,16 @@ export type StateRequest = StateRequestPayload & {
 }
 export type StateResponse = Error | State
 
-export type Request = JoinRequest | LeaveRequest | ActionRequest | StateRequest
+export type Request = (
+  | JoinRequest
+  | LeaveRequest
+  | ActionRequest
+  | ActionsRequest
+  | StateRequest
+) & {
+  // set by the client, echoed in the response
+  requestId?: number
+}
 export type Response =
   | JoinResponse
   | LeaveResponse
@@ -0,0 +1,115 @@
+"""Creation of the schema and storage of JSON columns on PostgreSQL, where they
+are mapped to JSONB. The tests run a throwaway server in a temporary directory
+and are skipped when the PostgreSQL binaries (initdb, pg_ctl) are not on PATH.
+"""
+import os
+import shutil
+import socket
+import subprocess
+
+import pytest
+from sqlalchemy import inspect, select
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import sessionmaker
+
+from covfee import HIT, Project, tasks
+from covfee.config import Config
+from covfee.server.db import get_engine_from_config
+from covfee.server.orm.base import Base
+from covfee.server.orm.response import TaskResponse
+from covfee.shared.dataclass import CovfeeApp
+from covfee.shared.schemata import schemata
+
+pytest.importorskip("psycopg2")
+pytestmark = [
+    pytest.mark.skipif(
+        shutil.which("initdb") is None or shutil.which("pg_ctl") is None,
+        reason="initdb and pg_ctl are not on PATH",
+    ),
+    pytest.mark.skipif(
+        hasattr(os, "geteuid") and os.geteuid() == 0,
+        reason="PostgreSQL refuses to run as root",
+    ),
+]
+
+
+def get_free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    data_dir = str(tmp_path / "data")
+    port = get_free_port()
+    subprocess.run(
+        ["initdb", "-D", data_dir, "-U", "postgres", "-A", "trust"],
+        check=True,
+        capture_output=True,
+    )
+    # TCP only, the socket path of tmp_path can be too long for a unix socket
+    options = f"-p {port} -c listen_addresses=127.0.0.1 -c unix_socket_directories=''"
+    subprocess.run(
+        ["pg_ctl", "-D", data_dir, "-l", str(tmp_path / "postgres.log"), "-o", options, "-w", "start"],
+        check=True,
+        capture_output=True,
+    )
+    try:
+        yield f"postgresql://postgres@127.0.0.1:{port}/postgres"
+    finally:
+        subprocess.run(
+            ["pg_ctl", "-D", data_dir, "-m", "immediate", "-w", "stop"],
+            capture_output=True,
+        )
+
+
+@pytest.fixture
+def engine(database_url, monkeypatch):
+    # the node settings are split from the task spec using the JSON schemata,
+    # which are generated from the typescript sources
+    node_properties = ["name", "n_start", "n_pause", "timer", "countdown"]
+    monkeypatch.setattr(
+        schemata,
+        "get_definition",
+        lambda name: {"properties": {k: {} for k in node_properties}},
+    )
+    monkeypatch.setattr(Base, "_config", {"COVFEE_ENV": "dev"}, raising=False)
+    monkeypatch.setenv("COVFEE_DATABASE_URL", database_url)
+
+    engine = get_engine_from_config(Config("dev"))
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_jsonb_round_trip(engine):
+    columns = {c["name"]: c["type"] for c in inspect(engine).get_columns("taskresponses")}
+    assert isinstance(columns["state"], JSONB)
+
+    session_local = sessionmaker(engine)
+    hit = HIT("Postgres")
+    hit.add_journey(
+        nodes=[tasks.InstructionsTaskSpec(name="Task", content={"type": "link", "url": "index.md"})]
+    )
+    state = {"nested": {"values": [1, 2.5, None], "text": "ünïcode"}, "flag": True, "empty": {}}
+    with session_local() as session:
+        [project] = CovfeeApp(
+            [Project("Postgres", "admin@example.com", [hit])]
+        ).get_instantiated_projects()
+        session.add(project)
+        session.flush()
+        response = project.hitspecs[0].instances[0].journeys[0].nodes[0].responses[-1]
+        response.state = state
+        session.commit()
+        response_id = response.id
+
+    with session_local() as session:
+        assert session.get(TaskResponse, response_id).state == state
+        # queries into the documents run on the server
+        found = session.scalars(
+            select(TaskResponse.id).where(
+                TaskResponse.state["nested"]["text"].as_string() == "ünïcode"
+            )
+        ).all()
+        assert found == [response_id]
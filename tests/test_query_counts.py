@@ -0,0 +1,101 @@
+"""Number of SQL statements run by the REST endpoints that serialize whole HITs.
+The eager-loading strategies in covfee.server.orm.loaders keep these constant
+in the number of nodes and journeys. A regression (eg. a relationship that is
+lazy loaded again) makes the count grow with the size of the HIT.
+"""
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from covfee import HIT, Project, tasks
+from covfee.config import Config
+from covfee.server.orm.base import Base
+from covfee.shared.dataclass import CovfeeApp
+from covfee.shared.schemata import schemata
+
+MAX_STATEMENTS = {
+    "instance": 7,
+    "journey": 6,
+}
+
+
+def make_project(num_nodes, num_journeys):
+    hit = HIT("Query counts")
+    for _ in range(num_journeys):
+        hit.add_journey(
+            nodes=[
+                tasks.InstructionsTaskSpec(
+                    name=f"Task {i}", content={"type": "link", "url": "index.md"}
+                )
+                for i in range(num_nodes)
+            ]
+        )
+    return Project("Query counts", "admin@example.com", [hit])
+
+
+@pytest.fixture
+def app(monkeypatch):
+    # the node settings are split from the task spec using the JSON schemata,
+    # which are generated from the typescript sources
+    node_properties = ["name", "n_start", "n_pause", "timer", "countdown"]
+    monkeypatch.setattr(
+        schemata,
+        "get_definition",
+        lambda name: {"properties": {k: {} for k in node_properties}},
+    )
+
+    engine = create_engine("sqlite://")
+    session_local = sessionmaker(engine)
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(Base, "_config", {"COVFEE_ENV": "dev"}, raising=False)
+    monkeypatch.setattr(Base, "sessionmaker", session_local)
+
+    app = Flask(__name__)
+    config = Config("dev")
+    config.update(app.config)
+    app.config = config
+
+    from covfee.server.rest_api import api
+    from covfee.server.rest_api.utils import CovfeeJSONProvider
+
+    app.json = CovfeeJSONProvider(app)
+    app.session = scoped_session(session_local)
+    app.register_blueprint(api, url_prefix="/api")
+
+    @app.teardown_appcontext
+    def teardown_appctx(exception):
+        app.session.remove()
+
+    app.engine = engine
+    return app
+
+
+def count_statements(app, url):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(app.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        res = app.test_client().get(url)
+    finally:
+        event.remove(app.engine, "before_cursor_execute", before_cursor_execute)
+    assert res.status_code == 200
+    return len(statements)
+
+
+@pytest.mark.parametrize("num_nodes,num_journeys", [(3, 1), (10, 4)])
+def test_endpoint_statements(app, num_nodes, num_journeys):
+    with app.app_context():
+        [project] = CovfeeApp(
+            [make_project(num_nodes, num_journeys)]
+        ).get_instantiated_projects()
+        app.session.add(project)
+        app.session.commit()
+        instance = project.hitspecs[0].instances[0]
+        iid, jid = instance.id.hex(), instance.journeys[0].id.hex()
+
+    assert count_statements(app, f"/api/instances/{iid}") <= MAX_STATEMENTS["instance"]
+    assert count_statements(app, f"/api/journeys/{jid}") <= MAX_STATEMENTS["journey"]